@@ -0,0 +1,46 @@
+"""
+Compare two benchmark results, e.g. the same suite before and after a change:
+
+    python -m benchmarks.compare benchmarks/results/suite-abc1234-*.json benchmarks/results/suite-def5678-*.json
+"""
+import argparse
+import json
+
+
+TIMINGS = ("seconds", "_ms", "_bytes")  # lower is better
+RATES = ("per_second",)  # higher is better
+
+
+def flatten(result: dict, prefix: str = "") -> dict:
+    values = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[f"{prefix}{key}"] = value
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"{before['benchmark']}: {before['commit']} -> {after['commit']}")
+
+    old, new = flatten(before), flatten(after)
+    for key in sorted(old.keys() & new.keys()):
+        if not key.endswith(TIMINGS + RATES) or not old[key]:
+            continue
+        change = (new[key] - old[key]) / old[key] * 100
+        better = change < 0 if key.endswith(TIMINGS) else change > 0
+        print(f"{key:50} {old[key]:>12} {new[key]:>12} {change:>+8.1f}% {'better' if better else 'worse' if change else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Synthetic fleet data in the formats /load_data takes:
+
+    store_status.csv  store_id,status,timestamp_utc   ('2023-01-25 18:13:22.479220 UTC')
+    menu_hours.csv    store_id,dayOfWeek,start_time_local,end_time_local
+    timezones.csv     store_id,timezone_str
+
+The same arguments and seed always give the same files:
+
+    python -m benchmarks.generate --stores 10000 --polls-per-hour 1 --out /tmp/fleet
+"""
+import argparse
+import os
+import uuid
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_END = "2023-01-25 18:13:22.479220"
+DEFAULT_TIMEZONES = "America/Chicago:0.4,America/New_York:0.3,America/Denver:0.1,America/Los_Angeles:0.2"
+DEFAULT_SCHEDULES = "always:0.2,day:0.5,overnight:0.1,split:0.2"
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """'a:0.4,b:0.6' -> {'a': 0.4, 'b': 0.6}, weights normalized to sum to 1."""
+    weights = {name: float(weight) for name, weight in (item.rsplit(":", 1) for item in mix.split(","))}
+    total = sum(weights.values())
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def generate(out_dir: str, stores: int = 1000, days: int = 9, polls_per_hour: float = 1.0, timezone_mix: str = DEFAULT_TIMEZONES,
+             missing_timezone: float = 0.1, schedule_mix: str = DEFAULT_SCHEDULES, end: str = DEFAULT_END, seed: int = 0) -> Dict[str, str]:
+    """
+    Write the three CSVs for a fleet of `stores` into `out_dir`.
+
+    Args:
+        days (int): History per store, ending at `end`.
+        polls_per_hour (float): Mean observations per store and hour, at random instants.
+        timezone_mix (str): 'tz:weight,...' of the stores that have a timezone row.
+        missing_timezone (float): Share of stores without a timezone row (reports use America/Chicago).
+        schedule_mix (str): 'kind:weight,...' with kinds always (no menu hours), day,
+            overnight (hours past local midnight) and split (lunch and dinner).
+
+    Returns:
+        dict: Paths of store_status, menu_hours and timezones.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    store_ids = np.array([str(uuid.UUID(bytes=rng.bytes(16), version=4)) for _ in range(stores)])
+
+    # 1. Observations: a Poisson number per store at uniform instants, each store with its own reliability
+    end_ts = pd.Timestamp(end)
+    counts = rng.poisson(days * 24 * polls_per_hour, size=stores)
+    owner = np.repeat(np.arange(stores), counts)
+    offsets = rng.uniform(0, days * 24 * 3600, size=len(owner))
+    reliability = rng.beta(8, 2, size=stores)
+    status = pd.DataFrame({
+        "store_id": store_ids[owner],
+        "status": np.where(rng.random(len(owner)) < reliability[owner], "active", "inactive"),
+        "timestamp_utc": (end_ts - pd.to_timedelta(offsets, unit="s")).strftime("%Y-%m-%d %H:%M:%S.%f UTC"),
+    })
+
+    # 2. Timezones
+    has_timezone = rng.random(stores) >= missing_timezone
+    zones = parse_mix(timezone_mix)
+    timezones = pd.DataFrame({
+        "store_id": store_ids[has_timezone],
+        "timezone_str": rng.choice(list(zones), size=int(has_timezone.sum()), p=list(zones.values())),
+    })
+
+    # 3. Weekly menu hours by schedule kind
+    kinds = parse_mix(schedule_mix)
+    kind_per_store = rng.choice(list(kinds), size=stores, p=list(kinds.values()))
+    rows = []
+    for store_id, kind in zip(store_ids, kind_per_store):
+        if kind == "always":
+            continue
+        open_days = [day for day in range(7) if rng.random() < 0.9] or [0]
+        for day in open_days:
+            if kind == "day":
+                start = int(rng.integers(7, 12))
+                rows.append((store_id, day, f"{start:02d}:00:00", f"{start + int(rng.integers(6, 12)):02d}:00:00"))
+            elif kind == "overnight":
+                rows.append((store_id, day, f"{int(rng.integers(18, 23)):02d}:00:00", f"{int(rng.integers(1, 5)):02d}:30:00"))
+            elif kind == "split":
+                rows.append((store_id, day, "11:00:00", "14:30:00"))
+                rows.append((store_id, day, "17:30:00", "22:00:00"))
+    menu = pd.DataFrame(rows, columns=["store_id", "dayOfWeek", "start_time_local", "end_time_local"])
+
+    paths = {name: os.path.join(out_dir, f"{name}.csv") for name in ["store_status", "menu_hours", "timezones"]}
+    status.to_csv(paths["store_status"], index=False)
+    menu.to_csv(paths["menu_hours"], index=False)
+    timezones.to_csv(paths["timezones"], index=False)
+    return paths
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--stores", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=9)
+    parser.add_argument("--polls-per-hour", type=float, default=1.0)
+    parser.add_argument("--timezone-mix", default=DEFAULT_TIMEZONES)
+    parser.add_argument("--missing-timezone", type=float, default=0.1)
+    parser.add_argument("--schedule-mix", default=DEFAULT_SCHEDULES)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def generate_from_args(args: argparse.Namespace, out_dir: str) -> Dict[str, str]:
+    return generate(out_dir, args.stores, args.days, args.polls_per_hour, args.timezone_mix, args.missing_timezone, args.schedule_mix, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic store_status, menu_hours and timezones CSVs.")
+    add_arguments(parser)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    for name, path in generate_from_args(args, args.out).items():
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
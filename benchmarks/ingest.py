@@ -0,0 +1,62 @@
+"""
+Throughput of /load_data for the three CSVs of a generated fleet, through the FastAPI app
+in-process, against the database in DATABASE_URL (tables are dropped and recreated):
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.ingest --data /tmp/fleet
+"""
+import argparse
+import json
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+from src.db import migrations, models, session
+from src.main import app
+
+from . import results
+
+
+def reset_database():
+    models.Base.metadata.drop_all(bind=session.engine)
+    migrations.upgrade()
+
+
+def run(paths: dict) -> dict:
+    """Post store_status, menu_hours and timezones (as file1..file3) in one /load_data call."""
+    reset_database()
+    client = TestClient(app)
+    files = {field: (os.path.basename(paths[name]), open(paths[name], "rb"), "text/csv") for field, name in [("file1", "store_status"), ("file2", "menu_hours"), ("file3", "timezones")]}
+    try:
+        s_time = time.perf_counter()
+        response = client.post("/load_data", files=files)
+        seconds = time.perf_counter() - s_time
+    finally:
+        for _, f, _ in files.values():
+            f.close()
+    response.raise_for_status()
+
+    loads = response.json()
+    rows = sum(load.get("rows", 0) for load in loads.values() if isinstance(load, dict))
+    return {
+        "seconds": round(seconds, 3),
+        "rows": rows,
+        "rows_per_second": round(rows / seconds, 1),
+        "bytes": sum(os.path.getsize(path) for path in paths.values()),
+        "loads": loads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /load_data ingest.")
+    parser.add_argument("--data", required=True, help="directory written by benchmarks.generate")
+    parser.add_argument("--results-dir", default=results.RESULTS_DIR)
+    args = parser.parse_args()
+
+    result = run({name: os.path.join(args.data, f"{name}.csv") for name in ["store_status", "menu_hours", "timezones"]})
+    print(json.dumps(result, indent=2))
+    print(f"Saved {results.save('ingest', result, args.results_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Time compute_uptime_downtime over the whole fleet in the database in DATABASE_URL,
+once per engine, best and median of --repeat runs:
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.report --engines bulk,per_store
+"""
+import argparse
+import json
+import statistics
+import time
+
+from src.db import session
+from src.service import bulk_report, report_generator
+from src.utils import time_utils
+
+from . import results
+
+
+def run(engines: list, repeat: int = 3) -> dict:
+    db = session.SessionLocal()
+    try:
+        store_count = len(bulk_report.list_store_keys(db))
+        reference = bulk_report.reference_time(db)
+        timings = {}
+        for engine in engines:
+            report_generator.REPORT_ENGINE = engine
+            seconds = []
+            for _ in range(repeat):
+                time_utils.compile_schedule.cache_clear()  # every run starts cold
+                s_time = time.perf_counter()
+                rows = report_generator.compute_uptime_downtime(db, None, reference)
+                seconds.append(time.perf_counter() - s_time)
+            timings[engine] = {
+                "best_seconds": round(min(seconds), 3),
+                "median_seconds": round(statistics.median(seconds), 3),
+                "stores_per_second": round(store_count / min(seconds), 1),
+                "rows": len(rows),
+            }
+    finally:
+        db.close()
+    return {"stores": store_count, "repeat": repeat, "engines": timings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report computation.")
+    parser.add_argument("--engines", default="bulk", help="comma separated REPORT_ENGINE values")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--results-dir", default=results.RESULTS_DIR)
+    args = parser.parse_args()
+
+    result = run(args.engines.split(","), args.repeat)
+    print(json.dumps(result, indent=2))
+    print(f"Saved {results.save('report', result, args.results_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Benchmark results as JSON files, stamped with the commit and settings they were measured at."""
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SETTINGS = [
+    "INGEST_MODE", "INGEST_CHUNK_BYTES", "INGEST_EXECUTOR", "INGEST_WORKERS", "REPORT_ENGINE", "REPORT_SOURCE", "INTERPOLATION_MODE",
+    "REPORT_WORKERS", "REPORT_SHARDS", "STATUS_LOOKBACK_DAYS", "STATUS_CACHE", "STORE_STATUS_PARTITIONING", "WARMUP",
+]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save(name: str, result: dict, results_dir: str = RESULTS_DIR) -> str:
+    """Write `result` to results_dir/<name>-<commit>-<time>.json and return the path."""
+    database_url = os.getenv("DATABASE_URL", "")
+    stamped = {
+        "benchmark": name,
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "database": database_url.split(":", 1)[0],
+        "python": platform.python_version(),
+        "settings": {setting: os.environ[setting] for setting in SETTINGS if setting in os.environ},
+        **result,
+    }
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{name}-{stamped['commit']}-{int(time.time())}.json")
+    with open(path, "w") as f:
+        json.dump(stamped, f, indent=2, default=str)
+    return path
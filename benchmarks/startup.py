@@ -0,0 +1,106 @@
+"""
+Cold start of the API and the report worker against the database in DATABASE_URL: the
+import time of src.main and src.worker in fresh interpreters, and for every WARMUP mode
+the time from starting uvicorn to its first answered status poll and the latency of the
+first store uptime request, which needs pandas:
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.startup --warmup off,startup
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from src.db import migrations
+
+from . import results
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_seconds(module: str, repeat: int) -> float:
+    """Median seconds to import `module` in a new interpreter."""
+    code = f"import time; s_time = time.perf_counter(); import {module}; print(time.perf_counter() - s_time)"
+    seconds = [
+        float(subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout)
+        for _ in range(repeat)
+    ]
+    return round(statistics.median(seconds), 3)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def server_start(warmup: str, timeout: float = 60) -> dict:
+    """Start uvicorn with WARMUP=`warmup`, time its first answer and its first store uptime request."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    s_time = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, "WARMUP": warmup},
+    )
+    try:
+        while True:
+            if server.poll() is not None or time.perf_counter() - s_time > timeout:
+                raise RuntimeError(f"uvicorn with WARMUP={warmup} did not start")
+            try:
+                get(f"{base}/get_report?report_id=startup-benchmark")  # 404, answered without touching the ingest or report modules
+                break
+            except OSError:
+                time.sleep(0.01)
+        first_response = time.perf_counter() - s_time
+
+        s_time = time.perf_counter()
+        get(f"{base}/stores/startup-benchmark/uptime?start=2023-01-01T00:00:00&end=2023-01-02T00:00:00")
+        first_uptime = time.perf_counter() - s_time
+    finally:
+        server.terminate()
+        server.wait()
+    return {"first_response_seconds": round(first_response, 3), "first_store_uptime_ms": round(first_uptime * 1000, 1)}
+
+
+def run(warmups: list, repeat: int = 3) -> dict:
+    migrations.upgrade()  # the app no longer creates tables on import
+    result = {
+        "import_api_seconds": import_seconds("src.main", repeat),
+        "import_worker_seconds": import_seconds("src.worker", repeat),
+    }
+    for warmup in warmups:
+        runs = [server_start(warmup) for _ in range(repeat)]
+        result[f"warmup_{warmup}"] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to first request.")
+    parser.add_argument("--warmup", default="off,startup", help="WARMUP modes to start the server with")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--results-dir", default=results.RESULTS_DIR)
+    args = parser.parse_args()
+
+    result = run(args.warmup.split(","), args.repeat)
+    print(json.dumps(result, indent=2))
+    print(f"Saved {results.save('startup', result, args.results_dir)}")
+
+
+if __name__ == "__main__":
+    main()
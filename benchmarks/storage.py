@@ -0,0 +1,58 @@
+"""
+On-disk size of every table and of its indexes in the database in DATABASE_URL, to compare
+schemas across commits (e.g. store_id strings against store_key integers):
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.storage
+"""
+import argparse
+import json
+
+from sqlalchemy import text
+
+from src.db import models, session
+
+from . import results
+
+
+def table_sizes(conn) -> dict:
+    """{table: (table bytes, index bytes)}, partitions counted into their parent on PostgreSQL."""
+    sizes = {}
+    for table in models.Base.metadata.sorted_tables:
+        if conn.dialect.name == "postgresql":
+            row = conn.execute(text(
+                "SELECT coalesce(sum(pg_relation_size(relid)), 0), coalesce(sum(pg_indexes_size(relid)), 0) "
+                "FROM pg_partition_tree(CAST(:name AS regclass))"
+            ), {"name": table.name}).first()
+        elif conn.dialect.name == "sqlite":
+            # dbstat pages of the table and of every index on it (including the implicit unique ones)
+            row = conn.execute(text(
+                "SELECT coalesce(sum(CASE WHEN d.name = :name THEN d.pgsize END), 0), coalesce(sum(CASE WHEN d.name != :name THEN d.pgsize END), 0) "
+                "FROM dbstat d JOIN sqlite_master m ON m.name = d.name WHERE m.tbl_name = :name"
+            ), {"name": table.name}).first()
+        else:
+            continue
+        sizes[table.name] = (int(row[0]), int(row[1]))
+    return sizes
+
+
+def run() -> dict:
+    with session.engine.connect() as conn:
+        sizes = table_sizes(conn)
+    return {
+        "total_bytes": sum(table + indexes for table, indexes in sizes.values()),
+        "tables": {name: {"table_bytes": table, "index_bytes": indexes} for name, (table, indexes) in sizes.items() if table or indexes},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure table and index sizes.")
+    parser.add_argument("--results-dir", default=results.RESULTS_DIR)
+    args = parser.parse_args()
+
+    result = run()
+    print(json.dumps(result, indent=2))
+    print(f"Saved {results.save('storage', result, args.results_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Latency of GET /stores/{store_id}/uptime against the database in DATABASE_URL.
+
+Queries random stores over random windows (up to the API's limit) ending at or before
+the latest observation, through the FastAPI app in-process, and fails when the p99
+latency is above the target:
+
+    DATABASE_URL=... python -m benchmarks.store_uptime --queries 2000 --p99-ms 50
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from src.db import session, stores
+from src.main import app
+from src.service import bulk_report, store_uptime
+
+from . import results
+
+
+def run(queries: int, seed: int = 0) -> dict:
+    db = session.SessionLocal()
+    try:
+        store_ids = list(stores.ids_for(db, bulk_report.list_store_keys(db)))
+        reference = bulk_report.reference_time(db)
+    finally:
+        db.close()
+    if not store_ids:
+        raise SystemExit("No store status data, load some first")
+
+    rng = random.Random(seed)
+    client = TestClient(app)
+    latencies = []
+    for _ in range(queries):
+        end = reference - pd.Timedelta(minutes=rng.randrange(0, 7 * 24 * 60))
+        start = end - pd.Timedelta(minutes=rng.randrange(60, int(store_uptime.MAX_WINDOW.total_seconds() // 60)))
+        params = {"start": start.isoformat(), "end": end.isoformat()}
+        s_time = time.perf_counter()
+        response = client.get(f"/stores/{rng.choice(store_ids)}/uptime", params=params)
+        latencies.append((time.perf_counter() - s_time) * 1000)
+        response.raise_for_status()
+
+    return {
+        "queries": queries,
+        "stores": len(store_ids),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "max_ms": round(float(np.max(latencies)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--p99-ms", type=float, default=50.0, help="fail above this p99 latency")
+    parser.add_argument("--results-dir", default=results.RESULTS_DIR)
+    args = parser.parse_args()
+
+    result = run(args.queries, args.seed)
+    result["p99_target_ms"] = args.p99_ms
+    print(json.dumps(result, indent=2))
+    print(f"Saved {results.save('store_uptime', result, args.results_dir)}")
+    if result["p99_ms"] > args.p99_ms:
+        sys.exit(f"p99 {result['p99_ms']} ms is above the {args.p99_ms} ms target")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import io
+import os
+
+import pandas as pd
+from sqlalchemy import insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+
+INGEST_MODE = os.getenv("INGEST_MODE", "copy") # "copy" (PostgreSQL COPY into a staging table) or "insert" (multi-row INSERT)
+
+
+def insert_rows(db: Session, table, df: pd.DataFrame, conflict_columns: list) -> int:
+    """
+    Insert `df` into `table`, skipping rows that conflict on `conflict_columns`.
+
+    PostgreSQL uses COPY + a set-based merge unless INGEST_MODE=insert, every other
+    backend (SQLite for local runs and tests) uses multi-row INSERTs.
+
+    Returns:
+        int: Rows actually inserted; len(df) minus this is the number of duplicates.
+    """
+    if df.empty:
+        return 0
+    if db.get_bind().dialect.name == "postgresql" and INGEST_MODE == "copy":
+        return copy_merge(db, table, df)
+    return insert_ignore(db, table, df, conflict_columns)
+
+
+def copy_merge(db: Session, table, df: pd.DataFrame) -> int:
+    """
+    COPY `df` into a session-local staging table and merge it into `table` with a single
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+
+    The staging table is a TEMP table: unlogged like an UNLOGGED table, but private to the
+    connection so concurrent loads don't see each other's rows, and emptied on commit.
+    """
+    quote = db.get_bind().dialect.identifier_preparer.quote
+    columns = ", ".join(quote(column) for column in df.columns)
+    target = quote(table.name)
+    staging = quote(f"{table.name}_staging")
+
+    db.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS AS SELECT {columns} FROM {target} WITH NO DATA"))
+
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+    result = db.execute(text(f"INSERT INTO {target} ({columns}) SELECT {columns} FROM {staging} ON CONFLICT DO NOTHING"))
+    db.commit()
+    return result.rowcount
+
+
+def insert_ignore(db: Session, table, df: pd.DataFrame, conflict_columns: list) -> int:
+    """
+    One executemany INSERT that skips conflicting rows. SQLAlchemy batches it into multi-row
+    VALUES sized to the backend's parameter limit and compiles the statement once, instead
+    of once per batch. Inserted rows are counted from RETURNING where the backend has it.
+    """
+    records = df.astype(object).where(df.notna(), None).to_dict(orient="records")
+    stmt = dialect_insert(db, table)
+    if hasattr(stmt, "on_conflict_do_nothing"):
+        stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+    else:
+        stmt = stmt.prefix_with("IGNORE")
+
+    if db.get_bind().dialect.insert_executemany_returning:
+        inserted = len(db.execute(stmt.returning(*table.primary_key.columns), records).all())
+    else:
+        inserted = db.execute(stmt, records).rowcount
+    db.commit()
+    return inserted
+
+
+def upsert_rows(db: Session, table, records: list, conflict_columns: list, update_columns: list) -> int:
+    """INSERT ... ON CONFLICT DO UPDATE of `update_columns` as one executemany, like insert_ignore. Caller commits."""
+    if not records:
+        return 0
+    stmt = dialect_insert(db, table)
+    stmt = stmt.on_conflict_do_update(index_elements=conflict_columns, set_={column: stmt.excluded[column] for column in update_columns})
+    db.execute(stmt, records)
+    return len(records)
+
+
+def dialect_insert(db: Session, table):
+    """INSERT construct of the session's backend, with ON CONFLICT support where it exists."""
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return pg_insert(table)
+    if name == "sqlite":
+        return sqlite_insert(table)
+    return insert(table)
@@ -0,0 +1,156 @@
+"""
+Schema migrations for databases created by earlier versions.
+
+create_all only creates missing tables, it never changes existing ones. Every step
+here inspects the live schema and only acts when it is out of date, so running the
+module again (or against a fresh database) is a no-op:
+
+    python -m src.db.migrations
+"""
+from sqlalchemy import ForeignKeyConstraint, String, UniqueConstraint, inspect, text
+from sqlalchemy.schema import AddConstraint
+from sqlalchemy.orm import Session
+
+from . import models, partitioning, session
+from ..service import rollup, store_uptime
+from ..utils import logger
+
+
+logger = logger.get_logger("migrations")
+
+
+def store_status_native_timestamps(conn) -> bool:
+    """store_status.timestamp_utc: '2023-01-22 12:09:39.388884 UTC' strings -> timestamptz, converted in place."""
+    column = next(c for c in inspect(conn).get_columns("store_status") if c["name"] == "timestamp_utc")
+    if conn.dialect.name == "postgresql":
+        if not isinstance(column["type"], String):
+            return False
+        conn.execute(text(
+            "ALTER TABLE store_status ALTER COLUMN timestamp_utc TYPE timestamptz "
+            "USING (regexp_replace(timestamp_utc, ' UTC$', '') || '+00')::timestamptz"
+        ))
+        return True
+    if conn.dialect.name == "sqlite":
+        # SQLite keeps datetimes as text, only the ' UTC' suffix has to go for them to parse
+        result = conn.execute(text("UPDATE store_status SET timestamp_utc = substr(timestamp_utc, 1, length(timestamp_utc) - 4) WHERE timestamp_utc LIKE '% UTC'"))
+        return result.rowcount > 0
+    return False
+
+
+def store_surrogate_keys(conn) -> bool:
+    """
+    store_id strings -> store_key integers referencing the store table, in every table that
+    still has a store_id column. PostgreSQL swaps the column in place (which also works on a
+    partitioned store_status), SQLite can't drop indexed columns and rebuilds the table.
+    """
+    converted = False
+    inspector = inspect(conn)
+    for table in models.Base.metadata.sorted_tables:
+        if table.name == models.Store.__tablename__ or "store_key" not in table.c:
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        if "store_id" not in columns or "store_key" in columns:
+            continue
+
+        # 1. A key for every store_id the table mentions
+        conn.execute(text(
+            f"INSERT INTO store (store_id) SELECT DISTINCT t.store_id FROM {table.name} t "
+            f"WHERE t.store_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM store s WHERE s.store_id = t.store_id) ORDER BY t.store_id"
+        ))
+
+        # 2. Swap the column, with the constraints on it
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN store_key INTEGER"))
+            conn.execute(text(f"UPDATE {table.name} t SET store_key = s.store_key FROM store s WHERE s.store_id = t.store_id"))
+            # dropping the column drops the unique constraints and indexes it is part of
+            conn.execute(text(f"ALTER TABLE {table.name} DROP COLUMN store_id"))
+            for constraint in table.constraints:
+                if isinstance(constraint, (UniqueConstraint, ForeignKeyConstraint)) and "store_key" in constraint.columns:
+                    conn.execute(AddConstraint(constraint))
+        else:
+            legacy = f"{table.name}_legacy"
+            conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {legacy}"))
+            for index in inspect(conn).get_indexes(legacy):
+                conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+            table.create(conn)
+            kept = [f'"{column.name}"' for column in table.columns if column.name in columns]
+            conn.execute(text(
+                f"INSERT INTO {table.name} ({', '.join(kept)}, store_key) SELECT {', '.join(f'l.{name}' for name in kept)}, s.store_key "
+                f"FROM {legacy} l LEFT JOIN store s ON s.store_id = l.store_id"
+            ))
+            conn.execute(text(f"DROP TABLE {legacy}"))
+        converted = True
+    return converted
+
+
+def add_missing_columns(conn) -> bool:
+    """Nullable columns added to the models after their tables were created."""
+    added = False
+    inspector = inspect(conn)
+    for table in models.Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                added = True
+    return added
+
+
+def create_missing_indexes(conn) -> bool:
+    """Indexes declared on the models after their tables were created."""
+    created = False
+    inspector = inspect(conn)
+    for table in models.Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                created = True
+    return created
+
+
+def backfill_store_status_prefix(conn) -> bool:
+    """Prefix sums for the /stores/{store_id}/uptime API of observations loaded before it existed."""
+    has_status = conn.execute(text("SELECT 1 FROM store_status LIMIT 1")).first()
+    has_prefix = conn.execute(text("SELECT 1 FROM store_status_prefix LIMIT 1")).first()
+    if not has_status or has_prefix:
+        return False
+    with Session(bind=conn) as db:
+        store_uptime.rebuild_prefix_sums(db)
+    return True
+
+
+def backfill_store_status_hourly(conn) -> bool:
+    """Hourly rollups for REPORT_SOURCE=rollup of observations loaded before they were maintained."""
+    has_status = conn.execute(text("SELECT 1 FROM store_status LIMIT 1")).first()
+    has_hourly = conn.execute(text("SELECT 1 FROM store_status_hourly LIMIT 1")).first()
+    if not has_status or has_hourly:
+        return False
+    with Session(bind=conn) as db:
+        rollup.rebuild_hourly_rollups(db)
+    return True
+
+
+MIGRATIONS = [
+    store_status_native_timestamps,
+    store_surrogate_keys,
+    partitioning.convert_store_status, # only with STORE_STATUS_PARTITIONING=day|week on PostgreSQL
+    add_missing_columns,
+    create_missing_indexes,
+    backfill_store_status_prefix,
+    backfill_store_status_hourly,
+]
+
+
+def upgrade(engine=None):
+    engine = engine or session.engine
+    models.Base.metadata.create_all(bind=engine)
+    for migration in MIGRATIONS:
+        with engine.begin() as conn:
+            if migration(conn):
+                logger.info(f"Applied migration {migration.__name__}")
+
+
+if __name__ == "__main__":
+    upgrade()
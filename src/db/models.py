@@ -1,43 +1,172 @@
-from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
-from sqlalchemy.ext.declarative import declarative_base
-
-Base = declarative_base()
-
-class StoreStatus(Base):
-    __tablename__ = "store_status"
-    id = Column(Integer, primary_key=True, index=True)
-    store_id = Column(String, index=True)
-    timestamp_utc = Column(String)
-    status = Column(String) 
-
-    __table_args__ = (
-        UniqueConstraint("store_id", "timestamp_utc", name="uix_store_timestamp"),
-    )
-
-class MenuHour(Base):
-    __tablename__ = "menu_hour"
-    id = Column(Integer, primary_key=True, index=True)
-    store_id = Column(String)
-    dayOfWeek = Column(Integer)
-    start_time_local = Column(String,default="00:00:00")
-    end_time_local = Column(String, default="23:59:59")
-
-    __table_args__ = (
-        UniqueConstraint("store_id", "dayOfWeek","start_time_local","end_time_local", name="uix_menu_timestamp"),
-    )
-
-class Timezone(Base):
-    __tablename__ = "timezone"
-    id = Column(Integer, primary_key=True, index=True)
-    store_id = Column(String, unique=True)
-    timezone_str = Column(String,default="America/Chicago")
-    __table_args__ = (
-        UniqueConstraint("store_id", "timezone_str", name="uix_store_timezone"),
-    )
-
-class Report(Base):
-    __tablename__ = "report"
-    id = Column(String, primary_key=True, index=True)
-    status = Column(String)  # "Running" or "Complete"
-    created_at = Column(DateTime)
-    file_path = Column(String, nullable=True)
\ No newline at end of file
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Float, Boolean, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.ext.declarative import declarative_base
+
+Base = declarative_base()
+
+class Store(Base):
+    __tablename__ = "store"
+    store_key = Column(Integer, primary_key=True)  # compact surrogate key every other table references stores by
+    store_id = Column(String, unique=True)  # the UUID of the uploads and reports
+
+class StoreStatus(Base):
+    __tablename__ = "store_status"
+    id = Column(Integer, primary_key=True, index=True)
+    store_key = Column(Integer, ForeignKey("store.store_key"), index=True)
+    timestamp_utc = Column(DateTime(timezone=True))
+    status = Column(String) 
+
+    __table_args__ = (
+        UniqueConstraint("store_key", "timestamp_utc", name="uix_store_timestamp"), # also the (store_key, timestamp_utc) lookup index
+        Index("ix_store_status_timestamp_utc", "timestamp_utc"), # reference time and time-range scans across stores
+    )
+
+class StoreStatusHourly(Base):
+    __tablename__ = "store_status_hourly"
+    id = Column(Integer, primary_key=True, index=True)
+    store_key = Column(Integer, ForeignKey("store.store_key"))
+    hour_utc = Column(DateTime(timezone=True))
+    first_offset_seconds = Column(Float)  # from the start of the hour to its first observation
+    first_status = Column(String)
+    active_seconds = Column(Float)  # from the first observation to the end of the hour
+    inactive_seconds = Column(Float)
+    last_status = Column(String)
+
+    __table_args__ = (
+        UniqueConstraint("store_key", "hour_utc", name="uix_store_hour"),
+    )
+
+class StoreStatusPrefix(Base):
+    __tablename__ = "store_status_prefix"
+    id = Column(Integer, primary_key=True, index=True)
+    store_key = Column(Integer, ForeignKey("store.store_key"))
+    timestamp_utc = Column(DateTime(timezone=True))
+    status = Column(String)
+    cum_active_seconds = Column(Float)  # time the store spent active from its first observation up to this one
+    cum_inactive_seconds = Column(Float)
+
+    __table_args__ = (
+        UniqueConstraint("store_key", "timestamp_utc", name="uix_store_prefix"), # also the per-store range lookup index
+    )
+
+class MenuHour(Base):
+    __tablename__ = "menu_hour"
+    id = Column(Integer, primary_key=True, index=True)
+    store_key = Column(Integer, ForeignKey("store.store_key"))
+    dayOfWeek = Column(Integer)
+    start_time_local = Column(String,default="00:00:00")
+    end_time_local = Column(String, default="23:59:59")
+
+    __table_args__ = (
+        UniqueConstraint("store_key", "dayOfWeek","start_time_local","end_time_local", name="uix_menu_timestamp"),
+    )
+
+class Timezone(Base):
+    __tablename__ = "timezone"
+    id = Column(Integer, primary_key=True, index=True)
+    store_key = Column(Integer, ForeignKey("store.store_key"), unique=True)
+    timezone_str = Column(String,default="America/Chicago")
+    __table_args__ = (
+        UniqueConstraint("store_key", "timezone_str", name="uix_store_timezone"),
+    )
+
+class Report(Base):
+    __tablename__ = "report"
+    id = Column(String, primary_key=True, index=True)
+    status = Column(String)  # "Running", "Complete", "Failed" or "Expired" (file evicted from the cache)
+    created_at = Column(DateTime)
+    file_path = Column(String, nullable=True)
+    format = Column(String, nullable=True)  # "csv" (also when missing), "csv.gz", "parquet" or "arrow"
+    data_version = Column(String, nullable=True, index=True)  # watermark of the data the report was computed from
+    last_accessed_at = Column(DateTime, nullable=True)  # cache hits and downloads, for LRU eviction of the file
+    base_report_id = Column(String, nullable=True)  # incremental reports: the report unchanged stores were copied from
+    started_at = Column(DateTime, nullable=True)  # start of the latest run, a resumed run starts again, for throughput and ETA
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+    id = Column(Integer, primary_key=True)  # a single row, id 1
+    generation = Column(Integer, default=0)  # bumped by every ingest that changed data
+    max_timestamp = Column(DateTime(timezone=True), nullable=True)  # latest store_status observation at that point
+    updated_at = Column(DateTime)
+
+class StoreChange(Base):
+    __tablename__ = "store_change"
+    id = Column(Integer, primary_key=True, index=True)
+    store_key = Column(Integer, ForeignKey("store.store_key"))
+    generation = Column(Integer)  # data_version generation whose ingest inserted rows of the store
+
+    __table_args__ = (
+        UniqueConstraint("generation", "store_key", name="uix_generation_store"),
+    )
+
+class ReportShard(Base):
+    __tablename__ = "report_shard"
+    id = Column(Integer, primary_key=True, index=True)
+    report_id = Column(String, index=True)
+    shard = Column(Integer)
+    store_count = Column(Integer)
+    status = Column(String)  # "Pending", "Complete" or "Failed"
+    seconds = Column(Float, nullable=True)
+    error = Column(String, nullable=True)
+    file_path = Column(String, nullable=True)  # partial CSV of a Complete shard, the checkpoint a resumed run reuses
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("report_id", "shard", name="uix_report_shard"),
+    )
+
+
+class ReportJob(Base):
+    __tablename__ = "report_job"
+    id = Column(Integer, primary_key=True, index=True)  # also the FIFO order within a priority
+    report_id = Column(String, unique=True)
+    priority = Column(Integer, default=0)  # higher runs first
+    status = Column(String)  # "Queued", "Running", "Complete" or "Failed"
+    enqueued_at = Column(DateTime)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)  # a Running job whose lease expired is claimed again
+    error = Column(String, nullable=True)
+    profile = Column(Boolean, nullable=True)  # run under cProfile, see report_generator.REPORT_PROFILE_DIR
+
+    __table_args__ = (
+        Index("ix_report_job_claim", "status", "priority", "id"),
+    )
+
+class IngestedContent(Base):
+    __tablename__ = "ingested_content"
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String)  # table the content was loaded into
+    kind = Column(String)  # "file" (a whole upload) or "block" (one INGEST_CHUNK_BYTES block of it)
+    content_hash = Column(String)  # sha256 hex digest of the bytes
+    rows = Column(Integer)
+    bytes = Column(BigInteger)
+    ingested_at = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint("table_name", "kind", "content_hash", name="uix_ingested_content"),
+    )
+
+class Upload(Base):
+    __tablename__ = "upload"
+    id = Column(String, primary_key=True, index=True)
+    kind = Column(String)  # "store_status", "menu_hours" or "timezones", the /load_data file it stands for
+    filename = Column(String)
+    size = Column(BigInteger)
+    chunk_bytes = Column(Integer)  # every chunk but the last has exactly this size
+    content_hash = Column(String, nullable=True)  # sha256 of the whole file when the client sent it, checked on commit
+    status = Column(String)  # "Receiving", "Loading", "Complete" or "Failed"
+    created_at = Column(DateTime)
+
+class UploadChunk(Base):
+    __tablename__ = "upload_chunk"
+    id = Column(Integer, primary_key=True, index=True)
+    upload_id = Column(String, index=True)
+    chunk = Column(Integer)
+    content_hash = Column(String)  # sha256 of the chunk as received
+    bytes = Column(Integer)
+
+    __table_args__ = (
+        UniqueConstraint("upload_id", "chunk", name="uix_upload_chunk"),
+    )
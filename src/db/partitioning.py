@@ -0,0 +1,153 @@
+"""
+Optional declarative range partitioning of store_status by day or week (PostgreSQL only).
+
+With STORE_STATUS_PARTITIONING=day|week the migration converts store_status into a table
+partitioned on timestamp_utc, ingest creates the partition of every period it sees data
+for, and STORE_STATUS_RETENTION_DAYS drops whole partitions that fell out of retention
+instead of DELETEing rows. Report queries already filter on timestamp_utc, so PostgreSQL
+prunes them down to the partitions of the last week.
+"""
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+from sqlalchemy import func, inspect, text
+from sqlalchemy.exc import IntegrityError, ProgrammingError
+from sqlalchemy.orm import Session
+
+from . import models
+from ..utils import logger
+
+
+logger = logger.get_logger("partitioning")
+
+STORE_STATUS_PARTITIONING = os.getenv("STORE_STATUS_PARTITIONING", "off") # "day", "week" or "off"
+STORE_STATUS_RETENTION_DAYS = int(os.getenv("STORE_STATUS_RETENTION_DAYS", "0")) # 0 keeps every partition
+PARTITION_NAME = re.compile(r"^store_status_p(\d{8})$")
+
+
+def enabled(bind) -> bool:
+    return STORE_STATUS_PARTITIONING in ("day", "week") and bind.dialect.name == "postgresql"
+
+
+def period_start(ts: pd.Timestamp) -> pd.Timestamp:
+    """Start (UTC midnight) of the day or ISO week containing `ts`."""
+    day = ts.tz_convert("UTC").normalize()
+    return day - pd.Timedelta(days=day.weekday()) if STORE_STATUS_PARTITIONING == "week" else day
+
+
+def period_length() -> timedelta:
+    return timedelta(days=7) if STORE_STATUS_PARTITIONING == "week" else timedelta(days=1)
+
+
+def is_partitioned(conn) -> bool:
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'store_status'"
+    )).scalar())
+
+
+def create_partition(conn, start: pd.Timestamp):
+    end = start + period_length()
+    name = f"store_status_p{start:%Y%m%d}"
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF store_status "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    return name
+
+
+def convert_store_status(conn) -> bool:
+    """
+    Migration step: rebuild a plain store_status as a partitioned table, keeping ids and the
+    id sequence. The primary key has to include the partition key, so it becomes (id, timestamp_utc).
+    """
+    if not enabled(conn) or is_partitioned(conn):
+        return False
+
+    conn.execute(text("ALTER TABLE store_status RENAME TO store_status_unpartitioned"))
+    conn.execute(text("ALTER TABLE store_status_unpartitioned RENAME CONSTRAINT store_status_pkey TO store_status_unpartitioned_pkey"))
+    conn.execute(text("ALTER TABLE store_status_unpartitioned DROP CONSTRAINT uix_store_timestamp"))
+    for index in inspect(conn).get_indexes("store_status_unpartitioned"):
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+
+    conn.execute(text(
+        "CREATE TABLE store_status ("
+        " id INTEGER NOT NULL DEFAULT nextval('store_status_id_seq'),"
+        " store_key INTEGER REFERENCES store (store_key),"
+        " timestamp_utc TIMESTAMPTZ NOT NULL,"
+        " status VARCHAR,"
+        " PRIMARY KEY (id, timestamp_utc),"
+        " CONSTRAINT uix_store_timestamp UNIQUE (store_key, timestamp_utc)"
+        ") PARTITION BY RANGE (timestamp_utc)"
+    ))
+    for index in models.StoreStatus.__table__.indexes:
+        index.create(conn)
+
+    bounds = conn.execute(text("SELECT min(timestamp_utc), max(timestamp_utc) FROM store_status_unpartitioned")).first()
+    if bounds[0] is not None:
+        start, last = period_start(pd.Timestamp(bounds[0])), pd.Timestamp(bounds[1])
+        while start <= last:
+            create_partition(conn, start)
+            start += period_length()
+        conn.execute(text("INSERT INTO store_status (id, store_key, timestamp_utc, status) SELECT id, store_key, timestamp_utc, status FROM store_status_unpartitioned"))
+
+    conn.execute(text("ALTER SEQUENCE store_status_id_seq OWNED BY store_status.id"))
+    conn.execute(text("DROP TABLE store_status_unpartitioned"))
+    return True
+
+
+def ensure_partitions(db: Session, timestamps: pd.Series):
+    """
+    Create the partitions an ingest batch needs before it is inserted. No-op unless partitioning is on.
+
+    Nothing is cached between batches: drop_expired_partitions may have dropped a partition
+    from another process since, so every batch runs CREATE TABLE IF NOT EXISTS for its periods.
+    """
+    bind = db.get_bind()
+    if not enabled(bind) or timestamps.empty:
+        return
+
+    starts = {period_start(ts) for ts in timestamps.dt.floor("D").unique()}
+    for start in sorted(starts):
+        try:
+            with bind.begin() as conn:
+                create_partition(conn, start)
+        except (ProgrammingError, IntegrityError) as e:
+            # another loader (or parallel ingest process) created it between IF NOT EXISTS and the create
+            logger.info(f"Partition for {start} already exists: {e}")
+
+
+def drop_expired_partitions(db: Session) -> list:
+    """
+    Drop partitions whose whole range is older than STORE_STATUS_RETENTION_DAYS before the
+    latest observation. Returns the dropped partition names.
+    """
+    bind = db.get_bind()
+    if not enabled(bind) or STORE_STATUS_RETENTION_DAYS <= 0:
+        return []
+
+    latest = db.query(func.max(models.StoreStatus.timestamp_utc)).scalar()
+    if latest is None:
+        return []
+    cutoff = pd.Timestamp(latest).tz_convert("UTC") - timedelta(days=STORE_STATUS_RETENTION_DAYS)
+
+    partitions = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'store_status'"
+    )).scalars().all()
+
+    dropped = []
+    for name in partitions:
+        match = PARTITION_NAME.match(name)
+        if not match:
+            continue
+        start = pd.Timestamp(datetime.strptime(match.group(1), "%Y%m%d").replace(tzinfo=timezone.utc))
+        if start + period_length() <= cutoff:
+            db.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    db.commit()
+
+    if dropped:
+        logger.info(f"Dropped {len(dropped)} store_status partitions older than {cutoff}")
+    return dropped
@@ -0,0 +1,15 @@
+from typing import List, Optional
+
+import pandas as pd
+from sqlalchemy import false
+
+
+IN_BATCH_SIZE = 5000  # store keys (or ids) per IN (...) list when loading a subset of stores
+
+
+def read_for_stores(conn, stmt, column, stores: Optional[List]) -> pd.DataFrame:
+    """Run `stmt` for all stores, or for the `stores` (values of `column`) in IN-list batches small enough for every backend."""
+    if stores is None:
+        return pd.read_sql(stmt, conn)
+    frames = [pd.read_sql(stmt.where(column.in_(stores[i:i + IN_BATCH_SIZE])), conn) for i in range(0, len(stores), IN_BATCH_SIZE)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.read_sql(stmt.where(false()), conn)
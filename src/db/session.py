@@ -1,8 +1,86 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 import os
 
+from ..utils import metrics
+
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5")) # connections kept open per engine and process
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10")) # extra connections opened under load, closed when returned
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30")) # seconds to wait for a free connection before failing
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # seconds after which a connection is replaced, before servers drop it
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def pool_options(url: str) -> dict:
+    # pre-ping replaces connections the server closed instead of failing the request that gets them
+    options = {"pool_pre_ping": True, "pool_recycle": DB_POOL_RECYCLE}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+def async_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=f"{url.get_backend_name()}+{ASYNC_DRIVERS[url.get_backend_name()]}")
+
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
+metrics.track_queries(engine)
+if make_url(DATABASE_URL).get_backend_name() == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _sqlite_wal(dbapi_connection, connection_record):
+        # local runs and benchmarks: status polls read while the ingest process writes
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+# request handlers that only read a few rows use the async driver and never wait for a threadpool slot;
+# backends without one here (see ASYNC_DRIVERS) serve them from the sync engine in the threadpool instead
+async_engine, AsyncSessionLocal = None, None
+if make_url(DATABASE_URL).get_backend_name() in ASYNC_DRIVERS:
+    async_engine = create_async_engine(async_url(DATABASE_URL), **pool_options(DATABASE_URL))
+    metrics.track_queries(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+class ThreadpoolSession:
+    """The run_sync of an AsyncSession over a sync session, for backends without an async driver."""
+    def __init__(self, db):
+        self.db = db
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.db, *args, **kwargs)
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        db = SessionLocal()
+        try:
+            yield ThreadpoolSession(db)
+        finally:
+            db.close()
+        return
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_stats() -> dict:
+    """Connections of both engines' pools: {(engine, stat): count}, for /metrics."""
+    stats = {}
+    engines = [("sync", engine)] + ([("async", async_engine.sync_engine)] if async_engine is not None else [])
+    for name, pool in [(name, bound.pool) for name, bound in engines]:
+        if not hasattr(pool, "checkedout"):  # pools without a size, e.g. SQLite in-memory
+            continue
+        # overflow() counts up from -size, it only turns positive once connections beyond the pool are open
+        for stat, value in [("size", pool.size()), ("idle", pool.checkedin()), ("in_use", pool.checkedout()), ("overflow", max(pool.overflow(), 0))]:
+            stats[(("engine", name), ("stat", stat))] = value
+    return stats
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
\ No newline at end of file
+metrics.register_gauge("db_pool_connections", pool_stats)
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+store_id (UUID) <-> store_key (integer surrogate) mapping of the store dimension table.
+
+Every other table references stores by store_key, so rows, indexes, joins and groupbys
+handle 4-byte integers instead of 36-character strings. Ingest maps the store_ids of each
+block through keys_for, which adds the stores it has not seen yet, and reports map their
+keys back through ids_for when they write rows. A key never changes once assigned, so
+both directions are cached per process for good.
+"""
+import threading
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import bulk_load, models, queries
+
+
+_key_by_id: Dict[str, int] = {}
+_id_by_key: Dict[int, str] = {}
+_lock = threading.Lock()
+
+
+def _remember(rows: pd.DataFrame):
+    with _lock:
+        _key_by_id.update(zip(rows["store_id"], rows["store_key"].astype(int)))
+        _id_by_key.update(zip(rows["store_key"].astype(int), rows["store_id"]))
+
+
+def keys_for(db: Session, store_ids: Iterable[str], create: bool = True) -> np.ndarray:
+    """
+    store_key of every store_id, adding the stores without one when `create` (ingest).
+    Unknown stores map to -1 otherwise.
+    """
+    store_ids = pd.Series(store_ids, dtype=object).astype(str)
+    missing = [store_id for store_id in store_ids.unique() if store_id not in _key_by_id]
+    if missing:
+        S = models.Store
+        if create:
+            # concurrent loaders may add the same stores, the conflicting rows are skipped
+            bulk_load.insert_rows(db, S.__table__, pd.DataFrame({"store_id": missing}), ["store_id"])
+        _remember(queries.read_for_stores(db.connection(), select(S.store_id, S.store_key), S.store_id, missing))
+    return store_ids.map(_key_by_id).fillna(-1).to_numpy(dtype=np.int64)
+
+
+def key_for(db: Session, store_id: str) -> Optional[int]:
+    """store_key of one store_id, None when the store is unknown."""
+    key = int(keys_for(db, [store_id], create=False)[0])
+    return key if key >= 0 else None
+
+
+def ids_for(db: Session, store_keys: Iterable[int]) -> np.ndarray:
+    """store_id of every store_key, for writing report rows."""
+    store_keys = pd.Series(store_keys, dtype=np.int64)
+    missing = [int(key) for key in store_keys.unique() if key not in _id_by_key]
+    if missing:
+        S = models.Store
+        _remember(queries.read_for_stores(db.connection(), select(S.store_id, S.store_key), S.store_key, missing))
+    return store_keys.map(_id_by_key).to_numpy(dtype=object)
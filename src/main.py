@@ -1,12 +1,33 @@
-#entry point
-from fastapi import FastAPI
-
-from .router import report_endpoint, data_loader
-from .db import session,models
-
-
-models.Base.metadata.create_all(bind=session.engine)
-
-app=FastAPI()
-app.include_router(report_endpoint.router) #endpoint for generating report
-app.include_router(data_loader.router) # endpoint for loading csv data
+#entry point
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+
+from .router import report_endpoint, data_loader, store_endpoint, metrics_endpoint
+from .db import session,models
+from . import warmup
+
+
+# tables are created and upgraded by `python -m src.db.migrations`, not by every process that imports the app
+SCHEMA_ON_STARTUP = os.getenv("SCHEMA_ON_STARTUP", "off") # "create" creates missing tables when the app starts (local runs), "off" leaves it to the migration
+
+if warmup.WARMUP == "prefork":
+    # imported before the server forks its workers, so they share the modules
+    warmup.warm_up(start_pools=False)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SCHEMA_ON_STARTUP == "create":
+        await run_in_threadpool(models.Base.metadata.create_all, bind=session.engine)
+    if warmup.WARMUP == "startup":
+        await run_in_threadpool(warmup.warm_up)
+    yield
+    await run_in_threadpool(warmup.shut_down)
+
+app=FastAPI(lifespan=lifespan)
+app.include_router(report_endpoint.router) #endpoint for generating report
+app.include_router(data_loader.router) # endpoint for loading csv data
+app.include_router(store_endpoint.router) # per-store uptime over arbitrary windows
+app.include_router(metrics_endpoint.router) # Prometheus metrics
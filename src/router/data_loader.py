@@ -1,29 +1,163 @@
-from fastapi import APIRouter, Depends, UploadFile
+import asyncio
+import time
+from typing import Optional
+from uuid import uuid4
 
-from ..utils import csv_loader
+from fastapi import APIRouter, Header, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from ..utils.lazy import lazy_import
 from ..db import session
 from ..schema import report as report_schema
 
 router = APIRouter()
 
-def get_db():
-    db = session.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# imported by the first load, with pandas and the ingest pipeline
+csv_loader = lazy_import("..utils.csv_loader", __package__)
+content_hash = lazy_import("..service.content_hash", __package__)
+uploads = lazy_import("..service.uploads", __package__)
+
+# the csv_loader function loading each /load_data file, also the kinds of chunked uploads
+LOADERS = {
+    "store_status": "load_store_status",
+    "menu_hours": "load_menu_hours",
+    "timezones": "load_timezones",
+}
 
 @router.post("/load_data",response_model=report_schema.LoadDataResponse)
-async def load_csv_data(db = Depends(get_db),file1:UploadFile = None,file2:UploadFile = None,file3:UploadFile = None):
+async def load_csv_data(file1:UploadFile = None,file2:UploadFile = None,file3:UploadFile = None):
     
     try:
-        load_store_response=await csv_loader.load_store_status(db,file1) if file1 else {"message": "No file provided for store status"}
-        load_menu_response=await csv_loader.load_menu_hours(db, file2) if file2 else {"message": "No file provided for menu hours"}
-        load_timezone_response = await csv_loader.load_timezones(db, file3) if file3 else {"message": "No file provided for timezones"}
+        # the three files load concurrently, each with its own session; their blocks share the ingest workers
+        s_time = time.time()
+        load_store_response, load_menu_response, load_timezone_response = await asyncio.gather(
+            load_file(csv_loader.load_store_status, file1, "No file provided for store status"),
+            load_file(csv_loader.load_menu_hours, file2, "No file provided for menu hours"),
+            load_file(csv_loader.load_timezones, file3, "No file provided for timezones"),
+        )
         return {
             "load_store_status": load_store_response,
             "load_menu_hours": load_menu_response,
-            "load_timezones": load_timezone_response
+            "load_timezones": load_timezone_response,
+            "summary": summarize([load_store_response, load_menu_response, load_timezone_response], time.time() - s_time),
         }
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+async def load_file(loader, file: UploadFile, missing_message: str) -> dict:
+    if not file:
+        return {"message": missing_message}
+    db = session.SessionLocal()
+    try:
+        return await loader(db, file)
+    finally:
+        db.close()
+
+def summarize(responses: list, seconds: float) -> dict:
+    """Combined throughput of the files that loaded; `seconds` is the wall time of the whole request."""
+    loaded = [response for response in responses if "rows" in response]
+    rows = sum(response["rows"] for response in loaded)
+    return {
+        "files": len(loaded),
+        "rows": rows,
+        "inserted": sum(response["inserted"] for response in loaded),
+        "duplicates": sum(response["duplicates"] for response in loaded),
+        "skipped_blocks": sum(response["skipped_blocks"] for response in loaded),
+        "bytes": sum(response["bytes"] for response in loaded),
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / max(seconds, 1e-9), 1),
+    }
+
+@router.post("/uploads", response_model=report_schema.UploadStatusResponse)
+def init_upload(kind: str, filename: str, size: int, sha256: Optional[str] = None, chunk_bytes: Optional[int] = None):
+    """Start a resumable upload of one /load_data file, or skip it when a file with `sha256` was loaded before."""
+    chunk_bytes = chunk_bytes or uploads.UPLOAD_CHUNK_BYTES
+    if kind not in LOADERS:
+        raise HTTPException(status_code=400, detail=f"Unknown kind {kind}, expected one of {', '.join(LOADERS)}")
+    if not filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files are allowed.")
+    if size < 0 or not 0 < chunk_bytes <= uploads.UPLOAD_MAX_CHUNK_BYTES:
+        raise HTTPException(status_code=400, detail=f"size must not be negative and chunk_bytes at most {uploads.UPLOAD_MAX_CHUNK_BYTES}")
+
+    db = session.SessionLocal()
+    try:
+        if uploads.already_loaded(db, kind, sha256):
+            return {"status": "Complete", "duplicate": True}
+        upload = uploads.create_upload(db, str(uuid4()), kind, filename, size, chunk_bytes, sha256)
+        return upload_status(db, upload)
+    finally:
+        db.close()
+
+@router.get("/uploads/{upload_id}", response_model=report_schema.UploadStatusResponse)
+def get_upload(upload_id: str):
+    # what a client resuming after a dropped connection asks first
+    db = session.SessionLocal()
+    try:
+        return upload_status(db, find_upload(db, upload_id))
+    finally:
+        db.close()
+
+@router.put("/uploads/{upload_id}/chunks/{chunk}", response_model=report_schema.UploadStatusResponse)
+async def put_chunk(upload_id: str, chunk: int, request: Request, x_chunk_sha256: Optional[str] = Header(None)):
+    """Store one chunk, the raw request body. With X-Chunk-SHA256 the chunk is checked against it."""
+    data = await request.body()
+    return await run_in_threadpool(store_chunk, upload_id, chunk, data, x_chunk_sha256)
+
+def store_chunk(upload_id: str, chunk: int, data: bytes, expected_hash: Optional[str]) -> dict:
+    db = session.SessionLocal()
+    try:
+        upload = find_upload(db, upload_id)
+        if upload.status not in ("Receiving", "Failed"):
+            raise HTTPException(status_code=409, detail=f"Upload is {upload.status}")
+        if not 0 <= chunk < uploads.chunk_count(upload) or len(data) != uploads.expected_bytes(upload, chunk):
+            raise HTTPException(status_code=400, detail=f"Chunk {chunk} must have {max(uploads.expected_bytes(upload, chunk), 0)} bytes")
+        if expected_hash and content_hash.digest(data) != expected_hash.lower():
+            raise HTTPException(status_code=400, detail=f"Chunk {chunk} does not match its X-Chunk-SHA256")
+        uploads.put_chunk(db, upload, chunk, data)
+        return upload_status(db, upload)
+    finally:
+        db.close()
+
+@router.post("/uploads/{upload_id}/commit", response_model=report_schema.UploadStatusResponse)
+async def commit_upload(upload_id: str):
+    """Load a complete upload like the matching /load_data file. A failed load can be committed again."""
+    db = session.SessionLocal()
+    try:
+        upload = await run_in_threadpool(find_upload, db, upload_id)
+        if upload.status not in ("Receiving", "Failed"):
+            raise HTTPException(status_code=409, detail=f"Upload is {upload.status}")
+        missing = await run_in_threadpool(uploads.missing_chunks, db, upload)
+        if missing:
+            raise HTTPException(status_code=409, detail=f"{len(missing)} chunks missing, first {missing[0]}")
+        if upload.content_hash and await run_in_threadpool(uploads.file_digest, upload) != upload.content_hash.lower():
+            raise HTTPException(status_code=400, detail="The uploaded file does not match its sha256, send its chunks again")
+        await run_in_threadpool(uploads.set_status, db, upload, "Loading")
+
+        # streamed from the assembled file through the same blocks as a /load_data upload of it
+        file = UploadFile(open(uploads.upload_path(upload.id), "rb"), size=upload.size, filename=upload.filename)
+        try:
+            result = await load_file(getattr(csv_loader, LOADERS[upload.kind]), file, None)
+        except Exception as e:
+            result = {"message": str(e)}
+        status = "Complete" if result.get("status_code") == 200 else "Failed"
+        await run_in_threadpool(uploads.set_status, db, upload, status)
+        if status == "Complete":
+            uploads.remove_file(upload)
+        return {**upload_status(db, upload, missing=[]), "result": result}
+    finally:
+        db.close()
+
+def find_upload(db, upload_id: str):
+    upload = uploads.get_upload(db, upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+def upload_status(db, upload, missing: Optional[list] = None) -> dict:
+    return {
+        "upload_id": upload.id,
+        "status": upload.status,
+        "chunk_bytes": upload.chunk_bytes,
+        "chunk_count": uploads.chunk_count(upload),
+        "missing": uploads.missing_chunks(db, upload) if missing is None else missing,
+    }
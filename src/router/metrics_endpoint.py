@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..utils import metrics
+
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Prometheus text exposition format: ingest and report phase timings, row and query counters, schedule cache stats
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,55 +1,107 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from sqlalchemy.orm import Session
-from uuid import uuid4
-from fastapi.responses import FileResponse
-
-from ..utils import logger
-from ..schema import report as report_schema
-from ..service import report_generator,report
-from ..db import session,models
-
-
-logger = logger.get_logger("report_endpoint")
-
-
-router = APIRouter()
-
-def get_db():
-    db = session.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.post("/trigger_report", response_model=report_schema.TriggerReportResponse)
-def trigger_report(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    
-    logger.info("Triggering report generation")
-    
-    report_id = str(uuid4())
-    report.create_report_entry(db, report_id)
-    
-    background_tasks.add_task(report_generator.generate_report, report_id,db)
-    return {"report_id": report_id}
-
-@router.get("/get_report", response_model=report_schema.ReportStatusResponse)
-def get_report(report_id: str, db: Session = Depends(get_db)):
-    report = db.query(models.Report).filter(models.Report.id == report_id).first()
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
-
-    if report.status != "Complete":
-        return {"status": "Running"}
-    
-    return {
-        "status": "Complete",
-        "report_url": f"/download_report/{report_id}"
-    }
-
-@router.get("/download_report/{report_id}")
-def download_report(report_id: str, db: Session = Depends(get_db)):
-    report = db.query(models.Report).filter(models.Report.id == report_id).first()
-    if not report or report.status != "Complete":
-        raise HTTPException(status_code=404, detail="Report not ready")
-
-    return FileResponse(report.file_path, media_type='text/csv', filename=f"{report_id}.csv")
\ No newline at end of file
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Optional
+from uuid import uuid4
+from fastapi.responses import FileResponse
+
+from ..utils import logger
+from ..utils.lazy import lazy_import
+from ..schema import report as report_schema
+from ..service import report, report_queue
+from ..service.report import get_shard_entries, progress
+from ..db import session,models
+
+
+logger = logger.get_logger("report_endpoint")
+
+# pandas and pyarrow come with these, status polls never need them
+data_version = lazy_import("..service.data_version", __package__)
+report_cache = lazy_import("..service.report_cache", __package__)
+report_formats = lazy_import("..service.report_formats", __package__)
+
+
+router = APIRouter()
+
+@router.post("/trigger_report", response_model=report_schema.TriggerReportResponse)
+async def trigger_report(priority: int = 0, refresh: bool = False, report_format: str = Query("csv", alias="format"), profile: bool = False, db: AsyncSession = Depends(session.get_async_db)):
+    # a few small statements: run on the event loop through the async driver
+    return await db.run_sync(enqueue_report, priority, refresh, report_format, profile)
+
+def enqueue_report(db: Session, priority: int, refresh: bool, report_format: str, profile: bool) -> dict:
+    logger.info("Triggering report generation")
+    check_format(report_format)
+
+    # the same data gives the same report: hand out the complete or running one of this watermark and format
+    version = data_version.watermark(db)
+    # a profiled report is always computed, its profile is what was asked for
+    cached = None if refresh or profile else report_cache.find_cached(db, version, report_format)
+    if cached:
+        report_cache.touch(db, cached)
+        return {"report_id": cached.id}
+
+    # a report that failed part way is run again from the shards it completed
+    resumable = None if refresh or profile else report_cache.find_resumable(db, version, report_format)
+    if resumable:
+        report_queue.requeue(db, resumable.id, priority)
+        return {"report_id": resumable.id}
+    
+    report_id = str(uuid4())
+    report.create_report_entry(db, report_id, version, report_format)
+    
+    # computed by a `python -m src.worker` process, higher priority first, then in trigger order
+    report_queue.enqueue(db, report_id, priority, profile)
+    return {"report_id": report_id}
+
+@router.get("/get_report", response_model=report_schema.ReportStatusResponse)
+async def get_report(report_id: str, db: AsyncSession = Depends(session.get_async_db)):
+    # status polling stays fast during an ingest: it never waits for a threadpool slot or a blocked event loop
+    return await db.run_sync(report_status, report_id)
+
+def report_status(db: Session, report_id: str) -> dict:
+    report = db.query(models.Report).filter(models.Report.id == report_id).first()
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    entries = get_shard_entries(db, report_id)
+    shards = [
+        {"shard": s.shard, "store_count": s.store_count, "status": s.status, "seconds": s.seconds, "error": s.error}
+        for s in entries
+    ] or None
+
+    if report.status == "Expired":
+        return {"status": "Expired"}
+
+    if report.status != "Complete":
+        job = report_queue.get_job(db, report_id)
+        if job and job.status == "Queued":
+            return {"status": "Queued", "queue_position": report_queue.queue_position(db, job)}
+        # a failed report keeps its progress, triggering it again resumes from there
+        return {"status": "Failed" if report.status == "Failed" else "Running", "shards": shards, "progress": progress(report, entries)}
+    
+    return {
+        "status": "Complete",
+        "report_url": f"/download_report/{report_id}",
+        "shards": shards
+    }
+
+@router.get("/download_report/{report_id}")
+def download_report(report_id: str, report_format: Optional[str] = Query(None, alias="format"), db: Session = Depends(session.get_db)):
+    report = db.query(models.Report).filter(models.Report.id == report_id).first()
+    if not report or report.status != "Complete":
+        raise HTTPException(status_code=404, detail="Report not ready")
+
+    # the format the report was triggered with, converted once on the first download of another format
+    path = report.file_path
+    if report_format:
+        check_format(report_format)
+        path = report_formats.convert(report.file_path, report_format)
+
+    report_cache.touch(db, report)
+    extension, media_type = report_formats.REPORT_FORMATS[report_formats.format_of(path)]
+    # FileResponse answers Range requests with 206 partial content
+    return FileResponse(path, media_type=media_type, filename=f"{report_id}{extension}")
+
+def check_format(report_format: str):
+    if report_format not in report_formats.REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {report_format}, expected one of {', '.join(report_formats.REPORT_FORMATS)}")
\ No newline at end of file
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from ..utils import logger
+from ..utils.lazy import lazy_import
+from ..schema import store as store_schema
+from ..db import session
+
+
+logger = logger.get_logger("store_endpoint")
+
+pd = lazy_import("pandas")
+store_uptime = lazy_import("..service.store_uptime", __package__)
+
+
+router = APIRouter()
+
+@router.get("/stores/{store_id}/uptime", response_model=store_schema.StoreUptimeResponse)
+def get_store_uptime(store_id: str, start: datetime, end: datetime, db: Session = Depends(session.get_db)):
+    # naive datetimes are UTC, like the stored observations
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    start = start.tz_localize("UTC") if start.tzinfo is None else start.tz_convert("UTC")
+    end = end.tz_localize("UTC") if end.tzinfo is None else end.tz_convert("UTC")
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > store_uptime.MAX_WINDOW:
+        raise HTTPException(status_code=400, detail=f"Windows are limited to {store_uptime.MAX_WINDOW.days} days")
+
+    result = store_uptime.store_uptime(db, store_id, start, end)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Store not found")
+    return result
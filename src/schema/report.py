@@ -1,15 +1,41 @@
-from pydantic import BaseModel
-from typing import Optional
-
-class TriggerReportResponse(BaseModel):
-    report_id: str
-
-class ReportStatusResponse(BaseModel):
-    status: str
-    report_url: Optional[str] = None
-
-class LoadDataResponse(BaseModel):
-    load_store_status: Optional[dict] = None
-    load_menu_hours: Optional[dict] = None
-    load_timezones: Optional[dict] = None
-    
\ No newline at end of file
+from pydantic import BaseModel
+from typing import List, Optional
+
+class TriggerReportResponse(BaseModel):
+    report_id: str
+
+class ShardStatus(BaseModel):
+    shard: int
+    store_count: int
+    status: str
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class ReportProgress(BaseModel):
+    stores_done: int
+    stores_total: int
+    percent: float
+    stores_per_second: Optional[float] = None  # over the shards the current run finished
+    eta_seconds: Optional[float] = None
+
+class ReportStatusResponse(BaseModel):
+    status: str
+    report_url: Optional[str] = None
+    queue_position: Optional[int] = None  # while status is "Queued", 1 is next
+    shards: Optional[List[ShardStatus]] = None
+    progress: Optional[ReportProgress] = None  # while status is "Running" (or "Failed", how far it got)
+
+class LoadDataResponse(BaseModel):
+    load_store_status: Optional[dict] = None
+    load_menu_hours: Optional[dict] = None
+    load_timezones: Optional[dict] = None
+    summary: Optional[dict] = None  # rows, inserted, duplicates, bytes and rows/sec over all files, wall-clock seconds
+
+class UploadStatusResponse(BaseModel):
+    upload_id: Optional[str] = None  # None when the file was loaded before and need not be sent
+    status: str  # "Receiving", "Loading", "Complete" or "Failed"
+    chunk_bytes: Optional[int] = None
+    chunk_count: Optional[int] = None
+    missing: List[int] = []  # chunks still to send
+    duplicate: bool = False  # a file with the announced sha256 was loaded before
+    result: Optional[dict] = None  # the load's response, like one file of /load_data, once committed
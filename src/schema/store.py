@@ -0,0 +1,11 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+class StoreUptimeResponse(BaseModel):
+    store_id: str
+    start: datetime
+    end: datetime
+    uptime_minutes: float  # within business hours
+    downtime_minutes: float
+    business_minutes: float  # business hours in the window, uptime + downtime unless status is unknown
@@ -0,0 +1,53 @@
+"""
+Content hashes of ingested files and blocks.
+
+Every block of an upload that ingest_block loads, and every whole file, is recorded by
+its sha256 under the table it went into, once the rows derived from it are refreshed and
+the data version bumped. A block seen before is skipped without being
+parsed, its rows are all in the table already, so resending an unchanged export costs
+reading and hashing it. Blocks are cut at INGEST_CHUNK_BYTES, so a resend only matches
+block for block under the same setting; a file hash sent ahead of a chunked upload
+(see uploads) skips the transfer altogether.
+"""
+import hashlib
+import os
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from ..db import bulk_load, models
+
+
+INGEST_DEDUPE = os.getenv("INGEST_DEDUPE", "on") # "on" skips files and blocks loaded before, "off" parses and inserts every block
+
+
+def enabled() -> bool:
+    return INGEST_DEDUPE == "on"
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def seen(db: Session, table_name: str, kind: str, content_hash: str) -> Optional[models.IngestedContent]:
+    """The record of `content_hash` loaded into `table_name`, None if it never was."""
+    return db.query(models.IngestedContent).filter(
+        models.IngestedContent.table_name == table_name,
+        models.IngestedContent.kind == kind,
+        models.IngestedContent.content_hash == content_hash,
+    ).first()
+
+
+def record(db: Session, table_name: str, kind: str, content_hash: str, rows: int, size: int):
+    """Record content that was loaded completely. Concurrent loads of the same content record it once."""
+    record_all(db, table_name, kind, [(content_hash, rows, size)])
+
+
+def record_all(db: Session, table_name: str, kind: str, loaded: list):
+    """Record the (content_hash, rows, bytes) of several pieces of content in one insert."""
+    if not loaded:
+        return
+    records = pd.DataFrame(loaded, columns=["content_hash", "rows", "bytes"]).assign(table_name=table_name, kind=kind, ingested_at=datetime.utcnow())
+    bulk_load.insert_rows(db, models.IngestedContent.__table__, records, ["table_name", "kind", "content_hash"])
@@ -0,0 +1,71 @@
+"""
+Data watermark: a load generation counter bumped by every ingest that changed data,
+plus the latest store_status observation at that point. Reports computed from the same
+watermark are identical, so it is the key of the report cache.
+"""
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..db import bulk_load, models
+
+
+def bump(db: Session, store_keys: Iterable[int] = ()) -> str:
+    """
+    Start a new generation after an ingest inserted rows of `store_keys`, and record those
+    stores as changed in it. Returns the new watermark.
+    """
+    max_timestamp = db.query(func.max(models.StoreStatus.timestamp_utc)).scalar()
+    values = {"max_timestamp": max_timestamp, "updated_at": datetime.utcnow()}
+
+    updated = db.query(models.DataVersion).filter(models.DataVersion.id == 1).update(
+        {"generation": models.DataVersion.generation + 1, **values}, synchronize_session=False
+    )
+    if not updated:
+        try:
+            db.add(models.DataVersion(id=1, generation=1, **values))
+            db.flush()
+        except IntegrityError:
+            # a concurrent ingest created the row first
+            db.rollback()
+            return bump(db, store_keys)
+
+    # the generation row stays locked until the changes are committed with it
+    generation = db.query(models.DataVersion.generation).filter(models.DataVersion.id == 1).scalar()
+    changes = pd.DataFrame({"store_key": sorted(set(store_keys))})
+    changes["generation"] = generation
+    bulk_load.insert_rows(db, models.StoreChange.__table__, changes, ["generation", "store_key"])
+    db.commit()
+    return watermark(db)
+
+
+def watermark(db: Session) -> str:
+    """'<generation>:<max timestamp>', '0:' before the first ingest."""
+    version = db.query(models.DataVersion).filter(models.DataVersion.id == 1).first()
+    if version is None:
+        return "0:"
+    max_timestamp = version.max_timestamp.isoformat() if version.max_timestamp else ""
+    return f"{version.generation}:{max_timestamp}"
+
+
+def parse(version: str) -> Tuple[int, Optional[str]]:
+    """Split a watermark into its generation and max timestamp ('' before any status data)."""
+    generation, _, max_timestamp = version.partition(":")
+    return int(generation), max_timestamp
+
+
+def changed_stores(db: Session, after: int, upto: int) -> Optional[set]:
+    """
+    store_keys changed by the generations in (after, upto]. None when some of those generations
+    have no recorded changes (ingested before changes were tracked), i.e. unknown.
+    """
+    rows = db.query(models.StoreChange.generation, models.StoreChange.store_key).filter(
+        models.StoreChange.generation > after, models.StoreChange.generation <= upto
+    ).all()
+    if len({generation for generation, _ in rows}) != upto - after:
+        return None
+    return {store_key for _, store_key in rows}
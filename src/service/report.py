@@ -1,19 +1,78 @@
-from sqlalchemy.orm import Session
-from datetime import datetime
-
-from ..db import models
-
-
-def create_report_entry(db: Session, report_id: str):
-    report = models.Report(id=report_id, status="Running", created_at=datetime.utcnow())
-    db.add(report)
-    db.commit()
-    db.refresh(report)
-    return report
-
-def update_report_status(db: Session, report_id: str, file_path: str,status: str = "Complete"):
-    report = db.query(models.Report).filter(models.Report.id == report_id).first()
-    if report:
-        report.status = status
-        report.file_path = file_path
-        db.commit()
\ No newline at end of file
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Optional
+
+from ..db import models
+
+
+def create_report_entry(db: Session, report_id: str, data_version: str = None, report_format: str = "csv"):
+    report = models.Report(id=report_id, status="Running", created_at=datetime.utcnow(), data_version=data_version, format=report_format)
+    db.add(report)
+    db.commit()
+    db.refresh(report)
+    return report
+
+def update_report_status(db: Session, report_id: str, file_path: str,status: str = "Complete", data_version: str = None, base_report_id: str = None):
+    report = db.query(models.Report).filter(models.Report.id == report_id).first()
+    if report:
+        report.status = status
+        report.file_path = file_path
+        if data_version is not None:
+            report.data_version = data_version
+        report.base_report_id = base_report_id
+        db.commit()
+
+def start_report(db: Session, report_id: str, data_version: str):
+    """Record the start of a (possibly resumed) run and the watermark it computes from."""
+    db.query(models.Report).filter(models.Report.id == report_id).update(
+        {"status": "Running", "started_at": datetime.utcnow(), "data_version": data_version}, synchronize_session=False
+    )
+    db.commit()
+
+def create_shard_entries(db: Session, report_id: str, store_counts: list):
+    db.add_all([
+        models.ReportShard(report_id=report_id, shard=shard, store_count=count, status="Pending")
+        for shard, count in enumerate(store_counts)
+    ])
+    db.commit()
+
+def delete_shard_entries(db: Session, report_id: str):
+    db.query(models.ReportShard).filter(models.ReportShard.report_id == report_id).delete(synchronize_session=False)
+    db.commit()
+
+def update_shard_status(db: Session, report_id: str, shard: int, status: str, seconds: float, error: str = None, file_path: str = None):
+    entry = db.query(models.ReportShard).filter(models.ReportShard.report_id == report_id, models.ReportShard.shard == shard).first()
+    if entry:
+        entry.status = status
+        entry.seconds = seconds
+        entry.error = error
+        entry.file_path = file_path
+        entry.finished_at = datetime.utcnow() if status != "Pending" else None
+        db.commit()
+
+def get_shard_entries(db: Session, report_id: str):
+    return db.query(models.ReportShard).filter(models.ReportShard.report_id == report_id).order_by(models.ReportShard.shard).all()
+
+def progress(report: models.Report, entries: List[models.ReportShard]) -> Optional[dict]:
+    """
+    Stores done out of the report's total, from its shard entries. Throughput counts the
+    shards finished since the latest run started, so a resumed run's rate and ETA are not
+    inflated by the shards it reused. Only a running report has an ETA.
+    """
+    if not entries:
+        return None
+    total = sum(entry.store_count for entry in entries)
+    done = sum(entry.store_count for entry in entries if entry.status == "Complete")
+    run_done = sum(
+        entry.store_count for entry in entries
+        if entry.status == "Complete" and report.started_at and entry.finished_at and entry.finished_at >= report.started_at
+    )
+    elapsed = (datetime.utcnow() - report.started_at).total_seconds() if report.started_at else 0
+    stores_per_second = run_done / elapsed if run_done and elapsed > 0 else None
+    return {
+        "stores_done": done,
+        "stores_total": total,
+        "percent": round(100 * done / total, 1) if total else 100.0,
+        "stores_per_second": round(stores_per_second, 1) if stores_per_second else None,
+        "eta_seconds": round((total - done) / stores_per_second, 1) if stores_per_second and report.status == "Running" else None,
+    }
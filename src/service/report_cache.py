@@ -0,0 +1,80 @@
+"""
+Completed reports cached under the data watermark they were computed from.
+
+A trigger for a watermark that already has a complete (or still running) report gets
+that report's id instead of a new computation, and one whose report failed part way
+resumes that report from its completed shards. At most REPORT_CACHE_MAX_FILES report
+files are kept in REPORT_DIR, the least recently used ones are deleted and their
+reports marked "Expired".
+"""
+import glob
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .report_formats import REPORT_DIR
+from ..db import models
+from ..utils import logger
+
+
+logger = logger.get_logger("report_cache")
+
+REPORT_CACHE_MAX_FILES = int(os.getenv("REPORT_CACHE_MAX_FILES", "20")) # report files kept, 0 keeps all
+
+
+def find_cached(db: Session, data_version: str, report_format: str) -> Optional[models.Report]:
+    """Newest complete or running `report_format` report of `data_version` whose file (if complete) still exists."""
+    reports = db.query(models.Report).filter(
+        models.Report.data_version == data_version,
+        func.coalesce(models.Report.format, "csv") == report_format,
+        models.Report.status.in_(["Complete", "Running"]),
+    ).order_by(models.Report.created_at.desc()).all()
+    for report in reports:
+        if report.status == "Running" or (report.file_path and os.path.exists(report.file_path)):
+            return report
+    return None
+
+
+def find_resumable(db: Session, data_version: str, report_format: str) -> Optional[models.Report]:
+    """Newest failed `report_format` report of `data_version` with completed shards still on disk to resume from."""
+    reports = db.query(models.Report).filter(
+        models.Report.data_version == data_version,
+        func.coalesce(models.Report.format, "csv") == report_format,
+        models.Report.status == "Failed",
+    ).order_by(models.Report.created_at.desc()).all()
+    for report in reports:
+        shards = db.query(models.ReportShard).filter(models.ReportShard.report_id == report.id, models.ReportShard.status == "Complete").all()
+        if any(shard.file_path and os.path.exists(shard.file_path) for shard in shards):
+            return report
+    return None
+
+
+def touch(db: Session, report: models.Report):
+    report.last_accessed_at = datetime.utcnow()
+    db.commit()
+
+
+def evict(db: Session) -> int:
+    """Delete the files of the least recently used complete reports beyond the cap. Returns how many."""
+    if REPORT_CACHE_MAX_FILES <= 0:
+        return 0
+
+    stale = db.query(models.Report).filter(
+        models.Report.status == "Complete",
+    ).order_by(
+        func.coalesce(models.Report.last_accessed_at, models.Report.created_at).desc()
+    ).offset(REPORT_CACHE_MAX_FILES).all()
+
+    for report in stale:
+        # the report file and its conversions to other formats
+        for path in glob.glob(f"{glob.escape(REPORT_DIR)}/{glob.escape(report.id)}.*"):
+            os.remove(path)
+        report.status, report.file_path = "Expired", None
+    db.commit()
+
+    if stale:
+        logger.info(f"Evicted {len(stale)} cached report files")
+    return len(stale)
@@ -0,0 +1,111 @@
+"""
+Report file formats: plain CSV, gzip CSV, Parquet and Arrow IPC.
+
+Reports are written batch by batch (one shard's rows at a time) through ReportWriter,
+so the whole report is never held in memory, and read back the same way with
+iter_batches for format conversion and incremental reports.
+"""
+import gzip
+import os
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+REPORT_DIR = "./reports"
+REPORT_COLUMNS = [
+    "store_id",
+    "uptime_last_hour", "uptime_last_day", "uptime_last_week",
+    "downtime_last_hour", "downtime_last_day", "downtime_last_week"
+]
+REPORT_SCHEMA = pa.schema([("store_id", pa.string())] + [(column, pa.float64()) for column in REPORT_COLUMNS[1:]])
+REPORT_FORMATS = {  # format: (file extension, media type)
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+READ_BATCH_ROWS = 100000
+
+
+def report_path(report_id: str, report_format: str) -> str:
+    return f"{REPORT_DIR}/{report_id}{REPORT_FORMATS[report_format][0]}"
+
+
+def format_of(path: str) -> str:
+    # longest extension first, ".csv.gz" before ".csv"
+    for report_format, (extension, _) in sorted(REPORT_FORMATS.items(), key=lambda item: -len(item[1][0])):
+        if path.endswith(extension):
+            return report_format
+    raise ValueError(f"Unknown report format of {path}")
+
+
+class ReportWriter:
+    """Append batches of report rows to a file of the given format. Use as a context manager."""
+
+    def __init__(self, path: str, report_format: str):
+        self.report_format = report_format
+        if report_format in ("csv", "csv.gz"):
+            self.file = gzip.open(path, "wt", newline="") if report_format == "csv.gz" else open(path, "w", newline="")
+            self.file.write(",".join(REPORT_COLUMNS) + "\n")
+        elif report_format == "parquet":
+            self.writer = pq.ParquetWriter(path, REPORT_SCHEMA)
+        elif report_format == "arrow":
+            self.file = pa.OSFile(path, "wb")
+            self.writer = pa.ipc.new_file(self.file, REPORT_SCHEMA)
+        else:
+            raise ValueError(f"Unknown report format {report_format}")
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        if self.report_format in ("csv", "csv.gz"):
+            df[REPORT_COLUMNS].to_csv(self.file, header=False, index=False)
+        else:
+            self.writer.write_table(pa.Table.from_pandas(df[REPORT_COLUMNS], schema=REPORT_SCHEMA, preserve_index=False))
+
+    def close(self):
+        if self.report_format in ("parquet", "arrow"):
+            self.writer.close()
+        if self.report_format != "parquet":
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_batches(path: str) -> Iterator[pd.DataFrame]:
+    """Read a report file of any format back as DataFrames of at most READ_BATCH_ROWS rows."""
+    report_format = format_of(path)
+    if report_format in ("csv", "csv.gz"):
+        yield from pd.read_csv(path, dtype={"store_id": str}, chunksize=READ_BATCH_ROWS)
+    elif report_format == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=READ_BATCH_ROWS):
+            yield batch.to_pandas()
+    else:
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                # one record batch per write, i.e. per shard, which can be larger
+                batch = reader.get_batch(i)
+                for offset in range(0, batch.num_rows, READ_BATCH_ROWS):
+                    yield batch.slice(offset, READ_BATCH_ROWS).to_pandas()
+
+
+def convert(src_path: str, report_format: str) -> str:
+    """Write the report at `src_path` in another format next to it, once. Returns the new path."""
+    dst_path = src_path[:-len(REPORT_FORMATS[format_of(src_path)][0])] + REPORT_FORMATS[report_format][0]
+    if os.path.exists(dst_path):
+        return dst_path
+
+    tmp_path = f"{dst_path}.tmp{os.getpid()}"
+    with ReportWriter(tmp_path, report_format) as writer:
+        for batch in iter_batches(src_path):
+            writer.write(batch)
+    os.replace(tmp_path, dst_path)
+    return dst_path
@@ -1,136 +1,372 @@
-import os
-import csv
-from sqlalchemy.orm import Session
-import pandas as pd
-import time
-import pytz
-from datetime import datetime
-
-from . import report as report_crud
-from ..db import models
-from ..utils import time_utils,logger
-
-
-logger = logger.get_logger("report_generator")
-
-def generate_report(report_id: str,db: Session):
-    try:
-        s_time_dask = time.time()
-        results = compute_uptime_downtime(db) # computing uptime and downtime of stores
-        e_time_dask = time.time()
-        logger.info(f"Report generation time: {e_time_dask - s_time_dask:.2f} seconds")
-
-        output_path = f"./reports/{report_id}.csv"
-        os.makedirs("./reports", exist_ok=True)
-
-        with open(output_path, "w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                "store_id", 
-                "uptime_last_hour", "uptime_last_day", "uptime_last_week",
-                "downtime_last_hour", "downtime_last_day", "downtime_last_week"
-            ])
-            writer.writeheader()
-            writer.writerows(results)
-
-        report_crud.update_report_status(db, report_id, output_path)
-    except Exception as e:
-        logger.error(f"Error generating report {report_id}: {e}")
-        report_crud.update_report_status(db, report_id, None, status="Failed")
-    finally:
-        db.close()
-
-def compute_uptime_downtime(db:Session):
-    """
-    Compute the uptime and downtime for each store over the last hour, last day, and last week.
-    It considers only business hours as defined in menu_hours (with timezone support).
-    """
-    try:
-        # 1. Get all distinct store IDs from status data
-        store_ids = db.query(models.StoreStatus.store_id).distinct() #getting all storeid
-        
-        # 2. Get the latest timestamp across all store statuses (assumed to be current reference time) and convert it into UTC datetime object
-        current_time = db.query(models.StoreStatus.timestamp_utc).order_by(models.StoreStatus.timestamp_utc.desc()).first()
-        timestamp_in_utc=pytz.utc.localize(datetime.strptime(current_time.timestamp_utc, '%Y-%m-%d %H:%M:%S.%f UTC'))
-        current_date=timestamp_in_utc.date()
-
-        logger.info(f"Current timestamp: {timestamp_in_utc if current_time else 'No data available'}")
-
-        # 4. Iterate over each store
-        results = [] 
-        for (store_id,) in store_ids:
-
-            # 4.1. Get store's timezone; default to 'America/Chicago' if missing
-            timezone_row = db.query(models.Timezone).filter(models.Timezone.store_id == store_id).first()
-            tz = timezone_row.timezone_str if timezone_row else "America/Chicago"
-            
-            # 4.2. Get menu hours (i.e., business hours) for the store
-            menu_rows = db.query(models.MenuHour).filter(models.MenuHour.store_id == store_id).all()
-
-            # 4.3. Build DataFrame of menu hours in UTC
-            menu_df =pd.DataFrame([{
-                "day_of_week": m.dayOfWeek,
-                "start_time_local": pytz.timezone(tz).localize(datetime.combine(current_date,datetime.strptime(m.start_time_local,'%H:%M:%S').time())).astimezone(pytz.utc),
-                "end_time_local": pytz.timezone(tz).localize(datetime.combine(current_date,datetime.strptime(m.end_time_local,'%H:%M:%S').time())).astimezone(pytz.utc)
-            } for m in menu_rows])  if menu_rows else  pd.DataFrame([{
-                "day_of_week": i, 
-                "start_time_local": pytz.timezone(tz).localize(datetime.combine(current_date, datetime.strptime("00:00:00", '%H:%M:%S').time())).astimezone(pytz.utc),
-                "end_time_local": pytz.timezone(tz).localize(datetime.combine(current_date, datetime.strptime("23:59:59", '%H:%M:%S').time())).astimezone(pytz.utc)
-            } for i in range(7)])
-
-            logger.info(f"Processing store {store_id} with timezone {tz} menu hours:\n{menu_df.to_string()}")
-
-            # 4.4. Get business hours windows for past hour/day/week in UTC
-            windows = time_utils.get_operating_intervals_within_window(menu_df, tz,timestamp_in_utc)
-
-            # 4.5. Load store status logs and convert to DataFrame
-            status_records = db.query(models.StoreStatus).filter(models.StoreStatus.store_id == store_id).order_by(models.StoreStatus.timestamp_utc)
-
-            if not status_records:
-                logger.info(f"No status data for store {store_id}, skipping.")
-                continue
-
-            df = pd.DataFrame([{
-                "timestamp": pytz.utc.localize(datetime.strptime(s.timestamp_utc, '%Y-%m-%d %H:%M:%S.%f UTC')),
-                "status": s.status
-            } for s in status_records])
-            
-
-            logger.info(f"Top 5 records:\n{df.head(5)}")
-
-            df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
-            df = df.set_index('timestamp')
-            logger.info(f"df index: {df.index.name}")
-
-             # 4.6. Interpolation logic: calculate active/inactive time in each window
-            interpolated_results = {
-                "store_id": store_id,
-                "uptime_last_hour": 0, "uptime_last_day": 0, "uptime_last_week": 0,
-                "downtime_last_hour": 0, "downtime_last_day": 0, "downtime_last_week": 0,
-            }
-
-            for key in ["last_hour", "last_day", "last_week"]:
-                uptime, downtime = 0, 0
-
-                for window_start, window_end in windows.get(key, []):
-                    time_range  = pd.date_range(start=window_start, end=window_end, freq="5min")
-                    logger.info(f"time_range: {time_range}")
-                    if time_range.empty:
-                        continue
-                    interpolated  = df.reindex(time_range, method="ffill")
-                    uptime += (interpolated["status"] == "active").sum() * 5
-                    downtime += (interpolated["status"] == "inactive").sum() * 5
-
-                if "hour" in key:
-                    interpolated_results[f"uptime_{key}"] = uptime
-                    interpolated_results[f"downtime_{key}"] = downtime
-                else:
-                    interpolated_results[f"uptime_{key}"] = round(uptime / 60, 2)
-                    interpolated_results[f"downtime_{key}"] = round(downtime / 60, 2)
-                
-                logger.info(f"interpolated_results: {interpolated_results}")
-            
-            results.append(interpolated_results)
-    except Exception as e:
-        logger.error(f"Error while compute_uptime_downtime: {e} \ncurrent result: {results}")
-        raise e
+import os
+import csv
+import math
+import cProfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+import pandas as pd
+import time
+
+from . import report as report_crud, bulk_report, data_version, report_cache, status_cache
+from .report_formats import REPORT_COLUMNS, REPORT_DIR, ReportWriter, iter_batches, report_path
+from ..db import models, session, stores
+from ..utils import time_utils,logger,metrics
+
+
+logger = logger.get_logger("report_generator")
+
+REPORT_ENGINE = os.getenv("REPORT_ENGINE", "bulk") # "bulk" (whole fleet, vectorized) or "per_store" (original loop)
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "1")) # processes computing shards in parallel
+REPORT_SHARDS = int(os.getenv("REPORT_SHARDS", str(REPORT_WORKERS))) # store_key buckets per report
+REPORT_CHECKPOINT_STORES = int(os.getenv("REPORT_CHECKPOINT_STORES", "5000")) # most stores per shard, each finished shard is a checkpoint (0 for no limit)
+REPORT_UPDATE_MODE = os.getenv("REPORT_UPDATE_MODE", "incremental") # "incremental" reuses unchanged stores of an earlier report, "full" recomputes all
+REPORT_PROFILE_DIR = os.getenv("REPORT_PROFILE_DIR", "./profiles") # cProfile dumps of reports triggered with profile=true
+
+_in_shard_pool = False # set in shard pool processes, which send their metrics back with the shard summary
+
+def generate_report(report_id: str, db: Session, profile: bool = False):
+    """
+    Compute a report and record it as Complete (or Failed). Closes `db`.
+
+    Args:
+        profile (bool): Run under cProfile, shards in this process, and dump the stats to
+            {REPORT_PROFILE_DIR}/{report_id}.prof.
+    """
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+    s_time_dask = time.time()
+    status, shard_queries = "Failed", 0
+    with metrics.count_queries() as counted:
+        try:
+            status, shard_queries = _generate_report(report_id, db, workers=1 if profile else REPORT_WORKERS)
+        finally:
+            if profiler:
+                profiler.disable()
+                os.makedirs(REPORT_PROFILE_DIR, exist_ok=True)
+                profiler.dump_stats(f"{REPORT_PROFILE_DIR}/{report_id}.prof")
+                logger.info(f"Report {report_id}: profile written to {REPORT_PROFILE_DIR}/{report_id}.prof")
+            queries = counted() + shard_queries
+            metrics.inc("reports_total", status=status)
+            metrics.inc("report_queries_total", queries)
+            metrics.observe("report_seconds", time.time() - s_time_dask)
+            metrics.observe("report_queries", queries, buckets=metrics.COUNT_BUCKETS)
+            logger.info(f"Report {report_id}: {status} in {time.time() - s_time_dask:.2f} seconds with {queries} queries")
+
+def _generate_report(report_id: str, db: Session, workers: int):
+    """Steps of generate_report. Returns the report's final status and the queries its shards ran."""
+    shard_queries = 0
+    try:
+        s_time_dask = time.time()
+
+        # 1. Fix the reference time once so every shard computes the same windows, and record the data it is computed from
+        previous_version = db.query(models.Report.data_version).filter(models.Report.id == report_id).scalar()
+        version = data_version.watermark(db)
+        report_crud.start_report(db, report_id, version)
+        timestamp_in_utc = bulk_report.reference_time(db)
+        store_keys = bulk_report.list_store_keys(db)
+
+        # 2. Incremental: only recompute the stores changed since a report with the same windows
+        base, changed = incremental_base(db, version) if REPORT_UPDATE_MODE == "incremental" else (None, None)
+        if base:
+            store_keys = sorted(set(store_keys) & changed)
+            logger.info(f"Report {report_id}: recomputing {len(store_keys)} changed stores, the rest from report {base.id}")
+
+        # 3. Resume from the shards an interrupted run of the same data already wrote, or record a new plan
+        shards = shard_store_keys(store_keys, shard_count(len(store_keys)))
+        part_paths = checkpoints(db, report_id, previous_version == version, shards)
+        pending = [(shard, shard_keys) for shard, shard_keys in enumerate(shards) if shard not in part_paths]
+        if part_paths:
+            logger.info(f"Report {report_id}: resuming with {len(part_paths)} of {len(shards)} shards already complete")
+
+        # 4. Compute the pending shards, in a process pool when more than one worker is configured; the status
+        # arrays are brought up to date first so shard processes map the current STATUS_CACHE=mmap files instead of each reading them
+        if pending and status_cache.enabled() and bulk_report.REPORT_SOURCE == "raw":
+            with metrics.span("report_phase_seconds", phase="status_cache"):
+                status_cache.get(db)
+        with metrics.span("report_phase_seconds", phase="shards"):
+            summaries = run_shards(report_id, pending, timestamp_in_utc, workers)
+        for summary in summaries:
+            shard_queries += summary.get("queries", 0)
+            if summary.get("crashed"):  # its process died before it could record itself
+                report_crud.update_shard_status(db, report_id, summary["shard"], summary["status"], summary["seconds"], summary["error"])
+            if summary["status"] == "Complete":
+                part_paths[summary["shard"]] = summary["file_path"]
+
+        e_time_dask = time.time()
+        logger.info(f"Report generation time: {e_time_dask - s_time_dask:.2f} seconds")
+        failed = len(shards) - len(part_paths)
+        if failed:
+            # the finished shards stay on disk, triggering the report again resumes from them
+            raise RuntimeError(f"{failed} of {len(shards)} shards failed")
+
+        # 5. Merge the partial CSVs in shard order (and the unchanged stores of the base report)
+        report_format = db.query(models.Report.format).filter(models.Report.id == report_id).scalar() or "csv"
+        with metrics.span("report_phase_seconds", phase="merge"):
+            output_path = merge_shard_files(
+                report_id, [part_paths[shard] for shard in range(len(shards))], report_format,
+                base_path=base.file_path if base else None, replaced_store_ids=set(stores.ids_for(db, sorted(changed))) if changed else set(),
+            )
+
+        report_crud.update_report_status(db, report_id, output_path, data_version=version, base_report_id=base.id if base else None)
+        report_cache.evict(db)
+        return "Complete", shard_queries
+    except Exception as e:
+        logger.error(f"Error generating report {report_id}: {e}")
+        report_crud.update_report_status(db, report_id, None, status="Failed")
+        return "Failed", shard_queries
+    finally:
+        db.close()
+
+def incremental_base(db: Session, version: str):
+    """
+    Latest complete report an incremental report can start from: computed at the same
+    reference time (so none of its windows shifted) from an older generation whose
+    changes since are all recorded. Returns (report, changed store_keys) or (None, None).
+    """
+    generation, max_timestamp = data_version.parse(version)
+    if not max_timestamp:
+        return None, None
+
+    candidates = db.query(models.Report).filter(
+        models.Report.status == "Complete",
+        models.Report.data_version.like(f"%:{max_timestamp}"),
+    ).order_by(models.Report.created_at.desc()).all()
+    for report in candidates:
+        base_generation, _ = data_version.parse(report.data_version)
+        if base_generation >= generation or not (report.file_path and os.path.exists(report.file_path)):
+            continue
+        changed = data_version.changed_stores(db, base_generation, generation)
+        return (report, changed) if changed is not None else (None, None)
+    return None, None
+
+def shard_count(store_count: int) -> int:
+    """REPORT_SHARDS, or more when that would put more than REPORT_CHECKPOINT_STORES stores in a shard."""
+    if REPORT_CHECKPOINT_STORES <= 0:
+        return REPORT_SHARDS
+    return max(REPORT_SHARDS, math.ceil(store_count / REPORT_CHECKPOINT_STORES))
+
+def checkpoints(db: Session, report_id: str, same_data: bool, shards: List[List[int]]) -> Dict[int, str]:
+    """
+    Partial CSVs of the shards an earlier run of this report completed, {shard: path}. They
+    are only reused when that run computed the same data version into the same shard plan,
+    otherwise its entries and files are dropped and `shards` is recorded as the new plan.
+    """
+    entries = report_crud.get_shard_entries(db, report_id)
+    if entries and same_data and [entry.store_count for entry in entries] == [len(shard) for shard in shards]:
+        done = {}
+        for entry in entries:
+            if entry.status == "Complete" and entry.file_path and os.path.exists(entry.file_path):
+                done[entry.shard] = entry.file_path
+            elif entry.status != "Pending":
+                report_crud.update_shard_status(db, report_id, entry.shard, "Pending", None)
+        return done
+
+    for entry in entries:
+        if entry.file_path and os.path.exists(entry.file_path):
+            os.remove(entry.file_path)
+    report_crud.delete_shard_entries(db, report_id)
+    report_crud.create_shard_entries(db, report_id, [len(shard) for shard in shards])
+    return {}
+
+def shard_store_keys(store_keys: List[int], shard_count: int) -> List[List[int]]:
+    """Split stores into `shard_count` buckets by store_key modulo, keys are assigned in sequence so the buckets are even."""
+    shards = [[] for _ in range(max(shard_count, 1))]
+    for store_key in sorted(store_keys):
+        shards[store_key % len(shards)].append(store_key)
+    return shards
+
+def run_shards(report_id: str, shards: List[Tuple[int, List[int]]], timestamp_in_utc, workers: int = REPORT_WORKERS) -> List[dict]:
+    """Compute (shard number, store_keys) pairs. Returns their summaries in the same order."""
+    if workers <= 1 or len(shards) <= 1:
+        return [compute_shard(report_id, shard, store_keys, timestamp_in_utc) for shard, store_keys in shards]
+
+    summaries = []
+    # spawned, not forked: the worker's slot and heartbeat threads may hold the logging, metrics or store cache locks at fork time
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_shard_worker) as pool:
+        futures = {pool.submit(compute_shard, report_id, shard, store_keys, timestamp_in_utc): shard for shard, store_keys in shards}
+        for future, shard in futures.items():
+            try:
+                summary = future.result()
+                metrics.merge(summary.pop("metrics"))
+                summaries.append(summary)
+            except Exception as e:  # the worker process itself died
+                logger.error(f"Shard {shard} of report {report_id} crashed: {e}")
+                summaries.append({"shard": shard, "status": "Failed", "seconds": None, "error": str(e), "file_path": None, "crashed": True})
+    return summaries
+
+def _init_shard_worker():
+    global _in_shard_pool
+    _in_shard_pool = True
+
+def compute_shard(report_id: str, shard: int, store_keys: List[int], timestamp_in_utc) -> dict:
+    """
+    Compute one shard with its own session, write it to a partial CSV and record it on its
+    report_shard entry, so the finished shard survives the run as a checkpoint. Never raises.
+    """
+    s_time = time.time()
+    summary = {"shard": shard, "status": "Complete", "seconds": None, "error": None, "file_path": None}
+    db = session.SessionLocal()
+    counted = lambda: 0
+    try:
+        with metrics.count_queries() as counted:
+            results = compute_uptime_downtime(db, store_keys, timestamp_in_utc) if store_keys else []
+
+        # written aside and renamed, so a part file on disk is always a whole shard
+        file_path = f"{REPORT_DIR}/{report_id}.part{shard}.csv"
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        with open(f"{file_path}.tmp", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS)
+            writer.writerows(results)
+        os.replace(f"{file_path}.tmp", file_path)
+        summary["file_path"] = file_path
+    except Exception as e:
+        logger.error(f"Error computing shard {shard} of report {report_id}: {e}")
+        summary.update(status="Failed", error=str(e))
+
+    summary["seconds"] = round(time.time() - s_time, 3)
+    try:
+        db.rollback()
+        report_crud.update_shard_status(db, report_id, shard, summary["status"], summary["seconds"], summary["error"], summary["file_path"])
+    except Exception as e:
+        logger.error(f"Error recording shard {shard} of report {report_id}: {e}")
+        summary.update(status="Failed", error=str(e))
+    finally:
+        db.close()
+
+    summary["queries"] = counted()
+    metrics.observe("report_shard_seconds", summary["seconds"])
+    logger.info(f"Shard {shard} of report {report_id}: {summary['status']} with {len(store_keys)} stores in {summary['seconds']} seconds, {summary['queries']} queries")
+    if _in_shard_pool:
+        summary["metrics"] = metrics.drain()
+    return summary
+
+def merge_shard_files(report_id: str, part_paths: List[str], report_format: str = "csv", base_path: Optional[str] = None, replaced_store_ids: set = frozenset()) -> str:
+    """Stream the partial CSVs (and the kept rows of `base_path`) into the report file, one batch at a time."""
+    output_path = report_path(report_id, report_format)
+    os.makedirs(REPORT_DIR, exist_ok=True)
+
+    with ReportWriter(output_path, report_format) as writer:
+        if base_path:
+            for batch in iter_batches(base_path):
+                writer.write(batch[~batch["store_id"].isin(replaced_store_ids)])
+        for part_path in part_paths:
+            if os.path.getsize(part_path):
+                for batch in pd.read_csv(part_path, header=None, names=REPORT_COLUMNS, dtype={"store_id": str}, chunksize=bulk_report.STORE_CHUNK_SIZE):
+                    writer.write(batch)
+            os.remove(part_path)
+    return output_path
+
+def compute_uptime_downtime(db:Session, store_keys: Optional[List[int]] = None, timestamp_in_utc = None):
+    """
+    Compute the uptime and downtime for each store over the last hour, last day, and last week.
+    Dispatches to the engine selected by REPORT_ENGINE.
+    """
+    if REPORT_ENGINE == "per_store":
+        return compute_uptime_downtime_per_store(db, store_keys, timestamp_in_utc)
+    return bulk_report.compute_uptime_downtime_bulk(db, store_keys, timestamp_in_utc)
+
+def compute_uptime_downtime_per_store(db:Session, store_keys: Optional[List[int]] = None, timestamp_in_utc = None):
+    """
+    Compute the uptime and downtime for each store over the last hour, last day, and last week
+    ending at `timestamp_in_utc` (the latest observation unless the caller fixed one).
+    It considers only business hours as defined in menu_hours (with timezone support).
+    """
+    try:
+        # 1. Get all distinct store IDs from status data
+        if store_keys is None:
+            store_keys = [store_key for (store_key,) in db.query(models.StoreStatus.store_key).distinct()] #getting all store keys
+        store_ids = stores.ids_for(db, store_keys)
+        
+        # 2. Get the latest timestamp across all store statuses (assumed to be current reference time) and convert it into UTC datetime object
+        current_time = timestamp_in_utc if timestamp_in_utc is not None else bulk_report.reference_time(db)
+        timestamp_in_utc = current_time.to_pydatetime()
+        since = timestamp_in_utc - bulk_report.WINDOWS["last_week"] - bulk_report.STATUS_LOOKBACK
+
+        logger.info("Current timestamp: %s", timestamp_in_utc if current_time else 'No data available')
+
+        # 4. Iterate over each store
+        results = [] 
+        for store_key, store_id in zip(store_keys, store_ids):
+            s_time_store = time.perf_counter()
+
+            # 4.1. Get store's timezone; default to 'America/Chicago' if missing
+            timezone_row = db.query(models.Timezone).filter(models.Timezone.store_key == store_key).first()
+            tz = timezone_row.timezone_str if timezone_row else "America/Chicago"
+            
+            # 4.2. Get menu hours (i.e., business hours) for the store
+            menu_rows = db.query(models.MenuHour).filter(models.MenuHour.store_key == store_key).all()
+
+            # 4.3. Build DataFrame of menu hours in local time
+            menu_df = pd.DataFrame([{
+                "day_of_week": m.dayOfWeek,
+                "start_time_local": m.start_time_local,
+                "end_time_local": m.end_time_local
+            } for m in menu_rows], columns=["day_of_week", "start_time_local", "end_time_local"])
+
+            # lazy %-style arguments: the frames are only formatted when INFO is enabled
+            logger.info("Processing store %s with timezone %s menu hours:\n%s", store_id, tz, menu_df)
+
+            # 4.4. Get business hours windows for past hour/day/week in UTC
+            windows = time_utils.get_operating_intervals_within_window(menu_df, tz,timestamp_in_utc)
+
+            # 4.5. Load store status logs of the week window (plus lookback) and convert to DataFrame
+            status_records = db.query(models.StoreStatus).filter(
+                models.StoreStatus.store_key == store_key,
+                models.StoreStatus.timestamp_utc >= since,
+                models.StoreStatus.timestamp_utc <= timestamp_in_utc,
+            ).order_by(models.StoreStatus.timestamp_utc).all()
+
+            if not status_records:
+                logger.info("No status data for store %s, skipping.", store_id)
+                continue
+
+            df = pd.DataFrame([{
+                "timestamp": s.timestamp_utc,
+                "status": s.status
+            } for s in status_records])
+            
+
+            logger.info("Top 5 records:\n%s", df.iloc[:5])
+
+            df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+            df = df.set_index('timestamp')
+            logger.info("df index: %s", df.index.name)
+
+             # 4.6. Interpolation logic: calculate active/inactive time in each window
+            interpolated_results = {
+                "store_id": store_id,
+                "uptime_last_hour": 0, "uptime_last_day": 0, "uptime_last_week": 0,
+                "downtime_last_hour": 0, "downtime_last_day": 0, "downtime_last_week": 0,
+            }
+
+            for key in ["last_hour", "last_day", "last_week"]:
+                uptime, downtime = 0, 0
+
+                for window_start, window_end in windows.get(key, []):
+                    time_range  = pd.date_range(start=window_start, end=window_end, freq="5min")
+                    logger.info("time_range: %s", time_range)
+                    if time_range.empty:
+                        continue
+                    interpolated  = df.reindex(time_range, method="ffill")
+                    uptime += (interpolated["status"] == "active").sum() * 5
+                    downtime += (interpolated["status"] == "inactive").sum() * 5
+
+                if "hour" in key:
+                    interpolated_results[f"uptime_{key}"] = uptime
+                    interpolated_results[f"downtime_{key}"] = downtime
+                else:
+                    interpolated_results[f"uptime_{key}"] = round(uptime / 60, 2)
+                    interpolated_results[f"downtime_{key}"] = round(downtime / 60, 2)
+                
+                logger.info("interpolated_results: %s", interpolated_results)
+            
+            results.append(interpolated_results)
+            metrics.observe("report_store_seconds", time.perf_counter() - s_time_store, engine="per_store")
+        metrics.inc("report_stores_total", len(results), engine="per_store")
+    except Exception as e:
+        logger.error(f"Error while compute_uptime_downtime: {e} \ncurrent result: {results}")
+        raise e
     return results
\ No newline at end of file
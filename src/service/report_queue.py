@@ -0,0 +1,126 @@
+"""
+Durable report job queue backed by the report_job table.
+
+/trigger_report only enqueues, the reports are computed by `python -m src.worker`
+processes. A worker claims the highest-priority, oldest queued job under a lease
+(SELECT ... FOR UPDATE SKIP LOCKED on PostgreSQL, so any number of workers can share
+the queue) and keeps renewing it while the report runs. A job whose lease expired,
+because its worker died, is claimed again until it ran REPORT_JOB_MAX_ATTEMPTS times.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from ..db import models
+from ..utils import logger
+
+
+logger = logger.get_logger("report_queue")
+
+REPORT_JOB_LEASE_SECONDS = int(os.getenv("REPORT_JOB_LEASE_SECONDS", "60")) # renewed while the report runs
+REPORT_JOB_MAX_ATTEMPTS = int(os.getenv("REPORT_JOB_MAX_ATTEMPTS", "3"))
+
+
+def enqueue(db: Session, report_id: str, priority: int = 0, profile: bool = False) -> models.ReportJob:
+    job = models.ReportJob(report_id=report_id, priority=priority, status="Queued", enqueued_at=datetime.utcnow(), attempts=0, profile=profile)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def requeue(db: Session, report_id: str, priority: int = 0, profile: bool = False) -> models.ReportJob:
+    """Queue a failed report's job again with fresh attempts, its run resumes from the shards it checkpointed."""
+    job = get_job(db, report_id)
+    if job is None:
+        return enqueue(db, report_id, priority, profile)
+    job.status, job.priority, job.profile, job.enqueued_at = "Queued", priority, profile, datetime.utcnow()
+    job.attempts, job.lease_owner, job.lease_expires_at, job.started_at, job.finished_at, job.error = 0, None, None, None, None, None
+    db.query(models.Report).filter(models.Report.id == report_id).update({"status": "Running"})
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim_job(db: Session, worker_id: str) -> Optional[models.ReportJob]:
+    """
+    Lease the next job: queued jobs and jobs whose lease expired, highest priority first,
+    then FIFO. Returns None when there is nothing to run.
+    """
+    while True:
+        now = datetime.utcnow()
+        claimable = or_(
+            models.ReportJob.status == "Queued",
+            and_(models.ReportJob.status == "Running", models.ReportJob.lease_expires_at < now),
+        )
+
+        # 1. Pick a candidate, skipping rows other workers hold locked
+        job = db.query(models.ReportJob).filter(claimable).order_by(
+            models.ReportJob.priority.desc(), models.ReportJob.id
+        ).with_for_update(skip_locked=True).first()
+        if job is None:
+            db.commit()
+            return None
+
+        if job.attempts >= REPORT_JOB_MAX_ATTEMPTS:
+            job.status, job.finished_at, job.error = "Failed", now, f"Lease expired {job.attempts} times"
+            db.query(models.Report).filter(models.Report.id == job.report_id).update({"status": "Failed"})
+            db.commit()
+            logger.error(f"Giving up on report {job.report_id} after {job.attempts} attempts")
+            continue
+
+        # 2. Take the lease, guarded on the row still being claimable for backends without row locks
+        result = db.execute(
+            update(models.ReportJob)
+            .where(models.ReportJob.id == job.id, claimable)
+            .values(
+                status="Running", lease_owner=worker_id, started_at=now,
+                lease_expires_at=now + timedelta(seconds=REPORT_JOB_LEASE_SECONDS),
+                attempts=models.ReportJob.attempts + 1,
+            )
+        )
+        db.commit()
+        if result.rowcount == 1:
+            db.refresh(job)
+            return job
+
+
+def renew_lease(db: Session, job_id: int, worker_id: str) -> bool:
+    """Extend the lease of a job this worker holds. False if it was lost to another worker."""
+    result = db.execute(
+        update(models.ReportJob)
+        .where(models.ReportJob.id == job_id, models.ReportJob.lease_owner == worker_id, models.ReportJob.status == "Running")
+        .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=REPORT_JOB_LEASE_SECONDS))
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def finish_job(db: Session, job_id: int, worker_id: str, status: str, error: str = None):
+    db.execute(
+        update(models.ReportJob)
+        .where(models.ReportJob.id == job_id, models.ReportJob.lease_owner == worker_id)
+        .values(status=status, finished_at=datetime.utcnow(), lease_expires_at=None, error=error)
+    )
+    db.commit()
+
+
+def get_job(db: Session, report_id: str) -> Optional[models.ReportJob]:
+    return db.query(models.ReportJob).filter(models.ReportJob.report_id == report_id).first()
+
+
+def queue_position(db: Session, job: models.ReportJob) -> Optional[int]:
+    """1-based position of a queued job in claim order, None once it left the queue."""
+    if job.status != "Queued":
+        return None
+    ahead = db.query(models.ReportJob).filter(
+        models.ReportJob.status == "Queued",
+        or_(
+            models.ReportJob.priority > job.priority,
+            and_(models.ReportJob.priority == job.priority, models.ReportJob.id < job.id),
+        ),
+    ).count()
+    return ahead + 1
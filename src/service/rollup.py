@@ -0,0 +1,257 @@
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from . import interpolation
+from ..db import bulk_load, models, queries
+from ..utils import logger, time_utils
+
+
+logger = logger.get_logger("rollup")
+
+HOUR = pd.Timedelta(hours=1)
+HOUR_NS = HOUR.value
+REBUILD_CHUNK_STORES = 2000  # stores whose whole history is summarized per pass of rebuild_hourly_rollups
+
+
+def summarize_hours(status_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summarize observations into one row per (store_key, UTC hour).
+
+    Only the observations inside an hour are used, so a row never has to change when
+    other hours do. The stretch between the start of the hour and its first observation
+    is left to the reader, who fills it with the previous hour's last_status.
+
+    Args:
+        status_df (pd.DataFrame): Columns store_key, ts (tz-aware UTC), status.
+
+    Returns:
+        pd.DataFrame: Columns store_key, hour_utc, first_offset_seconds, first_status,
+        active_seconds, inactive_seconds, last_status.
+    """
+    df = status_df.sort_values(["store_key", "ts"], ignore_index=True)
+    df["hour_utc"] = df["ts"].dt.floor("h")
+
+    # every observation holds until the next one in the same hour, the last one until the end of the hour
+    next_ts = df.groupby(["store_key", "hour_utc"])["ts"].shift(-1).fillna(df["hour_utc"] + HOUR)
+    held = (next_ts - df["ts"]).dt.total_seconds()
+    df["active_seconds"] = held.where(df["status"] == "active", 0.0)
+    df["inactive_seconds"] = held.where(df["status"] == "inactive", 0.0)
+
+    grouped = df.groupby(["store_key", "hour_utc"], sort=False)
+    rollups = grouped.agg(
+        first_ts=("ts", "first"),
+        first_status=("status", "first"),
+        last_status=("status", "last"),
+        active_seconds=("active_seconds", "sum"),
+        inactive_seconds=("inactive_seconds", "sum"),
+    ).reset_index()
+    rollups["first_offset_seconds"] = (rollups["first_ts"] - rollups["hour_utc"]).dt.total_seconds()
+    return rollups.drop(columns="first_ts")
+
+
+def refresh_hourly_rollups(db: Session, batch_df: pd.DataFrame) -> int:
+    """
+    Recompute the rollup rows of every hour touched by an ingested batch from the raw
+    observations now stored for those hours, so duplicates and late rows are accounted for.
+
+    Args:
+        batch_df (pd.DataFrame): The ingested rows, columns store_key, timestamp_utc.
+
+    Returns:
+        int: Number of rollup rows written.
+    """
+    if batch_df.empty:
+        return 0
+
+    hours = time_utils.parse_utc(batch_df["timestamp_utc"]).dt.floor("h")
+    range_start, range_end = hours.min(), hours.max() + HOUR
+    store_keys = batch_df["store_key"].unique().tolist()
+
+    # 1. Raw observations of the touched stores in the touched hour range
+    stmt = select(models.StoreStatus.store_key, models.StoreStatus.timestamp_utc, models.StoreStatus.status).where(
+        models.StoreStatus.timestamp_utc >= range_start.to_pydatetime(),
+        models.StoreStatus.timestamp_utc < range_end.to_pydatetime(),
+    )
+    raw = queries.read_for_stores(db.connection(), stmt, models.StoreStatus.store_key, store_keys)
+    raw["ts"] = time_utils.parse_utc(raw["timestamp_utc"])
+
+    # 2. Only rewrite the (store, hour) pairs the batch touched
+    touched = pd.MultiIndex.from_arrays([batch_df["store_key"].to_numpy(), hours.to_numpy()]).unique()
+    rollups = summarize_hours(raw[["store_key", "ts", "status"]])
+    rollups = rollups[pd.MultiIndex.from_frame(rollups[["store_key", "hour_utc"]]).isin(touched)]
+    if rollups.empty:
+        return 0
+
+    # 3. Upsert
+    records = rollups.to_dict(orient="records")
+    bulk_load.upsert_rows(
+        db, models.StoreStatusHourly.__table__, records, ["store_key", "hour_utc"],
+        ["first_offset_seconds", "first_status", "active_seconds", "inactive_seconds", "last_status"],
+    )
+    db.commit()
+    logger.info(f"Refreshed {len(records)} hourly rollups for {len(store_keys)} stores")
+    return len(records)
+
+
+def rebuild_hourly_rollups(db: Session) -> int:
+    """Compute the rollup rows of every store from scratch, a chunk of stores at a time."""
+    S = models.StoreStatus
+    store_keys = sorted(store_key for (store_key,) in db.execute(select(S.store_key).distinct()))
+    written = 0
+    for i in range(0, len(store_keys), REBUILD_CHUNK_STORES):
+        raw = queries.read_for_stores(db.connection(), select(S.store_key, S.timestamp_utc, S.status), S.store_key, store_keys[i:i + REBUILD_CHUNK_STORES])
+        raw["ts"] = time_utils.parse_utc(raw["timestamp_utc"])
+        rollups = summarize_hours(raw[["store_key", "ts", "status"]])
+        bulk_load.insert_rows(db, models.StoreStatusHourly.__table__, rollups, ["store_key", "hour_utc"])
+        written += len(rollups)
+    return written
+
+
+def load_rollups(db: Session, store_index: pd.Index, since: pd.Timestamp) -> pd.DataFrame:
+    """
+    Read the rollups of `store_index` from `since` on.
+
+    Returns:
+        pd.DataFrame: Columns code, hour (epoch ns), first_offset_seconds, first_status,
+        active_seconds, inactive_seconds, last_status, sorted by (code, hour).
+    """
+    stmt = select(models.StoreStatusHourly).where(models.StoreStatusHourly.hour_utc >= since.floor("h").to_pydatetime())
+    rollups = queries.read_for_stores(db.connection(), stmt, models.StoreStatusHourly.store_key, store_index.tolist())
+
+    rollups["code"] = store_index.get_indexer(rollups["store_key"]).astype(np.int32)
+    rollups["hour"] = pd.DatetimeIndex(pd.to_datetime(rollups["hour_utc"], utc=True)).asi8
+    return rollups.drop(columns=["id", "store_key", "hour_utc"], errors="ignore").sort_values(["code", "hour"], ignore_index=True)
+
+
+def load_edge_status(db: Session, store_index: pd.Index, edges: pd.DataFrame) -> pd.DataFrame:
+    """
+    Read the raw observations of just the (code, hour) pairs in `edges`, the hours business
+    windows only partly cover. Runs of consecutive hours are read as one time range each.
+
+    Returns:
+        pd.DataFrame: Columns code, ts (epoch ns), status, like bulk_report.load_status.
+    """
+    hours = np.unique(edges["hour"].to_numpy())
+    if len(hours) == 0:
+        return pd.DataFrame({"code": np.array([], dtype=np.int32), "ts": np.array([], dtype=np.int64), "status": np.array([], dtype=object)})
+    gaps = np.diff(hours) > HOUR_NS
+    run_starts, run_ends = hours[np.r_[True, gaps]], hours[np.r_[gaps, True]] + HOUR_NS
+
+    S = models.StoreStatus
+    stmt = select(S.store_key, S.timestamp_utc, S.status).where(or_(*[
+        and_(S.timestamp_utc >= pd.Timestamp(start, tz="UTC").to_pydatetime(), S.timestamp_utc < pd.Timestamp(end, tz="UTC").to_pydatetime())
+        for start, end in zip(run_starts, run_ends)
+    ]))
+    raw = queries.read_for_stores(db.connection(), stmt, S.store_key, store_index[np.unique(edges["code"])].tolist())
+
+    ts = pd.DatetimeIndex(time_utils.parse_utc(raw["timestamp_utc"])).asi8
+    status_df = pd.DataFrame({"code": store_index.get_indexer(raw["store_key"]).astype(np.int32), "ts": ts, "status": raw["status"].to_numpy()})
+    wanted = pd.MultiIndex.from_frame(edges[["code", "hour"]])
+    status_df = status_df[pd.MultiIndex.from_arrays([status_df["code"], ts - ts % HOUR_NS]).isin(wanted)]
+    return status_df.sort_values(["code", "ts"], kind="stable", ignore_index=True)
+
+
+def rollup_uptime(rollups: pd.DataFrame, windows: pd.DataFrame, first_hour: int, last_hour: int, edge_status: Callable[[pd.DataFrame], pd.DataFrame], leading_policy: str = None) -> pd.DataFrame:
+    """
+    Integrate business windows over hourly rollups instead of raw observations.
+
+    Every store gets a dense grid of hours between `first_hour` and `last_hour` (epoch ns).
+    Each cell's active/inactive seconds are the rollup's own plus the status carried in
+    from the last earlier rollup; hours without a rollup carry that status for the whole
+    hour. Hours a window covers completely take their cell's totals. Hours it only partly
+    covers (at most two per window) are integrated exactly from their raw observations,
+    which `edge_status` returns for a frame of (code, hour) pairs, see load_edge_status.
+
+    Returns:
+        pd.DataFrame: Indexed by (code, window) with active/inactive minutes, like interpolation.compute_uptime.
+    """
+    leading_policy = leading_policy or interpolation.LEADING_STATUS_POLICY
+    base_code = int(windows["code"].min())
+    n_codes = int(windows["code"].max()) - base_code + 1
+    n_hours = (last_hour - first_hour) // HOUR_NS + 1
+
+    # 1. Scatter the rollups into the grid
+    rollups = rollups[
+        (rollups["hour"] >= first_hour) & (rollups["hour"] <= last_hour)
+        & (rollups["code"] >= base_code) & (rollups["code"] < base_code + n_codes)
+    ]
+    rows = rollups["code"].to_numpy() - base_code
+    cols = (rollups["hour"].to_numpy() - first_hour) // HOUR_NS
+    has_row = np.zeros((n_codes, n_hours), dtype=bool)
+    has_row[rows, cols] = True
+    offset, active, inactive, last_state = (np.zeros((n_codes, n_hours)) for _ in range(4))
+    offset[rows, cols] = rollups["first_offset_seconds"].to_numpy()
+    active[rows, cols] = rollups["active_seconds"].to_numpy()
+    inactive[rows, cols] = rollups["inactive_seconds"].to_numpy()
+    last_state[rows, cols] = _state(rollups["last_status"])
+
+    # 2. Status carried into each hour: last_status of the closest earlier rollup
+    latest = np.maximum.accumulate(np.where(has_row, np.arange(n_hours), -1), axis=1)
+    previous = np.hstack([np.full((n_codes, 1), -1), latest[:, :-1]])
+    carried = np.take_along_axis(last_state, np.maximum(previous, 0), axis=1)
+    if leading_policy == "backfill":
+        first_state = np.zeros(n_codes)
+        first_rows = ~pd.Series(rows).duplicated().to_numpy()
+        first_state[rows[first_rows]] = _state(rollups["first_status"])[first_rows]
+        carried = np.where(previous >= 0, carried, first_state[:, None])
+    else:
+        carried = np.where(previous >= 0, carried, 0)
+
+    carried_seconds = np.where(has_row, offset, HOUR.total_seconds())
+    hour_active = active + carried_seconds * (carried == 1)
+    hour_inactive = inactive + carried_seconds * (carried == -1)
+
+    # 3. Spread each window over the hours it overlaps
+    window_start = windows["start"].to_numpy()
+    window_end = windows["end"].to_numpy()
+    start_col = (window_start - first_hour) // HOUR_NS
+    lengths = (window_end - 1 - first_hour) // HOUR_NS - start_col + 1
+    owner = np.repeat(np.arange(len(windows)), lengths)
+    col = start_col[owner] + np.arange(len(owner)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    hour_start = first_hour + col * HOUR_NS
+    piece_start = np.maximum(window_start[owner], hour_start)
+    piece_end = np.minimum(window_end[owner], hour_start + HOUR_NS)
+    code = windows["code"].to_numpy()[owner]
+    row = code - base_code
+    totals = pd.DataFrame({
+        "code": code,
+        "window": windows["window"].to_numpy()[owner],
+        "active": hour_active[row, col] / 60,
+        "inactive": hour_inactive[row, col] / 60,
+    })
+
+    # 4. Hours a window only partly covers, from their raw observations and the status carried into them
+    partial = (piece_end - piece_start) < HOUR_NS
+    if partial.any():
+        edges = pd.DataFrame({"code": code[partial], "hour": hour_start[partial]})
+        observations = edge_status(edges.drop_duplicates(ignore_index=True))
+        edge_totals = _edge_uptime(observations, edges, piece_start[partial], piece_end[partial], carried[row[partial], col[partial]])
+        totals.loc[partial, ["active", "inactive"]] = edge_totals[["active", "inactive"]].to_numpy()
+    return totals.groupby(["code", "window"])[["active", "inactive"]].sum()
+
+
+def _edge_uptime(observations: pd.DataFrame, edges: pd.DataFrame, starts: np.ndarray, ends: np.ndarray, carried: np.ndarray) -> pd.DataFrame:
+    """Active/inactive minutes of window pieces inside single hours, one row per piece in order."""
+    pieces = pd.DataFrame({"code": edges["code"].to_numpy(), "window": np.arange(len(edges)), "start": starts, "end": ends})
+
+    # the carried status becomes an observation at the start of the hour, unless one was made right then
+    seeds = pd.DataFrame({
+        "code": edges["code"].to_numpy(),
+        "ts": edges["hour"].to_numpy(),
+        "status": pd.Series(carried).map({1: "active", -1: "inactive"}).to_numpy(),
+    }).drop_duplicates(["code", "ts"])
+    seeds = seeds[~pd.MultiIndex.from_frame(seeds[["code", "ts"]]).isin(pd.MultiIndex.from_frame(observations[["code", "ts"]]))]
+    status_df = pd.concat([seeds, observations[["code", "ts", "status"]]]).sort_values(["code", "ts"], kind="stable", ignore_index=True)
+
+    totals = interpolation.exact_uptime(status_df, pieces, leading_policy="unknown")
+    return totals.reset_index(level="code", drop=True).reindex(np.arange(len(edges)), fill_value=0.0)
+
+
+def _state(statuses: pd.Series) -> np.ndarray:
+    """1 for active, -1 for inactive, 0 for anything else."""
+    return np.select([statuses.to_numpy() == "active", statuses.to_numpy() == "inactive"], [1, -1], 0)
+
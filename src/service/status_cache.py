@@ -0,0 +1,244 @@
+"""
+Columnar in-process copy of the store status history for report computation.
+
+Instead of reading every observation back from the database (as rows, then dicts, then
+a DataFrame) for every report, the history is kept as four flat arrays sorted by
+(store, time):
+
+    store_keys sorted store keys, a store's code is its position
+    codes      int32 store code per observation
+    ts         int64 epoch nanoseconds per observation (the resolution reports work in)
+    status     int8 index into STATUSES, -1 for any other value
+    offsets    int64, the observations of store code c are rows offsets[c]:offsets[c + 1]
+
+The arrays are tagged with the data generation they were read at (see data_version).
+When the generation moves, only the stores the new generations changed are re-read and
+spliced in. With STATUS_CACHE=mmap the arrays are also written to STATUS_CACHE_DIR and
+memory-mapped, so every worker process (and the shard processes they start) shares one
+copy in the page cache, and a restarted worker starts warm. Ingest refreshes the files
+after every store status load.
+
+Expired partitions dropped by retention are not removed from the arrays, they lie
+before every report window and are skipped by the time filter of load_status.
+"""
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import data_version
+from ..db import models, queries
+from ..utils import logger, metrics, time_utils
+
+
+logger = logger.get_logger("status_cache")
+
+STATUS_CACHE = os.getenv("STATUS_CACHE", "off") # "off" reads reports from the database, "memory" keeps the arrays per process, "mmap" shares them through STATUS_CACHE_DIR
+STATUS_CACHE_DIR = os.getenv("STATUS_CACHE_DIR", "./status_cache")
+READ_CHUNK_ROWS = 1000000 # observations converted to arrays at a time on a full build
+
+STATUSES = ["inactive", "active"]
+STATUS_VALUES = np.array(STATUSES + [None], dtype=object) # index -1 (any other status) maps to None
+ARRAYS = ["store_keys", "codes", "ts", "status", "offsets"]
+
+
+class StatusArrays:
+    """The status history of one generation as sorted columnar arrays."""
+
+    def __init__(self, generation: int, store_keys: np.ndarray, codes: np.ndarray, ts: np.ndarray, status: np.ndarray, offsets: Optional[np.ndarray] = None):
+        self.generation = generation
+        self.store_keys = store_keys
+        self.codes = codes
+        self.ts = ts
+        self.status = status
+        self.offsets = offsets if offsets is not None else np.searchsorted(codes, np.arange(len(store_keys) + 1)).astype(np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+
+_cache: Optional[StatusArrays] = None
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return STATUS_CACHE in ("memory", "mmap")
+
+
+def to_arrays(status_df: pd.DataFrame, store_keys: np.ndarray):
+    """Codes (positions in sorted `store_keys`), epoch ns and status codes of raw store_status rows."""
+    codes = np.searchsorted(store_keys, status_df["store_key"].to_numpy()).astype(np.int32)
+    ts = pd.DatetimeIndex(time_utils.parse_utc(status_df["timestamp_utc"])).asi8
+    status = pd.Categorical(status_df["status"], categories=STATUSES).codes.astype(np.int8)
+    return codes, ts, status
+
+
+def sort_arrays(generation: int, store_keys: np.ndarray, codes: np.ndarray, ts: np.ndarray, status: np.ndarray) -> StatusArrays:
+    order = np.lexsort((ts, codes))
+    return StatusArrays(generation, store_keys, codes[order], ts[order], status[order])
+
+
+def build(db: Session, generation: int) -> StatusArrays:
+    """Read the whole history, READ_CHUNK_ROWS observations at a time."""
+    S = models.StoreStatus
+    store_keys = np.array(sorted(store_key for (store_key,) in db.query(S.store_key).distinct()), dtype=np.int32)
+    parts = [
+        to_arrays(chunk, store_keys)
+        for chunk in pd.read_sql(select(S.store_key, S.timestamp_utc, S.status), db.connection(), chunksize=READ_CHUNK_ROWS)
+    ]
+    if not parts:
+        return StatusArrays(generation, store_keys, np.array([], np.int32), np.array([], np.int64), np.array([], np.int8))
+    return sort_arrays(generation, store_keys, *[np.concatenate(arrays) for arrays in zip(*parts)])
+
+
+def refresh(db: Session, base: Optional[StatusArrays], generation: int) -> StatusArrays:
+    """
+    Arrays for `generation`: `base` with the stores changed since its generation re-read,
+    or a full build when there is no base or the changes are not all recorded.
+    """
+    s_time = time.time()
+    changed = data_version.changed_stores(db, base.generation, generation) if base is not None else None
+    if changed is None:
+        arrays = build(db, generation)
+        logger.info(f"Built the status cache of generation {generation}: {len(arrays.ts)} rows in {time.time() - s_time:.2f} seconds")
+        return arrays
+
+    # 1. Current rows of the changed stores
+    S = models.StoreStatus
+    changed_keys = sorted(changed)
+    fresh = queries.read_for_stores(db.connection(), select(S.store_key, S.timestamp_utc, S.status), S.store_key, changed_keys)
+    store_keys = np.union1d(base.store_keys, fresh["store_key"].to_numpy()).astype(np.int32) if len(fresh) else base.store_keys
+
+    # 2. Keep the other stores' rows, renumbered into the (possibly grown) store list, and splice the fresh rows in
+    remap = np.searchsorted(store_keys, base.store_keys).astype(np.int32)
+    replaced = np.isin(base.store_keys, changed_keys)
+    keep = ~replaced[base.codes]
+    codes, ts, status = to_arrays(fresh, store_keys)
+    arrays = sort_arrays(
+        generation, store_keys,
+        np.concatenate([remap[base.codes[keep]], codes]), np.concatenate([base.ts[keep], ts]), np.concatenate([base.status[keep], status]),
+    )
+    logger.info(f"Refreshed the status cache to generation {generation}: {len(changed_keys)} stores, {len(fresh)} rows re-read in {time.time() - s_time:.2f} seconds")
+    return arrays
+
+
+def save(arrays: StatusArrays) -> str:
+    """Write the arrays as .npy files of a generation directory and point `current` at it. Returns the directory."""
+    name = f"g{arrays.generation}"
+    path = os.path.join(STATUS_CACHE_DIR, name)
+    if not os.path.isdir(path):
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+        for array in ARRAYS:
+            np.save(os.path.join(tmp_path, f"{array}.npy"), getattr(arrays, array))
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # another process saved the same generation first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    pointer = os.path.join(STATUS_CACHE_DIR, f"current.tmp{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(STATUS_CACHE_DIR, "current"))
+
+    # older generations: processes that mapped them keep reading the unlinked files
+    for entry in os.listdir(STATUS_CACHE_DIR):
+        if entry.startswith("g") and entry != name and "." not in entry and int(entry[1:]) < arrays.generation:
+            shutil.rmtree(os.path.join(STATUS_CACHE_DIR, entry), ignore_errors=True)
+    return path
+
+
+def load_shared() -> Optional[StatusArrays]:
+    """Memory-map the generation `current` points at, None when nothing was saved yet."""
+    try:
+        with open(os.path.join(STATUS_CACHE_DIR, "current")) as f:
+            name = f.read().strip()
+        path = os.path.join(STATUS_CACHE_DIR, name)
+        loaded = {array: np.load(os.path.join(path, f"{array}.npy"), mmap_mode="r") for array in ARRAYS}
+    except (OSError, ValueError):
+        return None
+    return StatusArrays(int(name[1:]), **loaded)
+
+
+def get(db: Session) -> StatusArrays:
+    """The arrays of the current data generation, refreshed (and with mmap saved) first if it moved."""
+    global _cache
+    generation, _ = data_version.parse(data_version.watermark(db))
+    with _lock:
+        if _cache is not None and _cache.generation == generation:
+            return _cache
+
+        base = _cache
+        if STATUS_CACHE == "mmap":
+            shared = load_shared()
+            if shared is not None and shared.generation == generation:
+                _cache = shared
+                return _cache
+            if shared is not None and (base is None or shared.generation > base.generation):
+                base = shared
+
+        arrays = refresh(db, base, generation)
+        if STATUS_CACHE == "mmap":
+            save(arrays)
+            arrays = load_shared() or arrays
+        _cache = arrays
+        return _cache
+
+
+def load_status(db: Session, store_index: pd.Index, since: Optional[pd.Timestamp] = None, until: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    bulk_report.load_status from the cached arrays: the observations of `store_index`
+    within [since, until] as columns code (position in `store_index`), ts (epoch ns) and
+    status, sorted by (code, ts). Only the selected rows of the arrays are copied.
+    """
+    arrays = get(db)
+
+    # 1. Rows of the requested stores: the whole arrays, or the offsets ranges of a subset
+    if len(store_index) == len(arrays.store_keys) and (store_index.to_numpy() == arrays.store_keys).all():
+        rows = slice(None)
+        codes = arrays.codes
+    else:
+        positions = np.searchsorted(arrays.store_keys, store_index.to_numpy())
+        found = positions < len(arrays.store_keys)
+        found[found] = arrays.store_keys[positions[found]] == store_index.to_numpy()[found]
+        starts, ends = arrays.offsets[positions[found]], arrays.offsets[positions[found] + 1]
+        lengths = ends - starts
+        rows = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        codes = np.repeat(np.flatnonzero(found).astype(np.int32), lengths)
+
+    # 2. Time filter; both store lists are sorted, so (code, ts) order is kept
+    ts = arrays.ts[rows]
+    keep = np.ones(len(ts), dtype=bool)
+    if since is not None:
+        keep &= ts >= since.value
+    if until is not None:
+        keep &= ts <= until.value
+
+    return pd.DataFrame({
+        "code": codes[keep],
+        "ts": ts[keep],
+        "status": STATUS_VALUES[arrays.status[rows][keep]],
+    })
+
+
+def _cache_stats() -> dict:
+    arrays = _cache
+    if arrays is None:
+        return {}
+    return {
+        (("stat", "generation"),): arrays.generation,
+        (("stat", "rows"),): len(arrays.ts),
+        (("stat", "stores"),): len(arrays.store_keys),
+        (("stat", "bytes"),): arrays.nbytes,
+    }
+
+
+metrics.register_gauge("status_cache", _cache_stats)
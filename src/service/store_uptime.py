@@ -0,0 +1,193 @@
+"""
+One store's uptime over an arbitrary window, answered from prefix sums.
+
+store_status_prefix keeps, at every observation, the time the store spent active and
+inactive from its first observation up to it. As in interpolation.exact_uptime, the time
+spent in a state up to any instant t is F(t) = total at the last observation before t +
+time since then, so a business interval [a, b) costs F(b) - F(a) and a window costs one
+query with an index lookup per business-interval boundary. The prefix sums
+are maintained at ingest, after every store status batch.
+"""
+from datetime import timedelta
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+
+from . import bulk_report, interpolation
+from ..db import bulk_load, models, queries, stores
+from ..utils import logger, time_utils
+
+
+logger = logger.get_logger("store_uptime")
+
+MAX_WINDOW = timedelta(days=31)
+ANCHOR_LOOKBACK = timedelta(days=1) # where the previous observation of a store is looked for first
+PREFIX_COLUMNS = ["store_key", "timestamp_utc", "status", "cum_active_seconds", "cum_inactive_seconds"]
+
+
+def prefix_sums(raw: pd.DataFrame, anchors: pd.DataFrame) -> pd.DataFrame:
+    """
+    Running active/inactive seconds of `raw` observations (store_key, timestamp_utc, status),
+    continuing from each store's `anchors` row (a stored prefix row before them) when it has one.
+    """
+    rows = raw.assign(is_anchor=False)
+    if not anchors.empty:
+        rows = pd.concat([anchors[PREFIX_COLUMNS].assign(is_anchor=True), rows], ignore_index=True)
+    for state in ["active", "inactive"]:
+        rows[f"cum_{state}_seconds"] = rows.get(f"cum_{state}_seconds", np.nan)
+    rows = rows.sort_values(["store_key", "timestamp_utc"], ignore_index=True)
+    per_store = rows.groupby("store_key", sort=False)
+
+    held = (per_store["timestamp_utc"].shift(-1) - rows["timestamp_utc"]).dt.total_seconds().fillna(0.0)
+    for state in ["active", "inactive"]:
+        segment = held.where(rows["status"] == state, 0.0)
+        base = rows[f"cum_{state}_seconds"].where(rows["is_anchor"]).fillna(0.0)
+        rows[f"cum_{state}_seconds"] = segment.groupby(rows["store_key"]).cumsum() - segment + base.groupby(rows["store_key"]).transform("first")
+    return rows.loc[~rows["is_anchor"], PREFIX_COLUMNS]
+
+
+def refresh_prefix_sums(db: Session, batch_df: pd.DataFrame) -> int:
+    """
+    Rewrite the prefix rows of the stores in an ingested batch from the batch's earliest
+    observation on, continuing from each store's last prefix row before it.
+
+    Returns:
+        int: Number of prefix rows written.
+    """
+    if batch_df.empty:
+        return 0
+    since = time_utils.parse_utc(batch_df["timestamp_utc"]).min()
+    store_keys = batch_df["store_key"].unique().tolist()
+    P = models.StoreStatusPrefix
+
+    # 1. Anchors: the last prefix row before `since`, looked for in a short lookback first
+    recent = queries.read_for_stores(db.connection(), select(*[getattr(P, c) for c in PREFIX_COLUMNS]).where(
+        P.timestamp_utc >= (since - ANCHOR_LOOKBACK).to_pydatetime(), P.timestamp_utc < since.to_pydatetime(),
+    ), P.store_key, store_keys)
+    recent["timestamp_utc"] = time_utils.parse_utc(recent["timestamp_utc"])
+    anchors = recent.sort_values("timestamp_utc").groupby("store_key").tail(1)
+
+    missing = sorted(set(store_keys) - set(anchors["store_key"]))
+    if missing:
+        latest = queries.read_for_stores(db.connection(), select(P.store_key, func.max(P.timestamp_utc).label("timestamp_utc")).where(
+            P.timestamp_utc < since.to_pydatetime()
+        ).group_by(P.store_key), P.store_key, missing)
+        # the rows themselves, by (store_key, timestamp_utc) in IN-list batches rather than one query per store
+        keys = [(int(store_key), time_utils.parse_utc(pd.Series([ts])).iloc[0].to_pydatetime()) for store_key, ts in latest.itertuples(index=False)]
+        older = [
+            pd.read_sql(select(*[getattr(P, c) for c in PREFIX_COLUMNS]).where(tuple_(P.store_key, P.timestamp_utc).in_(keys[i:i + queries.IN_BATCH_SIZE])), db.connection())
+            for i in range(0, len(keys), queries.IN_BATCH_SIZE)
+        ]
+        anchors = pd.concat([frame for frame in [anchors, *older] if not frame.empty] or [anchors], ignore_index=True)
+        anchors["timestamp_utc"] = time_utils.parse_utc(anchors["timestamp_utc"])
+
+    # 2. Raw observations from `since` on, now including the batch
+    S = models.StoreStatus
+    raw = queries.read_for_stores(db.connection(), select(S.store_key, S.timestamp_utc, S.status).where(
+        S.timestamp_utc >= since.to_pydatetime()
+    ), S.store_key, store_keys)
+    raw["timestamp_utc"] = time_utils.parse_utc(raw["timestamp_utc"])
+
+    # 3. Upsert
+    rows = prefix_sums(raw, anchors)
+    if rows.empty:
+        return 0
+    records = rows.to_dict(orient="records")
+    bulk_load.upsert_rows(db, P.__table__, records, ["store_key", "timestamp_utc"], ["status", "cum_active_seconds", "cum_inactive_seconds"])
+    db.commit()
+    logger.info(f"Refreshed {len(records)} prefix rows for {len(store_keys)} stores")
+    return len(records)
+
+
+def rebuild_prefix_sums(db: Session) -> int:
+    """Compute the prefix rows of every store from scratch, a chunk of stores at a time."""
+    S = models.StoreStatus
+    store_keys = sorted(bulk_report.list_store_keys(db))
+    written = 0
+    for i in range(0, len(store_keys), bulk_report.STORE_CHUNK_SIZE):
+        raw = queries.read_for_stores(db.connection(), select(S.store_key, S.timestamp_utc, S.status), S.store_key, store_keys[i:i + bulk_report.STORE_CHUNK_SIZE])
+        raw["timestamp_utc"] = time_utils.parse_utc(raw["timestamp_utc"])
+        rows = prefix_sums(raw, pd.DataFrame(columns=PREFIX_COLUMNS))
+        bulk_load.insert_rows(db, models.StoreStatusPrefix.__table__, rows, ["store_key", "timestamp_utc"])
+        written += len(rows)
+    return written
+
+
+def business_intervals(db: Session, store_key: int, start: pd.Timestamp, end: pd.Timestamp) -> np.ndarray:
+    """The store's business hours within [start, end) as an (n, 2) array of epoch ns, through time_utils.compile_schedule."""
+    timezone_row = db.query(models.Timezone.timezone_str).filter(models.Timezone.store_key == store_key).first()
+    store_tz = timezone_row[0] if timezone_row else bulk_report.DEFAULT_TIMEZONE
+    menu_rows = db.query(models.MenuHour.dayOfWeek, models.MenuHour.start_time_local, models.MenuHour.end_time_local).filter(models.MenuHour.store_key == store_key).all()
+    schedule = time_utils.normalize_schedule(menu_rows)
+
+    # each compiled schedule covers COMPILED_DAYS_BEFORE days up to its reference date, step a week at a time
+    compiled = []
+    reference_date = end.date()
+    while True:
+        try:
+            compiled.append(time_utils.compile_schedule(store_tz, schedule, reference_date))
+        except Exception as e:
+            logger.error(f"Unknown timezone {store_tz}, falling back to {bulk_report.DEFAULT_TIMEZONE}: {e}")
+            compiled.append(time_utils.compile_schedule(bulk_report.DEFAULT_TIMEZONE, schedule, reference_date))
+        if reference_date - timedelta(days=time_utils.COMPILED_DAYS_BEFORE) < start.date():
+            break
+        reference_date -= timedelta(days=7)
+
+    intervals = np.unique(np.concatenate(compiled), axis=0)
+    intervals = np.column_stack([np.maximum(intervals[:, 0], start.value), np.minimum(intervals[:, 1], end.value)])
+    return intervals[intervals[:, 0] < intervals[:, 1]]
+
+
+def store_uptime(db: Session, store_id: str, start: pd.Timestamp, end: pd.Timestamp, leading_policy: str = None) -> Dict:
+    """
+    Uptime and downtime of one store within its business hours in [start, end), in minutes.
+
+    Returns:
+        dict: store_id, start, end, uptime_minutes, downtime_minutes, business_minutes,
+        or None when the store has no observations.
+    """
+    leading_policy = leading_policy or interpolation.LEADING_STATUS_POLICY
+    store_key = stores.key_for(db, store_id)
+    if store_key is None:
+        return None
+    P = models.StoreStatusPrefix
+    columns = [P.timestamp_utc, P.status, P.cum_active_seconds, P.cum_inactive_seconds]
+
+    # 1. The last prefix row at or before every business-interval boundary, plus the first row, in one query:
+    #    one max() per boundary, each a descent of the (store_key, timestamp_utc) index
+    intervals = business_intervals(db, store_key, start, end)
+    points = intervals.ravel()
+    anchor_ts = [
+        select(func.max(P.timestamp_utc)).where(P.store_key == store_key, P.timestamp_utc <= pd.Timestamp(point, tz="UTC").to_pydatetime()).scalar_subquery()
+        for point in np.unique(points)
+    ]
+    anchor_ts.append(select(func.min(P.timestamp_utc)).where(P.store_key == store_key).scalar_subquery())
+    rows = db.execute(select(*columns).where(P.store_key == store_key, P.timestamp_utc.in_(anchor_ts)).order_by(P.timestamp_utc)).all()
+    if not rows:
+        return None
+
+    ts = pd.DatetimeIndex(time_utils.parse_utc(pd.Series([row[0] for row in rows]))).asi8
+    is_active = np.array([row[1] == "active" for row in rows])
+    is_inactive = np.array([row[1] == "inactive" for row in rows])
+    cum_active = np.array([row[2] for row in rows])
+    cum_inactive = np.array([row[3] for row in rows])
+
+    # 2. F at every boundary; before the first observation F runs backwards (backfill) or stays flat
+    if leading_policy != "backfill":
+        points = np.maximum(points, ts[0])
+    idx = np.maximum(np.searchsorted(ts, points, side="right") - 1, 0)
+    elapsed = (points - ts[idx]) / 1e9
+    active = (cum_active[idx] + elapsed * is_active[idx]).reshape(-1, 2)
+    inactive = (cum_inactive[idx] + elapsed * is_inactive[idx]).reshape(-1, 2)
+
+    return {
+        "store_id": store_id,
+        "start": start.to_pydatetime(),
+        "end": end.to_pydatetime(),
+        "uptime_minutes": round(float((active[:, 1] - active[:, 0]).sum()) / 60, 2),
+        "downtime_minutes": round(float((inactive[:, 1] - inactive[:, 0]).sum()) / 60, 2),
+        "business_minutes": round(float((intervals[:, 1] - intervals[:, 0]).sum()) / 60e9, 2),
+    }
@@ -0,0 +1,123 @@
+"""
+Resumable chunked uploads of the /load_data files.
+
+A client announces a file (init), sends it in fixed-size chunks in any order and as
+often as it needs to (put chunk), and loads it once every chunk is in (commit). Chunks
+are written in place into one file under UPLOAD_DIR and recorded with their sha256, so
+after a dropped connection the client asks which chunks arrived and sends the rest.
+A file whose sha256 was loaded before is answered at init, without a transfer.
+"""
+import hashlib
+import math
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import content_hash
+from ..db import bulk_load, models
+
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads") # files of chunked uploads until they are committed
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(8 * 1024 * 1024))) # default chunk size offered at init
+UPLOAD_MAX_CHUNK_BYTES = 64 * 1024 * 1024
+
+# the /load_data file each upload kind stands for, and the table it loads into
+KINDS = {
+    "store_status": models.StoreStatus.__tablename__,
+    "menu_hours": models.MenuHour.__tablename__,
+    "timezones": models.Timezone.__tablename__,
+}
+
+
+def upload_path(upload_id: str) -> str:
+    return f"{UPLOAD_DIR}/{upload_id}.csv"
+
+
+def chunk_count(upload: models.Upload) -> int:
+    return max(math.ceil(upload.size / upload.chunk_bytes), 1)
+
+
+def create_upload(db: Session, upload_id: str, kind: str, filename: str, size: int, chunk_bytes: int, file_hash: Optional[str] = None) -> models.Upload:
+    upload = models.Upload(
+        id=upload_id, kind=kind, filename=filename, size=size, chunk_bytes=chunk_bytes,
+        content_hash=file_hash, status="Receiving", created_at=datetime.utcnow(),
+    )
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def get_upload(db: Session, upload_id: str) -> Optional[models.Upload]:
+    return db.query(models.Upload).filter(models.Upload.id == upload_id).first()
+
+
+def already_loaded(db: Session, kind: str, file_hash: Optional[str]) -> Optional[models.IngestedContent]:
+    """The record of a file with this sha256 loaded as `kind` before, None if it never was."""
+    if not file_hash or not content_hash.enabled():
+        return None
+    return content_hash.seen(db, KINDS[kind], "file", file_hash)
+
+
+def missing_chunks(db: Session, upload: models.Upload) -> List[int]:
+    """Chunk numbers not received yet, in order: what a resuming client still has to send."""
+    received = {chunk for (chunk,) in db.query(models.UploadChunk.chunk).filter(models.UploadChunk.upload_id == upload.id)}
+    return [chunk for chunk in range(chunk_count(upload)) if chunk not in received]
+
+
+def expected_bytes(upload: models.Upload, chunk: int) -> int:
+    """Size of chunk number `chunk`: chunk_bytes, except for the remainder in the last one."""
+    return min(upload.chunk_bytes, upload.size - chunk * upload.chunk_bytes)
+
+
+def put_chunk(db: Session, upload: models.Upload, chunk: int, data: bytes) -> str:
+    """
+    Write one chunk at its offset in the upload's file and record its sha256. Sending a
+    chunk again overwrites it, a chunk already received with the same hash is not rewritten.
+
+    Returns:
+        str: The chunk's sha256.
+    """
+    chunk_hash = content_hash.digest(data)
+    known = db.query(models.UploadChunk.content_hash).filter(
+        models.UploadChunk.upload_id == upload.id, models.UploadChunk.chunk == chunk
+    ).scalar()
+    if known == chunk_hash:
+        return chunk_hash
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    fd = os.open(upload_path(upload.id), os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        os.pwrite(fd, data, chunk * upload.chunk_bytes)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    # recorded only once the bytes are on disk, so a recorded chunk is always complete
+    bulk_load.upsert_rows(
+        db, models.UploadChunk.__table__, [{"upload_id": upload.id, "chunk": chunk, "content_hash": chunk_hash, "bytes": len(data)}],
+        ["upload_id", "chunk"], ["content_hash", "bytes"],
+    )
+    db.commit()
+    return chunk_hash
+
+
+def file_digest(upload: models.Upload) -> str:
+    """sha256 of the assembled file, read UPLOAD_CHUNK_BYTES at a time."""
+    digest = hashlib.sha256()
+    with open(upload_path(upload.id), "rb") as f:
+        for data in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def set_status(db: Session, upload: models.Upload, status: str):
+    upload.status = status
+    db.commit()
+
+
+def remove_file(upload: models.Upload):
+    if os.path.exists(upload_path(upload.id)):
+        os.remove(upload_path(upload.id))
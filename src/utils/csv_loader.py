@@ -1,194 +1,405 @@
-import pandas as pd
-from sqlalchemy.orm import Session
-from sqlalchemy.dialects.postgresql import insert as pg_insert
-from fastapi import UploadFile, HTTPException, status
-import time
-from dask import dataframe as df1
-from tempfile import NamedTemporaryFile
-
-from ..db import models
-from ..utils import logger
-
-
-
-
-logger = logger.get_logger("csv_loader")
-
-BATCH_SIZE = 100000
-
-async def load_store_status(db: Session, file: UploadFile):
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Only CSV files are allowed for store status upload."
-        )
-    
-    total_inserted = 0
-    try:
-        s_time_dask = time.time()
-        
-        with NamedTemporaryFile(delete=False, mode='wb+') as tmp:
-            contents = await file.read()
-            tmp.write(contents)
-            tmp.flush()
-            tmp_path = tmp.name
-
-        dask_df = df1.read_csv(tmp_path)
-
-        e_time_dask = time.time()
-
-        logger.info(f"CSV read time: {e_time_dask - s_time_dask:.2f} seconds")
-
-        s_time_insert = time.time()
-        total_inserted = 0
-        for part in dask_df.partitions:
-            df = part.compute()
-            records = df.to_dict(orient="records")
-
-            for i in range(0, len(records), BATCH_SIZE):
-                batch = records[i:i + BATCH_SIZE]
-                stmt = pg_insert(models.StoreStatus.__table__).values(batch)
-                stmt = stmt.on_conflict_do_nothing(
-                    index_elements=["store_id", "timestamp_utc"]
-                )
-                try:
-                    db.execute(stmt)
-                    db.commit()
-                    total_inserted += len(batch)
-                    logger.info(f"Processed batch {i // BATCH_SIZE + 1} with {len(batch)} records.")
-                except Exception as e:
-                    db.rollback()
-                    logger.error(f"Batch insert failed at batch {i // BATCH_SIZE + 1}: {e}")
-                    return {"status_code":status.HTTP_500_INTERNAL_SERVER_ERROR,"message": f"Database error during batch insert: {e}"}
-                
-        e_time_insert = time.time()
-        logger.info(f"Batch insert time: {e_time_insert - s_time_insert:.2f} seconds")
-
-        logger.info(f"Inserted/processed {total_inserted} records from Dask DataFrame.")
-        return {"status_code": status.HTTP_200_OK ,"message": f"Successfully processed {total_inserted} records from {file.filename}."}
-
-    except pd.errors.EmptyDataError:
-        return {"status_code": status.HTTP_400_BAD_REQUEST ,"message": "CSV file is empty."}
-    except pd.errors.ParserError as e:
-         return {"status_code": status.HTTP_400_BAD_REQUEST ,"message": f"Error parsing CSV file: {e}"}
-
-    except Exception as e:
-        db.rollback()
-        logger.error(f"An unexpected error occurred during CSV processing: {e}")
-        return {"status_code": status.HTTP_500_INTERNAL_SERVER_ERROR ,"message": f"An unexpected error occurred: {e}"}
-
-    finally:
-        await file.close()
-
-async def load_menu_hours(db: Session,file: UploadFile):
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Only CSV files are allowed for menu hour upload."
-        )
-
-    try:
-        s_time_dask = time.time()
-        with NamedTemporaryFile(delete=False, mode='wb+') as tmp:
-            contents = await file.read()
-            tmp.write(contents)
-            tmp.flush()
-            tmp_path = tmp.name
-        ddf= df1.read_csv(tmp_path)
-        e_time_dask = time.time()
-        logger.info(f"CSV read time: {e_time_dask - s_time_dask:.2f} seconds")
-
-        s_time_insert = time.time()
-        total_inserted = 0
-
-        for part in ddf.partitions:
-            df = part.compute()
-
-            records = df.to_dict(orient="records")
-
-            for i in range(0, len(records), BATCH_SIZE):
-                batch = records[i:i + BATCH_SIZE]
-                stmt = pg_insert(models.MenuHour.__table__).values(batch)
-                
-                stmt = stmt.on_conflict_do_nothing(
-                    index_elements=["store_id", "dayOfWeek", "start_time_local", "end_time_local"]
-                )
-
-                try:
-                    db.execute(stmt)
-                    db.commit()
-                    total_inserted += len(batch)
-                    logger.info(f"Processed batch {i // BATCH_SIZE + 1} with {len(batch)} records.")
-                except Exception as e:
-                    db.rollback()
-                    logger.error(f"Batch insert failed at batch {i // BATCH_SIZE + 1}: {e}")
-                    return {"status_code": status.HTTP_500_INTERNAL_SERVER_ERROR ,"message": f"Database error during batch insert: {e}"}
-
-        e_time_insert = time.time()
-        logger.info(f"Batch insert time: {e_time_insert - s_time_insert:.2f} seconds")
-        return {"status_code": status.HTTP_200_OK ,"message": f"Successfully processed {total_inserted} menu hour records from {file.filename}."}
-
-        
-    except Exception as e:
-        db.rollback()
-        logger.error(f"An unexpected error occurred during CSV processing: {e}")
-        return {"status_code": status.HTTP_500_INTERNAL_SERVER_ERROR ,"message": f"An unexpected error occurred: {e}"}
-
-    finally:
-        await file.close()
-
-async def load_timezones(db: Session, file: UploadFile):
-    if not file.filename.endswith(".csv"):
-        return {"status_code": status.HTTP_400_BAD_REQUEST ,"message": "Only CSV files are allowed for timezone upload."}
-
-    try:
-        s_time_dask = time.time()
-        with NamedTemporaryFile(delete=False, mode='wb+') as tmp:
-            contents = await file.read()
-            tmp.write(contents)
-            tmp.flush()
-            tmp_path = tmp.name
-        ddf= df1.read_csv(tmp_path)
-        e_time_dask = time.time()
-        logger.info(f"CSV read time: {e_time_dask - s_time_dask:.2f} seconds")
-
-        s_time_insert = time.time()
-        total_inserted = 0
-
-        for part in ddf.partitions:
-            df = part.compute()
-
-            records = df.to_dict(orient="records")
-
-            for i in range(0, len(records), BATCH_SIZE):
-                batch = records[i:i + BATCH_SIZE]
-                stmt = pg_insert(models.Timezone.__table__).values(batch)
-                
-                stmt = stmt.on_conflict_do_nothing(
-                    index_elements=["store_id", "timezone_str"]
-                )
-
-                try:
-                    db.execute(stmt)
-                    db.commit()
-                    total_inserted += len(batch)
-                    logger.info(f"Processed batch {i // BATCH_SIZE + 1} with {len(batch)} records.")
-                except Exception as e:
-                    db.rollback()
-                    logger.error(f"Batch insert failed at batch {i // BATCH_SIZE + 1}: {e}")
-                    return {"status_code": status.HTTP_500_INTERNAL_SERVER_ERROR ,"message": f"Database error during batch insert: {e}"}
-
-        e_time_insert = time.time()
-        logger.info(f"Batch insert time: {e_time_insert - s_time_insert:.2f} seconds")
-        return {"status_code": status.HTTP_200_OK ,"message": f"Successfully processed {total_inserted} timezone records from {file.filename}."}
-
-        
-    except Exception as e:
-        db.rollback()
-        logger.error(f"An unexpected error occurred during CSV processing: {e}")
-        return {"status_code": status.HTTP_500_INTERNAL_SERVER_ERROR ,"message": f"An unexpected error occurred: {e}"}
-
-    finally:
-        await file.close()
-
-    
\ No newline at end of file
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from sqlalchemy.orm import Session
+from fastapi import UploadFile, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+import time
+
+from ..db import bulk_load, models, partitioning, session, stores
+from ..service import content_hash, data_version, rollup, status_cache, store_uptime
+from ..utils import logger, metrics, time_utils
+
+
+
+
+logger = logger.get_logger("csv_loader")
+
+BATCH_SIZE = 100000
+INGEST_CHUNK_BYTES = int(os.getenv("INGEST_CHUNK_BYTES", str(16 * 1024 * 1024))) # upload bytes parsed at a time, bounds ingest memory
+INGEST_EXECUTOR = os.getenv("INGEST_EXECUTOR", "process") # "process" parses and inserts uploads in child processes, "thread" in the API's threadpool
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2")) # blocks parsed and inserted in parallel, each over its own connection
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", str(INGEST_WORKERS + 1))) # blocks of one file in flight before reading its upload pauses
+INGEST_NICE = int(os.getenv("INGEST_NICE", "10")) # niceness added to ingest processes, so the API process wins the CPU for status polls
+
+_ingest_pool = None
+_in_ingest_pool = False # set in ingest processes, which send their metrics back with every block
+
+class InvalidBlockError(Exception):
+    """A block whose rows could not be parsed or converted to the table's types: bad data, not a database error."""
+
+async def load_store_status(db: Session, file: UploadFile):
+    if not file.filename.endswith(".csv"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only CSV files are allowed for store status upload."
+        )
+
+    result = await ingest_csv(
+        db, file, models.StoreStatus.__table__, ["store_key", "timestamp_utc"], "records",
+        prepare=prepare_store_status,
+        refresh=refresh_derived, # bring the rollups and prefix sums of the store hours the load touched in step with the raw rows
+    )
+    if result["status_code"] == status.HTTP_200_OK:
+        try:
+            dropped = await run_in_threadpool(partitioning.drop_expired_partitions, db)
+            if dropped:
+                result["dropped_partitions"] = dropped
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Dropping expired store_status partitions failed: {e}")
+        if status_cache.STATUS_CACHE == "mmap" and result["inserted"]:
+            # splice the new rows into the shared status arrays now rather than in the next report
+            try:
+                await run_blocking(refresh_status_cache)
+            except Exception as e:
+                logger.error(f"Refreshing the shared status cache failed: {e}")
+    return result
+
+def refresh_status_cache() -> int:
+    # with a session of its own, as it runs in an ingest process
+    db = session.SessionLocal()
+    try:
+        return status_cache.get(db).generation
+    finally:
+        db.close()
+
+def prepare_store_keys(db: Session, df: pd.DataFrame) -> pd.DataFrame:
+    # rows reference stores by their integer store_key, new store_ids get one here
+    df.insert(0, "store_key", stores.keys_for(db, df.pop("store_id")))
+    return df
+
+def prepare_store_status(db: Session, df: pd.DataFrame) -> pd.DataFrame:
+    # timestamps are parsed once here and stored as timestamptz, never re-parsed by reports
+    df["timestamp_utc"] = time_utils.parse_utc(df["timestamp_utc"].astype(str))
+    partitioning.ensure_partitions(db, df["timestamp_utc"])
+    return prepare_store_keys(db, df)
+
+def refresh_derived(db: Session, batch_df: pd.DataFrame):
+    with metrics.span("ingest_phase_seconds", phase="refresh_rollups"):
+        rollup.refresh_hourly_rollups(db, batch_df)
+    with metrics.span("ingest_phase_seconds", phase="refresh_prefix_sums"):
+        store_uptime.refresh_prefix_sums(db, batch_df)
+
+async def load_menu_hours(db: Session,file: UploadFile):
+    if not file.filename.endswith(".csv"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only CSV files are allowed for menu hour upload."
+        )
+
+    return await ingest_csv(db, file, models.MenuHour.__table__, ["store_key", "dayOfWeek", "start_time_local", "end_time_local"], "menu hour records", prepare=prepare_store_keys)
+
+async def load_timezones(db: Session, file: UploadFile):
+    if not file.filename.endswith(".csv"):
+        return {"status_code": status.HTTP_400_BAD_REQUEST ,"message": "Only CSV files are allowed for timezone upload."}
+
+    return await ingest_csv(db, file, models.Timezone.__table__, ["store_key", "timezone_str"], "timezone records", prepare=prepare_store_keys)
+
+async def iter_csv_blocks(file: UploadFile, chunk_bytes: int = INGEST_CHUNK_BYTES, file_hash=None):
+    """
+    Cut an upload into blocks of whole rows while it is being received, `chunk_bytes` at a time.
+
+    Each chunk is cut at its last newline and prefixed with the header line, the partial
+    row after the cut is carried into the next chunk. Only one chunk (plus a partial row)
+    is held in memory at a time. Quoted fields must not contain newlines, which holds for
+    the store status, menu hour and timezone exports.
+
+    Args:
+        file_hash: Optional hashlib object updated with every byte read, off the event loop.
+
+    Yields:
+        bytes: A CSV of the header and the whole rows of each chunk.
+    """
+    header = None
+    remainder = b""
+    while True:
+        data = await file.read(chunk_bytes)
+        if not data:
+            break
+        if file_hash is not None:
+            # hashlib releases the GIL on large buffers, so this runs beside the event loop
+            await run_in_threadpool(file_hash.update, data)
+        data = remainder + data
+
+        if header is None:
+            newline = data.find(b"\n")
+            if newline == -1:
+                remainder = data
+                continue
+            header, data = data[:newline + 1], data[newline + 1:]
+
+        cut = data.rfind(b"\n")
+        if cut == -1:
+            remainder = data
+            continue
+        body, remainder = data[:cut + 1], data[cut + 1:]
+        if body.strip():
+            yield header + body
+
+    if header is None:
+        if not remainder.strip():
+            raise pd.errors.EmptyDataError("No columns to parse from file")
+        header, remainder = remainder + b"\n", b""
+    if remainder.strip():
+        yield header + remainder
+
+def _init_ingest_worker():
+    global _in_ingest_pool
+    _in_ingest_pool = True
+    if INGEST_NICE and hasattr(os, "nice"):
+        os.nice(INGEST_NICE)
+
+def ingest_pool() -> ProcessPoolExecutor:
+    global _ingest_pool
+    if _ingest_pool is None:
+        # spawned, not forked: a forked child would inherit the server's listening socket and event loop
+        _ingest_pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=_init_ingest_worker)
+    return _ingest_pool
+
+def start_ingest_pool():
+    """Start every ingest process now, each importing this module, instead of on the first load (warmup)."""
+    if INGEST_EXECUTOR != "process":
+        return
+    pool = ingest_pool()
+    for future in [pool.submit(os.getpid) for _ in range(INGEST_WORKERS)]:
+        future.result()
+
+def stop_ingest_pool():
+    global _ingest_pool
+    if _ingest_pool is not None:
+        _ingest_pool.shutdown(cancel_futures=True)
+        _ingest_pool = None
+
+async def run_blocking(fn, *args):
+    """Run `fn(*args)` off the event loop: in an ingest process (INGEST_EXECUTOR=process) or the threadpool."""
+    global _ingest_pool
+    if INGEST_EXECUTOR != "process":
+        return await run_in_threadpool(fn, *args)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(ingest_pool(), fn, *args)
+    except BrokenProcessPool:
+        # an ingest process died, the next load starts a new pool
+        _ingest_pool = None
+        raise
+
+def ingest_block(table_name: str, block: bytes, conflict_columns: list, prepare=None, track_touched: bool = False) -> dict:
+    """
+    Parse one block of an upload and insert it batch by batch with its own session (so its
+    own connection). Runs in the ingest executor, INGEST_WORKERS blocks at a time.
+
+    A block whose content hash was loaded into the table before is skipped unparsed
+    (content_hash). The hash of a block that loaded completely is returned, ingest_csv
+    records it once the load's refresh and data version bump are through.
+
+    Returns:
+        dict: bytes, rows, inserted, skipped_blocks, the block's hash and the store_keys that got new rows; with
+        `track_touched` the (store_key, hour) pairs of the batches that inserted rows, for
+        refresh_loaded; and the metrics recorded when run in an ingest process.
+    """
+    table = models.Base.metadata.tables[table_name]
+    result = {"bytes": len(block), "rows": 0, "inserted": 0, "skipped_blocks": 0, "store_keys": set(), "touched": [], "block_hash": None}
+    db = session.SessionLocal()
+    try:
+        block_hash = content_hash.digest(block) if content_hash.enabled() else None
+        known = content_hash.seen(db, table_name, "block", block_hash) if block_hash else None
+        if known:
+            result.update(rows=known.rows, skipped_blocks=1)
+            metrics.inc("ingest_rows_total", known.rows, table=table_name)
+            metrics.inc("ingest_skipped_bytes_total", len(block), table=table_name)
+            logger.info("Skipped a block of %d %s records loaded before.", known.rows, table_name)
+            return _block_result(result)
+
+        try:
+            df = pd.read_csv(io.BytesIO(block))
+            if prepare:
+                with metrics.span("ingest_phase_seconds", phase="prepare"):
+                    df = prepare(db, df)
+        except (ValueError, TypeError, KeyError) as e:
+            # parser errors, unparseable timestamps and missing columns all end up here
+            db.rollback()
+            raise InvalidBlockError(f"{type(e).__name__}: {e}") from e
+
+        for i in range(0, len(df), BATCH_SIZE):
+            batch_df = df.iloc[i:i + BATCH_SIZE]
+            try:
+                with metrics.span("ingest_batch_seconds", table=table_name):
+                    inserted = bulk_load.insert_rows(db, table, batch_df, conflict_columns)
+            except Exception:
+                db.rollback()
+                raise
+            result["rows"] += len(batch_df)
+            result["inserted"] += inserted
+            metrics.inc("ingest_rows_total", len(batch_df), table=table_name)
+            metrics.inc("ingest_inserted_rows_total", inserted, table=table_name)
+            if inserted:
+                result["store_keys"].update(batch_df["store_key"].tolist())
+                if track_touched:
+                    result["touched"].append(pd.DataFrame({
+                        "store_key": batch_df["store_key"], "timestamp_utc": batch_df["timestamp_utc"].dt.floor("h"),
+                    }).drop_duplicates())
+            logger.info("Processed batch of %d %s records, %d new.", len(batch_df), table_name, inserted)
+
+        result["block_hash"] = block_hash
+    finally:
+        db.close()
+    return _block_result(result)
+
+def _block_result(result: dict) -> dict:
+    result["touched"] = pd.concat(result["touched"], ignore_index=True) if result["touched"] else None
+    if _in_ingest_pool:
+        result["metrics"] = metrics.drain()
+    return result
+
+def refresh_loaded(refresh, touched: pd.DataFrame) -> dict:
+    """
+    Run `refresh(db, batch_df)` over the (store_key, hour) pairs a load inserted rows for,
+    BATCH_SIZE keys at a time in store order, once every block is in. Blocks insert in
+    parallel, so refreshing per block could interleave two refreshes of one store.
+    A failed refresh fails the load.
+    """
+    touched = touched.drop_duplicates().sort_values(["store_key", "timestamp_utc"], ignore_index=True)
+    db = session.SessionLocal()
+    try:
+        for i in range(0, len(touched), BATCH_SIZE):
+            try:
+                refresh(db, touched.iloc[i:i + BATCH_SIZE])
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Post-insert step failed for {len(touched.iloc[i:i + BATCH_SIZE])} touched store hours: {e}")
+                raise
+    finally:
+        db.close()
+    return {"metrics": metrics.drain()} if _in_ingest_pool else {}
+
+async def ingest_csv(db: Session, file: UploadFile, table, conflict_columns: list, label: str, prepare=None, refresh=None):
+    """
+    Stream an uploaded CSV into `table` block by block, skipping rows that already exist.
+
+    Blocks are parsed and inserted by ingest_block in the ingest executor, up to
+    INGEST_WORKERS of them in parallel over as many connections. Reading the upload pauses
+    while INGEST_MAX_PENDING blocks of this file are in flight, which bounds the memory
+    of a load. The event loop only moves bytes and keeps serving other requests.
+
+    Args:
+        prepare: Optional callable(db, df) -> df converting each parsed block to the table's types.
+        refresh: Optional callable(db, batch_df) keeping derived tables in step, run by
+            refresh_loaded once all blocks are inserted.
+        Both run in the ingest executor, so must be module-level functions.
+
+    Returns:
+        dict: status_code and message, plus rows processed, inserted and duplicate counts,
+        blocks (and how many were skipped as loaded before), bytes, the file's sha256,
+        seconds and rows/sec on success.
+    """
+    totals = {"bytes": 0, "rows": 0, "inserted": 0, "skipped_blocks": 0}
+    file_hash = hashlib.sha256() if content_hash.enabled() else None
+    changed_store_keys = set()
+    touched = []
+    loaded_blocks = [] # (hash, rows, bytes) of the blocks that loaded, recorded once they are refreshed
+    pending = set()
+    s_time_insert = time.time()
+
+    def collect(result: dict):
+        if "metrics" in result:
+            metrics.merge(result.pop("metrics"))
+        for key in totals:
+            totals[key] += result[key]
+        changed_store_keys.update(result["store_keys"])
+        if result["block_hash"]:
+            loaded_blocks.append((result["block_hash"], result["rows"], result["bytes"]))
+        if result["touched"] is not None:
+            touched.append(result["touched"])
+        logger.info("%s: %d rows, %d new, %.0f rows/sec", label, totals["rows"], totals["inserted"], totals["rows"] / max(time.time() - s_time_insert, 1e-9))
+
+    async def wait_for_blocks(limit: int):
+        # collect finished blocks until at most `limit` are in flight, then raise the first block error
+        while len(pending) > limit:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.difference_update(done)
+            errors = [task.exception() for task in done if task.exception() is not None]
+            for task in done:
+                if task.exception() is None:
+                    collect(task.result())
+            if errors:
+                raise errors[0]
+
+    try:
+        block_number = 0
+        failure = None
+        try:
+            async for block in iter_csv_blocks(file, INGEST_CHUNK_BYTES, file_hash=file_hash):
+                await wait_for_blocks(INGEST_MAX_PENDING - 1)
+                block_number += 1
+                pending.add(asyncio.ensure_future(run_blocking(ingest_block, table.name, block, conflict_columns, prepare, refresh is not None)))
+            await wait_for_blocks(0)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError):
+            raise
+        except Exception as e:
+            # the rows of the blocks that did get in stay, so they are refreshed and tracked below all the same
+            failure = e
+            logger.error(f"Ingest failed after {block_number} blocks: {e}")
+            for outcome in await asyncio.gather(*pending, return_exceptions=True):
+                if not isinstance(outcome, BaseException):
+                    collect(outcome)
+            pending.clear()
+
+        if refresh and touched:
+            refreshed = await run_blocking(refresh_loaded, refresh, pd.concat(touched, ignore_index=True))
+            if "metrics" in refreshed:
+                metrics.merge(refreshed["metrics"])
+
+        total_processed, total_inserted = totals["rows"], totals["inserted"]
+        if total_inserted:
+            # new data invalidates the cached reports, incremental reports recompute the changed stores
+            await run_in_threadpool(data_version.bump, db, changed_store_keys)
+        # only now is a block complete, a resend skipping it before could leave its derived rows missing for good
+        await run_in_threadpool(content_hash.record_all, db, table.name, "block", loaded_blocks)
+
+        if isinstance(failure, InvalidBlockError):
+            return {"status_code": status.HTTP_400_BAD_REQUEST, "message": f"Invalid {label} in {file.filename}: {failure}", "inserted": total_inserted}
+        if failure is not None:
+            return {"status_code": status.HTTP_500_INTERNAL_SERVER_ERROR, "message": f"Database error during batch insert: {failure}", "inserted": total_inserted}
+
+        if file_hash is not None:
+            # a chunked upload announcing this hash is answered without transferring the file
+            await run_in_threadpool(content_hash.record, db, table.name, "file", file_hash.hexdigest(), total_processed, totals["bytes"])
+
+        e_time_insert = time.time()
+        rows_per_second = round(total_processed / max(e_time_insert - s_time_insert, 1e-9), 1)
+        logger.info(f"Streamed {total_processed} {label} in {e_time_insert - s_time_insert:.2f} seconds ({rows_per_second} rows/sec)")
+
+        return {
+            "status_code": status.HTTP_200_OK,
+            "message": f"Successfully processed {total_processed} {label} from {file.filename}.",
+            "rows": total_processed,
+            "inserted": total_inserted,
+            "duplicates": total_processed - total_inserted,
+            "blocks": block_number,
+            "skipped_blocks": totals["skipped_blocks"],
+            "bytes": totals["bytes"],
+            "sha256": file_hash.hexdigest() if file_hash is not None else None,
+            "seconds": round(e_time_insert - s_time_insert, 3),
+            "rows_per_second": rows_per_second,
+        }
+
+    except pd.errors.EmptyDataError:
+        return {"status_code": status.HTTP_400_BAD_REQUEST ,"message": "CSV file is empty."}
+    except pd.errors.ParserError as e:
+         return {"status_code": status.HTTP_400_BAD_REQUEST ,"message": f"Error parsing CSV file: {e}"}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"An unexpected error occurred during CSV processing: {e}")
+        return {"status_code": status.HTTP_500_INTERNAL_SERVER_ERROR ,"message": f"An unexpected error occurred: {e}"}
+
+    finally:
+        if pending:
+            # blocks still running after an error finish before the upload is closed
+            await asyncio.wait(pending)
+        await file.close()
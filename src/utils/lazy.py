@@ -0,0 +1,35 @@
+"""
+Modules imported on first use instead of at import time.
+
+The API only needs FastAPI, SQLAlchemy and the models to start serving. Routers refer to
+the ingest and report modules (and so pandas, numpy and pyarrow) through `lazy_import`,
+so a process that never loads data or converts a report never pays for importing them.
+"""
+import importlib
+import threading
+from types import ModuleType
+from typing import Optional
+
+
+class LazyModule:
+    """Stands in for a module until an attribute of it is first read, then imports it."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}{'' if self._module is None else ' (imported)'}>"
+
+
+def lazy_import(name: str, package: Optional[str] = None) -> LazyModule:
+    """`name` (relative to `package` when it starts with a dot), imported on first attribute access."""
+    return LazyModule(importlib.util.resolve_name(name, package) if name.startswith(".") else name)
@@ -1,9 +1,12 @@
 import logging
+import os
 import sys
 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "ERROR").upper()
+
 def get_logger(name: str = "app"):
     logger = logging.getLogger(name)
-    logger.setLevel(logging.ERROR)
+    logger.setLevel(LOG_LEVEL)
 
     if not logger.handlers:
         handler = logging.StreamHandler(sys.stdout)
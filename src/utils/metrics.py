@@ -0,0 +1,163 @@
+"""
+In-process counters and timing spans, exposed in the Prometheus text format on /metrics.
+
+    with metrics.span("report_phase_seconds", phase="load"):
+        ...
+    metrics.inc("ingest_rows_total", len(batch_df), table="store_status")
+
+Everything is kept in plain dicts under one lock, a span costs two perf_counter calls
+and a dict update. Processes that compute report shards send their metrics back with
+the shard (drain / merge), the report worker can serve its own /metrics (serve).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Tuple
+
+from sqlalchemy import event
+
+
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, float("inf")) # seconds
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, float("inf")) # e.g. queries per report
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, tuple], float] = {}
+_histograms: Dict[Tuple[str, tuple], list] = {}  # [bucket counts..., sum, count]
+_buckets: Dict[str, tuple] = {}  # bucket bounds of every histogram name
+_gauges: Dict[str, Callable[[], Dict[tuple, float]]] = {}
+_query_counter = threading.local()
+
+
+def _key(name: str, labels: dict) -> Tuple[str, tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, buckets: tuple = BUCKETS, **labels):
+    key = _key(name, labels)
+    with _lock:
+        buckets = _buckets.setdefault(name, buckets)
+        histogram = _histograms.setdefault(key, [0] * (len(buckets) + 2))
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[i] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+
+@contextmanager
+def span(name: str, **labels):
+    """Time the block into the `name` histogram (seconds), also when it raises."""
+    s_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - s_time, **labels)
+
+
+def register_gauge(name: str, read: Callable[[], Dict[tuple, float]]):
+    """`read()` returns {labels tuple: value} and is called on every scrape."""
+    _gauges[name] = read
+
+
+def track_queries(engine):
+    """Count every statement the engine runs, in total and per thread while count_queries is active."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        inc("db_queries_total")
+        if getattr(_query_counter, "count", None) is not None:
+            _query_counter.count += 1
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the statements this thread runs inside the block: `with count_queries() as counted: ...; counted()`.
+    Statements of a nested count_queries block are counted by that block only.
+    """
+    previous = getattr(_query_counter, "count", None)
+    _query_counter.count = 0
+    final = {}
+    try:
+        # after the block, the count it ended with rather than the enclosing block's
+        yield lambda: final.get("count", _query_counter.count)
+    finally:
+        final["count"] = _query_counter.count
+        _query_counter.count = previous
+
+
+def drain() -> dict:
+    """Take (and reset) everything recorded in this process, to merge into another one."""
+    global _counters, _histograms
+    with _lock:
+        snapshot = {"counters": _counters, "histograms": _histograms, "buckets": dict(_buckets)}
+        _counters, _histograms = {}, {}
+    return snapshot
+
+
+def merge(snapshot: dict):
+    with _lock:
+        for name, buckets in snapshot["buckets"].items():
+            _buckets.setdefault(name, buckets)
+        for key, value in snapshot["counters"].items():
+            _counters[key] = _counters.get(key, 0) + value
+        for key, values in snapshot["histograms"].items():
+            histogram = _histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                histogram[i] += value
+
+
+def _labels(labels: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in labels] + ([extra] if extra else [])
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render() -> str:
+    """Everything recorded so far in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters, histograms, buckets = dict(_counters), {key: list(values) for key, values in _histograms.items()}, dict(_buckets)
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {name} counter")
+        lines += [f"{name}{_labels(labels)} {value}" for (n, labels), value in sorted(counters.items()) if n == name]
+
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (n, labels), values in sorted(histograms.items()):
+            if n != name:
+                continue
+            for bound, count in zip(buckets[name], values):
+                le = f'le="{"+Inf" if bound == float("inf") else bound}"'
+                lines.append(f"{name}_bucket{_labels(labels, le)} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {values[-2]}")
+            lines.append(f"{name}_count{_labels(labels)} {values[-1]}")
+
+    for name, read in sorted(_gauges.items()):
+        lines.append(f"# TYPE {name} gauge")
+        lines += [f"{name}{_labels(labels)} {value}" for labels, value in read().items()]
+    return "\n".join(lines) + "\n"
+
+
+def serve(port: int):
+    """Serve /metrics from a daemon thread, for processes without the API (the report worker)."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200 if self.path == "/metrics" else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.end_headers()
+            self.wfile.write(body if self.path == "/metrics" else b"")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
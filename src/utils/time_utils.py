@@ -1,66 +1,126 @@
-from typing import Dict, List, Tuple
-import pandas as pd
-from datetime import datetime,timedelta
-import pytz
-
-from . import logger
-
-logger = logger.get_logger("time_utils")
-
-def get_operating_intervals_within_window(menu_df:pd.DataFrame, store_tz:str,timestamp_in_utc:datetime)->Dict[str, List[Tuple[datetime, datetime]]]:
-
-    """
-    Computes operating intervals (in UTC) for the past hour, day, and week
-    based on store business hours and time zone.
-
-    Args:
-        menu_df (pd.DataFrame): DataFrame containing store's weekly menu hours.
-                                Columns: day_of_week, start_time_local, end_time_local (in UTC).
-        store_tz (str): Time zone string of the store (e.g., 'America/Chicago').
-        timestamp_in_utc (datetime): Current UTC timestamp to calculate windows backward from.
-
-    Returns:
-        Dict[str, List[Tuple[datetime, datetime]]]: Dictionary with keys
-        'last_hour', 'last_day', and 'last_week'. Each key maps to a list of
-        tuples (start_datetime_utc, end_datetime_utc) representing business hours.
-    """
-
-    try:
-    
-        logger.info(f"Calculating business windows for store timezone: {store_tz} at local time: {timestamp_in_utc}")
-
-        time_windows = {
-            "last_hour": (timestamp_in_utc - timedelta(hours=1),timestamp_in_utc),
-            "last_day": (timestamp_in_utc - timedelta(days=1),timestamp_in_utc),
-            "last_week": (timestamp_in_utc - timedelta(days=7),timestamp_in_utc),
-        }
-
-        logger.info(f"Business windows calculated: {time_windows}")
-
-        intervals = {"last_hour": [], "last_day": [], "last_week": []}
-        
-
-        for window_name, (start_utc, end_utc) in time_windows.items():
-            for _, row in menu_df.iterrows():
-                day_of_week = row["day_of_week"]
-                start_local = row["start_time_local"]
-                end_local = row["end_time_local"]
-
-                current_day = end_utc.date()
-                while current_day >= start_utc.date():
-                    if current_day.weekday() == day_of_week:
-                        start_dt = pytz.timezone(store_tz).localize(datetime.combine(current_day, start_local.time())).astimezone(pytz.utc)
-                        end_dt = pytz.timezone(store_tz).localize(datetime.combine(current_day, end_local.time())).astimezone(pytz.utc)
-                        
-                        # Clip to window boundaries
-                        clipped_start = max(start_dt, start_utc)
-                        clipped_end = min(end_dt, end_utc)
-                        
-                        if clipped_start < clipped_end:
-                            intervals[window_name].append((clipped_start, clipped_end))
-                    current_day -= timedelta(days=1)
-        logger.info(f"Business intervals for {store_tz}: {intervals}")
-    except Exception as e:
-        logger.error(f"Error generating business intervals {store_tz}: {e}")
-        raise e
-    return intervals
\ No newline at end of file
+from typing import Dict, Iterable, List, Tuple
+from functools import lru_cache
+import os
+import numpy as np
+import pandas as pd
+from datetime import date,datetime,timedelta
+import pytz
+
+from . import logger, metrics
+
+logger = logger.get_logger("time_utils")
+
+SCHEDULE_CACHE_SIZE = int(os.getenv("SCHEDULE_CACHE_SIZE", "4096")) # compiled (timezone, schedule, reference date) entries kept
+COMPILED_DAYS_BEFORE = 9 # local days before the reference date a compiled schedule covers: the week, overnight hours and any UTC offset
+ALWAYS_OPEN = tuple((day, "00:00:00", "23:59:59") for day in range(7))
+
+def parse_utc(values: pd.Series) -> pd.Series:
+    """
+    Convert '2023-01-22 12:09:39.388884 UTC' style strings, or datetimes read back from the
+    database (naive ones are UTC), into tz-aware UTC timestamps.
+    """
+    if values.dtype == object and len(values) and isinstance(values.iloc[0], str):
+        return pd.to_datetime(values.str.removesuffix(" UTC"), utc=True, format="ISO8601")
+    return pd.to_datetime(values, utc=True)
+
+def normalize_schedule(rows: Iterable[Tuple[int, str, str]]) -> Tuple[Tuple[int, str, str], ...]:
+    """
+    Canonical, hashable form of a store's weekly hours: sorted (day_of_week, start, end)
+    tuples of local 'HH:MM:SS' times. Stores without menu hours are open all day.
+    """
+    schedule = tuple(sorted((int(day), str(start), str(end)) for day, start, end in rows))
+    return schedule or ALWAYS_OPEN
+
+@lru_cache(maxsize=SCHEDULE_CACHE_SIZE)
+def compile_schedule(store_tz: str, schedule: Tuple[Tuple[int, str, str], ...], reference_date: date) -> np.ndarray:
+    """
+    Turn weekly local business hours into concrete UTC intervals around a reference date.
+
+    Covers every local day that can overlap the week before `reference_date` (the UTC date
+    reports are computed at) in any timezone, so callers only have to clip. Hours ending
+    before they start run past midnight. Ambiguous wall times resolve to standard time and
+    nonexistent ones (DST gaps) shift forward to the first valid instant.
+
+    Results are memoized per (timezone, schedule, reference date), stores sharing hours and
+    a timezone reuse one computation; see schedule_cache_info() for hit/miss counters.
+
+    Args:
+        store_tz (str): Time zone string of the store (e.g., 'America/Chicago').
+        schedule (tuple): Output of normalize_schedule.
+        reference_date (date): UTC date of the report's reference time.
+
+    Returns:
+        np.ndarray: Read-only (n, 2) array of [start, end) epoch nanoseconds sorted by start.
+    """
+    days = pd.date_range(reference_date - timedelta(days=COMPILED_DAYS_BEFORE), reference_date + timedelta(days=1), freq="D")
+    rows = pd.DataFrame(list(schedule), columns=["day_of_week", "start", "end"])
+    expanded = rows.merge(pd.DataFrame({"day": days, "day_of_week": days.dayofweek}), on="day_of_week")
+
+    start_local = expanded["day"] + pd.to_timedelta(expanded["start"])
+    end_local = expanded["day"] + pd.to_timedelta(expanded["end"])
+    end_local = end_local.where(end_local >= start_local, end_local + pd.Timedelta(days=1))
+
+    not_dst = np.zeros(len(expanded), dtype=bool)
+    intervals = np.column_stack([
+        pd.DatetimeIndex(start_local).tz_localize(store_tz, ambiguous=not_dst, nonexistent="shift_forward").asi8,
+        pd.DatetimeIndex(end_local).tz_localize(store_tz, ambiguous=not_dst, nonexistent="shift_forward").asi8,
+    ])
+    intervals = intervals[np.argsort(intervals[:, 0], kind="stable")]
+    intervals.flags.writeable = False
+    return intervals
+
+def schedule_cache_info() -> Dict[str, int]:
+    info = compile_schedule.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+
+metrics.register_gauge("schedule_cache", lambda: {(("stat", stat),): value for stat, value in schedule_cache_info().items()})
+
+def get_operating_intervals_within_window(menu_df:pd.DataFrame, store_tz:str,timestamp_in_utc:datetime)->Dict[str, List[Tuple[datetime, datetime]]]:
+
+    """
+    Computes operating intervals (in UTC) for the past hour, day, and week
+    based on store business hours and time zone.
+
+    Args:
+        menu_df (pd.DataFrame): DataFrame containing store's weekly menu hours.
+                                Columns: day_of_week, start_time_local, end_time_local ('HH:MM:SS' local time).
+        store_tz (str): Time zone string of the store (e.g., 'America/Chicago').
+        timestamp_in_utc (datetime): Current UTC timestamp to calculate windows backward from.
+
+    Returns:
+        Dict[str, List[Tuple[datetime, datetime]]]: Dictionary with keys
+        'last_hour', 'last_day', and 'last_week'. Each key maps to a list of
+        tuples (start_datetime_utc, end_datetime_utc) representing business hours.
+    """
+
+    try:
+    
+        logger.info("Calculating business windows for store timezone: %s at local time: %s", store_tz, timestamp_in_utc)
+
+        time_windows = {
+            "last_hour": (timestamp_in_utc - timedelta(hours=1),timestamp_in_utc),
+            "last_day": (timestamp_in_utc - timedelta(days=1),timestamp_in_utc),
+            "last_week": (timestamp_in_utc - timedelta(days=7),timestamp_in_utc),
+        }
+
+        logger.info("Business windows calculated: %s", time_windows)
+
+        schedule = normalize_schedule(zip(menu_df.get("day_of_week", []), menu_df.get("start_time_local", []), menu_df.get("end_time_local", [])))
+        compiled = compile_schedule(store_tz, schedule, timestamp_in_utc.astimezone(pytz.utc).date())
+
+        intervals = {"last_hour": [], "last_day": [], "last_week": []}
+
+        for window_name, (start_utc, end_utc) in time_windows.items():
+            # Clip to window boundaries
+            clipped_start = np.maximum(compiled[:, 0], pd.Timestamp(start_utc).value)
+            clipped_end = np.minimum(compiled[:, 1], pd.Timestamp(end_utc).value)
+            keep = clipped_start < clipped_end
+            intervals[window_name] = [
+                (pd.Timestamp(start, tz="UTC").to_pydatetime(), pd.Timestamp(end, tz="UTC").to_pydatetime())
+                for start, end in zip(clipped_start[keep], clipped_end[keep])
+            ]
+        logger.info("Business intervals for %s: %s", store_tz, intervals)
+    except Exception as e:
+        logger.error(f"Error generating business intervals {store_tz}: {e}")
+        raise e
+    return intervals
@@ -0,0 +1,64 @@
+"""
+Optional warm-up of API processes, with WARMUP:
+
+- "off" (default): the ingest and report modules are imported by the first request that
+  needs them, the server starts serving after importing FastAPI, SQLAlchemy and the models.
+- "startup": every server process imports them, and starts the ingest process pool with
+  its processes imported too, before it serves its first request.
+- "prefork": they are imported when src.main is, so a server that forks its workers after
+  loading the app (e.g. gunicorn --preload with uvicorn workers) imports them once and
+  every worker shares them. Pools and connections are still opened after the fork.
+
+`warm_up()` is also the hook to call from a pre-fork step of another server.
+"""
+import importlib
+import os
+import sys
+import time
+
+from .utils import logger
+
+
+logger = logger.get_logger("warmup")
+
+WARMUP = os.getenv("WARMUP", "off") # "off", "startup" or "prefork"
+
+# what the first /load_data, /trigger_report, /download_report and store uptime request would import
+MODULES = [
+    "pandas",
+    "numpy",
+    "pyarrow.parquet",
+    f"{__package__}.utils.csv_loader",
+    f"{__package__}.service.report_formats",
+    f"{__package__}.service.report_cache",
+    f"{__package__}.service.store_uptime",
+    f"{__package__}.service.uploads",
+]
+
+
+def import_modules() -> float:
+    """Import MODULES. Returns the seconds it took."""
+    s_time = time.perf_counter()
+    for name in MODULES:
+        importlib.import_module(name)
+    seconds = time.perf_counter() - s_time
+    logger.info(f"Imported {len(MODULES)} modules in {seconds:.2f} seconds")
+    return seconds
+
+
+def warm_up(start_pools: bool = True):
+    """
+    Import the heavy modules and, with `start_pools`, start the ingest process pool. Before
+    a fork, call it with start_pools=False: a process pool does not survive the fork.
+    """
+    import_modules()
+    if start_pools:
+        from .utils import csv_loader
+        csv_loader.start_ingest_pool()
+
+
+def shut_down():
+    """Stop the ingest process pool if this process started one, its spawned processes would outlive the server."""
+    csv_loader = sys.modules.get(f"{__package__}.utils.csv_loader")
+    if csv_loader is not None:
+        csv_loader.stop_ingest_pool()
@@ -0,0 +1,99 @@
+"""
+Report worker: runs the jobs /trigger_report enqueues, outside the API process.
+
+    python -m src.worker
+
+Every slot (REPORT_QUEUE_CONCURRENCY of them) claims one job at a time, so a worker
+process never computes more reports at once than it has slots, however many are
+triggered. Start more processes, on any host, to share the queue.
+"""
+import os
+import socket
+import threading
+import time
+from uuid import uuid4
+
+from .db import models, session
+from .service import report_generator, report_queue
+from .utils import logger, metrics
+
+
+logger = logger.get_logger("worker")
+
+REPORT_QUEUE_CONCURRENCY = int(os.getenv("REPORT_QUEUE_CONCURRENCY", "1")) # reports computed at once by this process
+REPORT_QUEUE_POLL_SECONDS = float(os.getenv("REPORT_QUEUE_POLL_SECONDS", "2"))
+REPORT_WORKER_METRICS_PORT = int(os.getenv("REPORT_WORKER_METRICS_PORT", "0")) # serve this worker's /metrics on the port, 0 to disable
+
+
+def run_job(job: models.ReportJob, worker_id: str):
+    """Generate one report with its own session while a heartbeat keeps the lease alive."""
+    stop = threading.Event()
+
+    def heartbeat():
+        db = session.SessionLocal()
+        try:
+            while not stop.wait(report_queue.REPORT_JOB_LEASE_SECONDS / 3):
+                if not report_queue.renew_lease(db, job.id, worker_id):
+                    logger.error(f"Lost the lease on report {job.report_id}")
+                    return
+        finally:
+            db.close()
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    try:
+        report_generator.generate_report(job.report_id, session.SessionLocal(), profile=bool(job.profile))  # closes the session
+    finally:
+        stop.set()
+        beat.join()
+
+    db = session.SessionLocal()
+    try:
+        report = db.query(models.Report).filter(models.Report.id == job.report_id).first()
+        status = "Complete" if report and report.status == "Complete" else "Failed"
+        report_queue.finish_job(db, job.id, worker_id, status)
+    finally:
+        db.close()
+
+
+def work(worker_id: str, stop: threading.Event):
+    while not stop.is_set():
+        db = session.SessionLocal()
+        try:
+            job = report_queue.claim_job(db, worker_id)
+        except Exception as e:
+            logger.error(f"Claiming a report job failed: {e}")
+            job = None
+        finally:
+            db.close()
+
+        if job is None:
+            stop.wait(REPORT_QUEUE_POLL_SECONDS)
+            continue
+
+        s_time = time.time()
+        logger.info(f"{worker_id} running report {job.report_id} (attempt {job.attempts})")
+        run_job(job, worker_id)
+        logger.info(f"{worker_id} finished report {job.report_id} in {time.time() - s_time:.2f} seconds")
+
+
+def main(concurrency: int = REPORT_QUEUE_CONCURRENCY):
+    if REPORT_WORKER_METRICS_PORT:
+        metrics.serve(REPORT_WORKER_METRICS_PORT)
+    stop = threading.Event()
+    prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+    slots = [threading.Thread(target=work, args=(f"{prefix}:{slot}", stop)) for slot in range(max(concurrency, 1))]
+    for slot in slots:
+        slot.start()
+    try:
+        for slot in slots:
+            slot.join()
+    except KeyboardInterrupt:
+        # running reports are finished, no new ones are claimed
+        stop.set()
+        for slot in slots:
+            slot.join()
+
+
+if __name__ == "__main__":
+    main()
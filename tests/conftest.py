@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+import pandas as pd
+import pytest
+
+# the database engines are created at import time, point them at a scratch SQLite file first
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+
+from src.db import bulk_load, migrations, models, session  # noqa: E402
+from src.utils import csv_loader  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    migrations.upgrade()
+
+
+@pytest.fixture
+def db():
+    db = session.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def add_status(db):
+    """Ingest (timestamp, status) observations of one store like /load_data does, returns its store_key."""
+    def add(store_id: str, observations) -> int:
+        df = pd.DataFrame(observations, columns=["timestamp_utc", "status"])
+        df.insert(0, "store_id", store_id)
+        df = csv_loader.prepare_store_status(db, df)
+        bulk_load.insert_rows(db, models.StoreStatus.__table__, df, ["store_key", "timestamp_utc"])
+        db.commit()
+        csv_loader.refresh_derived(db, df)
+        return int(df["store_key"].iloc[0])
+    return add
+
+
+@pytest.fixture
+def add_menu_hours(db):
+    """Menu hours of one store as (dayOfWeek, start_time_local, end_time_local) rows."""
+    def add(store_id: str, rows):
+        df = pd.DataFrame(rows, columns=["dayOfWeek", "start_time_local", "end_time_local"])
+        df.insert(0, "store_id", store_id)
+        df = csv_loader.prepare_store_keys(db, df)
+        bulk_load.insert_rows(db, models.MenuHour.__table__, df, ["store_key", "dayOfWeek", "start_time_local", "end_time_local"])
+        db.commit()
+    return add
+
+
+@pytest.fixture
+def add_timezone(db):
+    def add(store_id: str, timezone_str: str):
+        df = csv_loader.prepare_store_keys(db, pd.DataFrame({"store_id": [store_id], "timezone_str": [timezone_str]}))
+        bulk_load.insert_rows(db, models.Timezone.__table__, df, ["store_key", "timezone_str"])
+        db.commit()
+    return add
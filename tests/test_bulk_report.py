@@ -0,0 +1,40 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from src.service import bulk_report, interpolation, report_generator
+
+
+def test_bulk_engine_matches_the_per_store_loop(db, add_status, add_menu_hours, add_timezone, monkeypatch):
+    rng = np.random.default_rng(1)
+    reference = pd.Timestamp("2024-08-14 16:52:31", tz="UTC")
+    schedules = [
+        ("America/Chicago", []),  # open all day
+        ("America/New_York", [(day, "09:00:00", "17:30:00") for day in range(5)]),
+        ("Asia/Kolkata", [(day, "20:00:00", "02:15:00") for day in range(7)]),  # overnight
+        (None, [(5, "10:00:00", "14:00:00"), (6, "11:45:00", "13:00:00")]),  # no timezone row
+    ]
+    store_keys = []
+    for timezone_str, menu_hours in schedules:
+        store_id = str(uuid.uuid4())
+        seconds = rng.choice(9 * 86400, size=200, replace=False)
+        timestamps = (reference - pd.to_timedelta(seconds, unit="s")).astype(str)
+        store_keys.append(add_status(store_id, zip(timestamps, rng.choice(["active", "inactive"], len(seconds)))))
+        if menu_hours:
+            add_menu_hours(store_id, menu_hours)
+        if timezone_str:
+            add_timezone(store_id, timezone_str)
+
+    monkeypatch.setattr(report_generator, "REPORT_ENGINE", "per_store")
+    per_store = report_generator.compute_uptime_downtime(db, store_keys, reference)
+
+    # the loop samples every 5 minutes and counts nothing before a store's first observation
+    monkeypatch.setattr(report_generator, "REPORT_ENGINE", "bulk")
+    monkeypatch.setattr(bulk_report, "REPORT_SOURCE", "raw")
+    monkeypatch.setattr(interpolation, "INTERPOLATION_MODE", "sampled")
+    monkeypatch.setattr(interpolation, "LEADING_STATUS_POLICY", "unknown")
+    bulk = report_generator.compute_uptime_downtime(db, store_keys, reference)
+
+    assert len(bulk) == len(store_keys)
+    assert bulk == per_store
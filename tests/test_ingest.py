@@ -0,0 +1,67 @@
+import asyncio
+import io
+import uuid
+
+import pandas as pd
+from fastapi import UploadFile
+from sqlalchemy import func
+
+from src.db import models
+from src.utils import csv_loader
+
+
+def store_status_csv(store_ids, bad_row=None) -> bytes:
+    rows = ["store_id,status,timestamp_utc"]
+    for i, store_id in enumerate(store_ids):
+        timestamp = "not a timestamp" if i == bad_row else f"2024-02-01 {i:02d}:10:00.000000 UTC"
+        rows.append(f"{store_id},active,{timestamp}")
+    return ("\n".join(rows) + "\n").encode()
+
+
+def load(db, data: bytes) -> dict:
+    return asyncio.run(csv_loader.load_store_status(db, UploadFile(io.BytesIO(data), filename="store_status.csv")))
+
+
+def counts(db, store_ids) -> dict:
+    keys = db.query(models.Store.store_key).filter(models.Store.store_id.in_(store_ids)).scalar_subquery()
+    return {
+        model.__tablename__: db.query(func.count()).select_from(model).filter(model.store_key.in_(keys)).scalar()
+        for model in [models.StoreStatus, models.StoreStatusHourly, models.StoreStatusPrefix, models.StoreChange]
+    }
+
+
+def test_failed_block_keeps_derived_tables_of_the_loaded_blocks_in_step(db, monkeypatch):
+    monkeypatch.setattr(csv_loader, "INGEST_EXECUTOR", "thread")
+    monkeypatch.setattr(csv_loader, "INGEST_CHUNK_BYTES", 300)
+    # one store and hour per row, about four rows per block, the bad row in the second block
+    store_ids = [str(uuid.uuid4()) for _ in range(12)]
+
+    response = load(db, store_status_csv(store_ids, bad_row=5))
+    assert response["status_code"] == 400
+    assert 0 < response["inserted"] < 11
+    loaded = counts(db, store_ids)
+    assert set(loaded.values()) == {response["inserted"]}
+
+    response = load(db, store_status_csv(store_ids))
+    assert response["status_code"] == 200
+    assert counts(db, store_ids) == {table: 12 for table in loaded}
+
+
+def test_blocks_are_recorded_only_once_their_load_is_refreshed(db, monkeypatch):
+    monkeypatch.setattr(csv_loader, "INGEST_EXECUTOR", "thread")
+    monkeypatch.setattr(csv_loader, "INGEST_CHUNK_BYTES", 300)
+    data = store_status_csv([str(uuid.uuid4()) for _ in range(8)])
+
+    def failing_refresh(db, batch_df):
+        raise RuntimeError("refresh failed")
+
+    recorded = db.query(func.count(models.IngestedContent.id)).scalar()
+    monkeypatch.setattr(csv_loader, "refresh_derived", failing_refresh)
+    assert load(db, data)["status_code"] == 500
+    assert db.query(func.count(models.IngestedContent.id)).scalar() == recorded
+
+    monkeypatch.undo()
+    monkeypatch.setattr(csv_loader, "INGEST_EXECUTOR", "thread")
+    monkeypatch.setattr(csv_loader, "INGEST_CHUNK_BYTES", 300)
+    assert load(db, data)["skipped_blocks"] == 0
+    assert load(db, data)["skipped_blocks"] > 1
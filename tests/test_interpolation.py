@@ -0,0 +1,21 @@
+import uuid
+
+import pandas as pd
+
+from src.service import bulk_report, interpolation
+
+
+def test_sampled_store_observed_only_after_its_windows(db, add_status, monkeypatch):
+    monkeypatch.setattr(interpolation, "INTERPOLATION_MODE", "sampled")
+    monkeypatch.setattr(bulk_report, "REPORT_SOURCE", "raw")
+    reference = pd.Timestamp("2024-05-01 12:00", tz="UTC")
+    store_id = str(uuid.uuid4())
+    store_key = add_status(store_id, [(str(reference + pd.Timedelta(hours=1)), "active")])
+
+    rows = bulk_report.compute_uptime_downtime_bulk(db, [store_key], reference)
+
+    assert rows == [{
+        "store_id": store_id,
+        "uptime_last_hour": 0.0, "uptime_last_day": 0.0, "uptime_last_week": 0.0,
+        "downtime_last_hour": 0.0, "downtime_last_day": 0.0, "downtime_last_week": 0.0,
+    }]
@@ -0,0 +1,80 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, func, insert, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.db import migrations, models
+from src.service import bulk_report
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    yield engine
+    engine.dispose()
+
+
+def test_backfilled_rollups_match_the_exact_engine(legacy_engine, monkeypatch):
+    # observations loaded before the rollups were maintained, so the hourly table starts empty
+    rng = np.random.default_rng(11)
+    reference = pd.Timestamp("2024-06-05 09:41:13", tz="UTC")
+    store_keys = list(range(900001, 900005))
+    models.Base.metadata.create_all(legacy_engine)
+    with legacy_engine.begin() as conn:
+        conn.execute(insert(models.Store), [{"store_key": key, "store_id": str(uuid.uuid4())} for key in store_keys])
+        for key in store_keys:
+            seconds = rng.choice(9 * 86400, size=200, replace=False)
+            conn.execute(insert(models.StoreStatus), [
+                {"store_key": key, "timestamp_utc": (reference - pd.Timedelta(seconds=int(s))).to_pydatetime(), "status": status}
+                for s, status in zip(seconds, rng.choice(["active", "inactive"], len(seconds)))
+            ])
+
+    migrations.upgrade(legacy_engine)
+
+    with Session(bind=legacy_engine) as db:
+        assert db.query(func.count(models.StoreStatusHourly.id)).scalar() > 0
+        monkeypatch.setattr(bulk_report, "REPORT_SOURCE", "raw")
+        exact = bulk_report.compute_uptime_downtime_bulk(db, store_keys, reference)
+        monkeypatch.setattr(bulk_report, "REPORT_SOURCE", "rollup")
+        rolled = bulk_report.compute_uptime_downtime_bulk(db, store_keys, reference)
+
+    assert len(exact) == len(store_keys)
+    for exact_row, rolled_row in zip(exact, rolled):
+        assert rolled_row == pytest.approx(exact_row, abs=0.011)
+
+
+def test_store_ids_become_store_keys(legacy_engine):
+    # tables as they were before the store table, keyed by the store_id UUID
+    store_ids = sorted(str(uuid.uuid4()) for _ in range(3))
+    with legacy_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE store_status (id INTEGER PRIMARY KEY, store_id VARCHAR, timestamp_utc DATETIME, status VARCHAR, CONSTRAINT uix_store_timestamp UNIQUE (store_id, timestamp_utc))"))
+        conn.execute(text("CREATE INDEX ix_store_status_store_id ON store_status (store_id)"))
+        conn.execute(text('CREATE TABLE menu_hour (id INTEGER PRIMARY KEY, store_id VARCHAR, "dayOfWeek" INTEGER, start_time_local VARCHAR, end_time_local VARCHAR, CONSTRAINT uix_menu_timestamp UNIQUE (store_id, "dayOfWeek", start_time_local, end_time_local))'))
+        conn.execute(text("CREATE TABLE timezone (id INTEGER PRIMARY KEY, store_id VARCHAR UNIQUE, timezone_str VARCHAR, CONSTRAINT uix_store_timezone UNIQUE (store_id, timezone_str))"))
+        for i, store_id in enumerate(store_ids):
+            conn.execute(text("INSERT INTO store_status (store_id, timestamp_utc, status) VALUES (:store_id, :ts, 'active')"), [
+                {"store_id": store_id, "ts": f"2024-01-05 {hour:02d}:10:00.000000 UTC"} for hour in range(i + 1)
+            ])
+        conn.execute(text('INSERT INTO menu_hour (store_id, "dayOfWeek", start_time_local, end_time_local) VALUES (:store_id, 0, \'09:00:00\', \'17:00:00\')'), [{"store_id": store_ids[1]}])
+        conn.execute(text("INSERT INTO timezone (store_id, timezone_str) VALUES (:store_id, 'Asia/Kolkata')"), [{"store_id": store_ids[2]}])
+
+    migrations.upgrade(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        assert migrations.store_surrogate_keys(conn) is False
+        for table in ["store_status", "menu_hour", "timezone"]:
+            assert "store_id" not in {column["name"] for column in inspect(conn).get_columns(table)}
+        keys = dict(conn.execute(text("SELECT store_id, store_key FROM store")).all())
+        assert sorted(keys) == store_ids
+        status = conn.execute(text("SELECT store_key, count(*) FROM store_status GROUP BY store_key")).all()
+        assert sorted(status) == sorted((keys[store_id], i + 1) for i, store_id in enumerate(store_ids))
+        assert conn.execute(text("SELECT store_key FROM menu_hour")).scalar() == keys[store_ids[1]]
+        assert conn.execute(text("SELECT store_key FROM timezone")).scalar() == keys[store_ids[2]]
+        # the unique constraint moved to the key, the prefix sums were backfilled for the keys
+        with pytest.raises(IntegrityError):
+            conn.execute(text("INSERT INTO store_status (store_key, timestamp_utc, status) SELECT store_key, timestamp_utc, 'inactive' FROM store_status LIMIT 1"))
+        assert conn.execute(text("SELECT count(*) FROM store_status_prefix")).scalar() == 6
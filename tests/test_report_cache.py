@@ -0,0 +1,20 @@
+from src.db import models
+from src.router import report_endpoint
+
+
+def complete(db, report_id, tmp_path):
+    report = db.get(models.Report, report_id)
+    report.status, report.file_path = "Complete", str(tmp_path / f"{report_id}.{report.format}")
+    open(report.file_path, "w").close()
+    db.commit()
+
+
+def test_trigger_in_another_format_is_not_served_from_the_cache(db, tmp_path):
+    csv_id = report_endpoint.enqueue_report(db, 0, False, "csv", False)["report_id"]
+    complete(db, csv_id, tmp_path)
+
+    parquet_id = report_endpoint.enqueue_report(db, 0, False, "parquet", False)["report_id"]
+    assert parquet_id != csv_id
+    assert db.get(models.Report, parquet_id).format == "parquet"
+
+    assert report_endpoint.enqueue_report(db, 0, False, "csv", False)["report_id"] == csv_id
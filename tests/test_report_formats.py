@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.service import report_formats
+from src.service.report_formats import REPORT_COLUMNS, REPORT_FORMATS, ReportWriter
+
+
+def report_rows(count: int) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame(rng.uniform(0, 168, (count, len(REPORT_COLUMNS) - 1)).round(2), columns=REPORT_COLUMNS[1:])
+    # ids that would not survive a round trip as numbers
+    df.insert(0, "store_id", [f"{i:08d}" for i in range(count)])
+    return df
+
+
+def read_back(path: str) -> pd.DataFrame:
+    return pd.concat(list(report_formats.iter_batches(path)), ignore_index=True)
+
+
+@pytest.mark.parametrize("report_format", list(REPORT_FORMATS))
+def test_written_batches_read_back_unchanged(report_format, tmp_path, monkeypatch):
+    monkeypatch.setattr(report_formats, "READ_BATCH_ROWS", 4)
+    df = report_rows(10)
+    path = str(tmp_path / f"report{REPORT_FORMATS[report_format][0]}")
+
+    with ReportWriter(path, report_format) as writer:
+        writer.write(df.iloc[:6])
+        writer.write(df.iloc[:0])
+        writer.write(df.iloc[6:])
+
+    assert report_formats.format_of(path) == report_format
+    assert max(len(batch) for batch in report_formats.iter_batches(path)) == 4
+    pd.testing.assert_frame_equal(read_back(path), df)
+
+
+@pytest.mark.parametrize("report_format", ["csv.gz", "parquet", "arrow"])
+def test_converted_report_matches_the_csv(report_format, tmp_path):
+    df = report_rows(25)
+    csv_path = str(tmp_path / "report.csv")
+    with ReportWriter(csv_path, "csv") as writer:
+        writer.write(df)
+
+    converted = report_formats.convert(csv_path, report_format)
+    assert converted == str(tmp_path / f"report{REPORT_FORMATS[report_format][0]}")
+    pd.testing.assert_frame_equal(read_back(converted), df)
+    # converted once, later requests reuse the file
+    assert report_formats.convert(csv_path, report_format) == converted
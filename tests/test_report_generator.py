@@ -0,0 +1,78 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.db import models, session
+from src.service import bulk_report, data_version, interpolation, report as report_crud, report_generator
+
+
+@pytest.fixture
+def observed_stores(add_status, add_menu_hours):
+    """Three stores with a week and a half of random observations up to the returned reference time."""
+    rng = np.random.default_rng(5)
+    reference = pd.Timestamp("2024-07-08 11:23:45", tz="UTC")
+    store_keys = []
+    for i in range(3):
+        store_id = str(uuid.uuid4())
+        seconds = rng.choice(10 * 86400, size=120, replace=False)
+        store_keys.append(add_status(store_id, zip((reference - pd.to_timedelta(seconds, unit="s")).astype(str), rng.choice(["active", "inactive"], len(seconds)))))
+        if i:
+            add_menu_hours(store_id, [(day, "07:00:00", "19:30:00") for day in range(5)])
+    return store_keys, reference
+
+
+def test_per_store_engine_uses_the_reference_time_it_is_given(db, observed_stores, monkeypatch):
+    store_keys, reference = observed_stores
+    earlier = reference - pd.Timedelta(hours=30)
+    monkeypatch.setattr(report_generator, "REPORT_ENGINE", "per_store")
+    per_store = report_generator.compute_uptime_downtime(db, store_keys, earlier)
+
+    monkeypatch.setattr(interpolation, "INTERPOLATION_MODE", "sampled")
+    monkeypatch.setattr(interpolation, "LEADING_STATUS_POLICY", "unknown")
+    monkeypatch.setattr(bulk_report, "REPORT_SOURCE", "raw")
+    assert per_store == bulk_report.compute_uptime_downtime_bulk(db, store_keys, earlier)
+
+
+def test_spawned_shard_processes_match_a_single_process_run(db, observed_stores, tmp_path, monkeypatch):
+    store_keys, reference = observed_stores
+    monkeypatch.chdir(tmp_path)
+    shards = [(0, store_keys[:2]), (1, store_keys[2:])]
+
+    pooled = report_generator.run_shards("pooled", shards, reference, workers=2)
+    inline = report_generator.run_shards("inline", shards, reference, workers=1)
+
+    assert [summary["status"] for summary in pooled] == ["Complete", "Complete"]
+    for pooled_summary, inline_summary in zip(pooled, inline):
+        assert open(pooled_summary["file_path"]).read() == open(inline_summary["file_path"]).read()
+
+
+def generate(report_id: str) -> pd.DataFrame:
+    report_crud.create_report_entry(session.SessionLocal(), report_id)
+    assert report_generator._generate_report(report_id, session.SessionLocal(), workers=1)[0] == "Complete"
+    return pd.read_csv(f"{report_generator.REPORT_DIR}/{report_id}.csv", dtype={"store_id": str}).sort_values("store_id", ignore_index=True)
+
+
+def test_incremental_report_matches_a_full_recompute(db, observed_stores, add_status, tmp_path, monkeypatch):
+    store_keys, _ = observed_stores
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(report_generator, "REPORT_UPDATE_MODE", "full")
+    data_version.bump(db, store_keys)
+    base = generate("base")
+
+    # a later load changes one store without moving the latest observation (of any store), so the windows stay put
+    reference = bulk_report.reference_time(db)
+    store_id = db.get(models.Store, store_keys[0]).store_id
+    add_status(store_id, [(str(reference - pd.Timedelta(minutes=minutes)), "inactive") for minutes in (7, 95, 1500)])
+    data_version.bump(db, [store_keys[0]])
+
+    full = generate("full")
+    assert db.get(models.Report, "full").base_report_id is None
+    monkeypatch.setattr(report_generator, "REPORT_UPDATE_MODE", "incremental")
+    incremental = generate("incremental")
+    assert db.get(models.Report, "incremental").base_report_id == "base"
+
+    pd.testing.assert_frame_equal(incremental, full)
+    changed = full["store_id"] == store_id
+    assert not full[changed].equals(base[changed])
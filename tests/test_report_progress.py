@@ -0,0 +1,21 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.db import models
+from src.service.report import progress
+
+
+@pytest.mark.parametrize("status, has_eta", [("Running", True), ("Failed", False)])
+def test_only_running_reports_have_an_eta(status, has_eta):
+    started_at = datetime.utcnow() - timedelta(seconds=10)
+    report = models.Report(id="progress-test", status=status, started_at=started_at)
+    entries = [
+        models.ReportShard(shard=0, store_count=100, status="Complete", finished_at=started_at + timedelta(seconds=5)),
+        models.ReportShard(shard=1, store_count=100, status="Failed" if status == "Failed" else "Pending"),
+    ]
+
+    result = progress(report, entries)
+
+    assert result["stores_done"] == 100
+    assert (result["eta_seconds"] is not None) == has_eta
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.db import migrations, models
+from src.service import report_queue
+
+
+@pytest.fixture
+def queue_db(tmp_path):
+    # a database of its own, the shared one holds the jobs other tests triggered
+    engine = create_engine(f"sqlite:///{tmp_path}/queue.db")
+    migrations.upgrade(engine)
+    db = Session(bind=engine)
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_claims_by_priority_then_fifo(queue_db):
+    low = report_queue.enqueue(queue_db, "low")
+    first = report_queue.enqueue(queue_db, "first", priority=5)
+    second = report_queue.enqueue(queue_db, "second", priority=5)
+    assert [report_queue.queue_position(queue_db, job) for job in (low, first, second)] == [3, 1, 2]
+
+    job = report_queue.claim_job(queue_db, "worker-a")
+    assert (job.report_id, job.status, job.lease_owner, job.attempts) == ("first", "Running", "worker-a", 1)
+    assert report_queue.queue_position(queue_db, job) is None
+    queue_db.refresh(low)
+    assert report_queue.queue_position(queue_db, low) == 2
+
+    assert report_queue.claim_job(queue_db, "worker-b").report_id == "second"
+    assert report_queue.claim_job(queue_db, "worker-b").report_id == "low"
+    assert report_queue.claim_job(queue_db, "worker-b") is None
+
+
+def expire_lease(db: Session, job: models.ReportJob):
+    db.query(models.ReportJob).filter(models.ReportJob.id == job.id).update({"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+
+def test_expired_lease_is_claimed_again_until_max_attempts(queue_db, monkeypatch):
+    monkeypatch.setattr(report_queue, "REPORT_JOB_MAX_ATTEMPTS", 2)
+    queue_db.add(models.Report(id="crashy", status="Running"))
+    queue_db.commit()
+    job = report_queue.enqueue(queue_db, "crashy")
+
+    assert report_queue.claim_job(queue_db, "worker-a").id == job.id
+    # the lease is live, nobody else gets the job
+    assert report_queue.claim_job(queue_db, "worker-b") is None
+
+    expire_lease(queue_db, job)
+    reclaimed = report_queue.claim_job(queue_db, "worker-b")
+    assert (reclaimed.id, reclaimed.lease_owner, reclaimed.attempts) == (job.id, "worker-b", 2)
+    # the worker that lost the lease can no longer renew it
+    assert not report_queue.renew_lease(queue_db, job.id, "worker-a")
+    assert report_queue.renew_lease(queue_db, job.id, "worker-b")
+
+    expire_lease(queue_db, job)
+    assert report_queue.claim_job(queue_db, "worker-c") is None
+    queue_db.refresh(job)
+    assert job.status == "Failed"
+    assert queue_db.get(models.Report, "crashy").status == "Failed"
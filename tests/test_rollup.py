@@ -0,0 +1,35 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.service import bulk_report, interpolation
+
+
+@pytest.mark.parametrize("leading_policy", ["backfill", "unknown"])
+def test_rollup_source_matches_exact_engine_off_the_hour(db, add_status, add_menu_hours, monkeypatch, leading_policy):
+    rng = np.random.default_rng(7)
+    reference = pd.Timestamp("2024-03-13 15:37:21", tz="UTC")
+    store_keys = []
+    for i in range(6):
+        store_id = str(uuid.uuid4())
+        seconds = np.sort(rng.choice(9 * 86400, size=250, replace=False))
+        timestamps = reference - pd.to_timedelta(seconds, unit="s")
+        store_keys.append(add_status(store_id, zip(timestamps.astype(str), rng.choice(["active", "inactive"], len(seconds)))))
+        if i % 2:
+            # business hours that start and end inside an hour
+            add_menu_hours(store_id, [(day, "09:20:00", "17:45:30") for day in range(7)])
+
+    monkeypatch.setattr(interpolation, "LEADING_STATUS_POLICY", leading_policy)
+    monkeypatch.setattr(bulk_report, "REPORT_SOURCE", "raw")
+    exact = bulk_report.compute_uptime_downtime_bulk(db, store_keys, reference)
+    monkeypatch.setattr(bulk_report, "REPORT_SOURCE", "rollup")
+    rolled = bulk_report.compute_uptime_downtime_bulk(db, store_keys, reference)
+
+    assert len(exact) == len(store_keys)
+    for exact_row, rolled_row in zip(exact, rolled):
+        assert rolled_row["store_id"] == exact_row["store_id"]
+        for column, value in exact_row.items():
+            if column != "store_id":
+                assert rolled_row[column] == pytest.approx(value, abs=0.011), column
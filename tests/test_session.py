@@ -0,0 +1,17 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.db import session
+from src.router import report_endpoint
+
+
+def test_report_routes_without_an_async_driver(monkeypatch):
+    # backends missing from ASYNC_DRIVERS get no async engine, their requests run on the sync one
+    monkeypatch.setattr(session, "AsyncSessionLocal", None)
+    app = FastAPI()
+    app.include_router(report_endpoint.router)
+    client = TestClient(app)
+
+    report_id = client.post("/trigger_report", params={"refresh": True}).json()["report_id"]
+    assert client.get("/get_report", params={"report_id": report_id}).json()["status"] == "Queued"
+    assert client.get("/get_report", params={"report_id": "missing"}).status_code == 404
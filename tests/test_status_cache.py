@@ -0,0 +1,50 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.service import bulk_report, data_version, status_cache
+
+
+def observations(rng, reference: pd.Timestamp, count: int):
+    seconds = rng.choice(9 * 86400, size=count, replace=False)
+    return list(zip((reference - pd.to_timedelta(seconds, unit="s")).astype(str), rng.choice(["active", "inactive", "closed"], count, p=[0.6, 0.35, 0.05])))
+
+
+def assert_same_as_sql(db, store_keys, since, until):
+    # a store without observations in between, the lookup has to skip it
+    store_index = pd.Index(sorted(store_keys + [max(store_keys) + 10**6]))
+    expected = bulk_report.load_status(db, store_index, since, until)
+    # the cache keeps only the statuses reports count, any other value reads back as None
+    expected["status"] = expected["status"].where(expected["status"].isin(status_cache.STATUSES), None)
+    pd.testing.assert_frame_equal(status_cache.load_status(db, store_index, since, until), expected, check_dtype=False)
+    assert len(expected)
+
+
+@pytest.mark.parametrize("mode", ["memory", "mmap"])
+def test_cached_arrays_match_the_database(db, add_status, tmp_path, monkeypatch, mode):
+    monkeypatch.setattr(status_cache, "STATUS_CACHE", mode)
+    monkeypatch.setattr(status_cache, "STATUS_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(status_cache, "_cache", None)
+    rng = np.random.default_rng(17)
+    reference = pd.Timestamp("2024-02-20 08:30:00", tz="UTC")
+    since, until = reference - pd.Timedelta(days=7), reference
+
+    store_ids = [str(uuid.uuid4()) for _ in range(4)]
+    store_keys = [add_status(store_id, observations(rng, reference, 80)) for store_id in store_ids[:3]]
+    data_version.bump(db, store_keys)
+    assert_same_as_sql(db, store_keys, since, until)
+
+    # a later load changes one store and adds another, the cache splices just those in
+    store_keys.append(add_status(store_ids[3], observations(rng, reference, 30)))
+    add_status(store_ids[1], observations(rng, reference, 25))
+    data_version.bump(db, [store_keys[1], store_keys[3]])
+    assert_same_as_sql(db, store_keys, since, until)
+
+    if mode == "mmap":
+        assert isinstance(status_cache._cache.ts, np.memmap)
+        # a freshly started process maps the saved generation instead of reading the database
+        monkeypatch.setattr(status_cache, "_cache", None)
+        monkeypatch.setattr(status_cache, "refresh", None)
+        assert_same_as_sql(db, store_keys, since, until)
@@ -0,0 +1,33 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.service import bulk_report, store_uptime
+
+
+def test_store_uptime_matches_bulk_report_week(db, add_status, add_menu_hours, monkeypatch):
+    monkeypatch.setattr(bulk_report, "REPORT_SOURCE", "raw")
+    rng = np.random.default_rng(3)
+    reference = pd.Timestamp("2024-04-20 18:12:09", tz="UTC")
+    store_id = str(uuid.uuid4())
+    add_menu_hours(store_id, [(day, "08:30:00", "21:10:00") for day in range(7)])
+
+    # observations 10 to 6 and 3 to 0 days back, with no observation in between
+    seconds = np.sort(np.r_[rng.choice(np.arange(6 * 86400, 10 * 86400), 150, replace=False), rng.choice(3 * 86400, 150, replace=False)])[::-1]
+    timestamps = (reference - pd.to_timedelta(seconds, unit="s")).astype(str)
+    statuses = rng.choice(["active", "inactive"], len(seconds))
+    # two loads three days apart, the second continues the prefix sums of the first
+    add_status(store_id, zip(timestamps[:150], statuses[:150]))
+    store_key = add_status(store_id, zip(timestamps[150:], statuses[150:]))
+
+    row, = bulk_report.compute_uptime_downtime_bulk(db, [store_key], reference)
+    uptime = store_uptime.store_uptime(db, store_id, reference - pd.Timedelta(days=7), reference)
+
+    assert uptime["uptime_minutes"] / 60 == pytest.approx(row["uptime_last_week"], abs=0.01)
+    assert uptime["downtime_minutes"] / 60 == pytest.approx(row["downtime_last_week"], abs=0.01)
+
+
+def test_store_uptime_of_unknown_store(db):
+    assert store_uptime.store_uptime(db, str(uuid.uuid4()), pd.Timestamp("2024-01-01", tz="UTC"), pd.Timestamp("2024-01-02", tz="UTC")) is None
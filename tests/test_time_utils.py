@@ -0,0 +1,42 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from src.utils import time_utils
+
+
+def utc_intervals(store_tz, schedule, reference_date):
+    compiled = time_utils.compile_schedule(store_tz, time_utils.normalize_schedule(schedule), reference_date)
+    return [(pd.Timestamp(start, tz="UTC"), pd.Timestamp(end, tz="UTC")) for start, end in compiled]
+
+
+def test_spring_forward_gap_is_skipped():
+    # Sunday 2024-03-10 in Chicago: 02:00 CST jumps to 03:00 CDT
+    intervals = utc_intervals("America/Chicago", [(6, "01:00:00", "03:30:00")], date(2024, 3, 12))
+    assert (pd.Timestamp("2024-03-10 07:00", tz="UTC"), pd.Timestamp("2024-03-10 08:30", tz="UTC")) in intervals
+
+    # a start inside the gap moves forward to 03:00 CDT
+    intervals = utc_intervals("America/Chicago", [(6, "02:30:00", "04:00:00")], date(2024, 3, 12))
+    assert (pd.Timestamp("2024-03-10 08:00", tz="UTC"), pd.Timestamp("2024-03-10 09:00", tz="UTC")) in intervals
+
+
+def test_fall_back_ambiguous_times_resolve_to_standard_time():
+    # Sunday 2024-11-03 in Chicago: 01:00-02:00 happens twice, the second time in CST
+    intervals = utc_intervals("America/Chicago", [(6, "01:30:00", "02:30:00")], date(2024, 11, 5))
+    assert (pd.Timestamp("2024-11-03 07:30", tz="UTC"), pd.Timestamp("2024-11-03 08:30", tz="UTC")) in intervals
+
+
+def test_overnight_hours_run_past_midnight():
+    intervals = utc_intervals("UTC", [(4, "22:00:00", "02:00:00")], date(2024, 5, 20))
+    fridays = [(start, end) for start, end in intervals if start.dayofweek == 4]
+    assert fridays == [(pd.Timestamp("2024-05-17 22:00", tz="UTC"), pd.Timestamp("2024-05-18 02:00", tz="UTC"))]
+
+
+def test_compiled_schedules_are_shared_and_read_only():
+    schedule = time_utils.normalize_schedule([])
+    assert schedule == time_utils.ALWAYS_OPEN
+    first = time_utils.compile_schedule("Europe/Berlin", schedule, date(2024, 1, 10))
+    assert time_utils.compile_schedule("Europe/Berlin", schedule, date(2024, 1, 10)) is first
+    assert not first.flags.writeable
+    assert np.all(np.diff(first[:, 0]) > 0)
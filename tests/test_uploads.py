@@ -0,0 +1,78 @@
+import hashlib
+import os
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.router import data_loader
+from src.service import content_hash, uploads
+from src.utils import csv_loader
+
+CHUNK_BYTES = 256
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(csv_loader, "INGEST_EXECUTOR", "thread")
+    monkeypatch.setattr(content_hash, "INGEST_DEDUPE", "on")
+    app = FastAPI()
+    app.include_router(data_loader.router)
+    return TestClient(app)
+
+
+def store_status_csv(rows: int) -> bytes:
+    store_id = str(uuid.uuid4())
+    lines = ["store_id,status,timestamp_utc"] + [f"{store_id},active,2024-02-03 {hour:02d}:10:00.000000 UTC" for hour in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def init(client, data: bytes):
+    params = {"kind": "store_status", "filename": "store_status.csv", "size": len(data), "sha256": hashlib.sha256(data).hexdigest(), "chunk_bytes": CHUNK_BYTES}
+    return client.post("/uploads", params=params).json()
+
+
+def put(client, upload_id: str, data: bytes, chunk: int):
+    return client.put(f"/uploads/{upload_id}/chunks/{chunk}", content=data[chunk * CHUNK_BYTES:(chunk + 1) * CHUNK_BYTES])
+
+
+def test_chunks_in_any_order_then_commit(client):
+    data = store_status_csv(20)
+    upload = init(client, data)
+    upload_id, count = upload["upload_id"], upload["chunk_count"]
+    assert count == -(-len(data) // CHUNK_BYTES) > 2
+    assert upload["missing"] == list(range(count))
+
+    for chunk in reversed(range(1, count)):
+        assert put(client, upload_id, data, chunk).status_code == 200
+    assert client.get(f"/uploads/{upload_id}").json()["missing"] == [0]
+    # a chunk of the wrong size is refused
+    assert client.put(f"/uploads/{upload_id}/chunks/0", content=data[:10]).status_code == 400
+
+    response = client.post(f"/uploads/{upload_id}/commit")
+    assert response.status_code == 409
+    assert "1 chunks missing" in response.json()["detail"]
+
+    put(client, upload_id, data, 0)
+    committed = client.post(f"/uploads/{upload_id}/commit").json()
+    assert committed["status"] == "Complete"
+    assert committed["result"]["inserted"] == 20
+    assert not os.path.exists(uploads.upload_path(upload_id))
+    assert client.post(f"/uploads/{upload_id}/commit").status_code == 409
+
+
+def test_file_loaded_before_is_not_sent_again(client):
+    data = store_status_csv(5)
+    upload = init(client, data)
+    upload_id = upload["upload_id"]
+    for chunk in range(upload["chunk_count"]):
+        put(client, upload_id, data, chunk)
+    assert client.post(f"/uploads/{upload_id}/commit").json()["status"] == "Complete"
+
+    duplicate = init(client, data)
+    assert duplicate["duplicate"] is True
+    assert duplicate["upload_id"] is None
+    # other content of the same size starts a new upload
+    assert init(client, store_status_csv(5))["upload_id"]